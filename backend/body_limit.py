@@ -0,0 +1,69 @@
+"""
+Request body size limit.
+
+Pydantic caps list lengths only after the whole body has been read and
+decoded, so an oversized request still costs its full size in memory and
+JSON parsing.  This middleware refuses it first: a declared Content-Length
+over the limit gets 413 without reading anything, and a streamed body is
+counted as it arrives and cut off once it passes the limit.
+"""
+
+from typing import Dict, Optional
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+_TOO_LARGE = "request body too large"
+
+
+class BodySizeLimitMiddleware:
+    """
+    ASGI middleware enforcing ``max_bytes`` per request body.
+
+    *path_limits* maps path prefixes to their own limit (e.g. the feedback
+    upload); the longest matching prefix wins.
+    """
+
+    def __init__(self, app, max_bytes: int, path_limits: Optional[Dict[str, int]] = None):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.path_limits = sorted((path_limits or {}).items(), key=lambda kv: -len(kv[0]))
+
+    def _limit(self, path: str) -> int:
+        for prefix, limit in self.path_limits:
+            if path.startswith(prefix):
+                return limit
+        return self.max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        limit = self._limit(scope["path"])
+        for name, value in scope.get("headers", []):
+            if name == b"content-length":
+                try:
+                    declared = int(value)
+                except ValueError:
+                    declared = 0
+                if declared > limit:
+                    response = JSONResponse({"detail": _TOO_LARGE}, status_code=413)
+                    await response(scope, receive, send)
+                    return
+                break
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Raised inside body parsing; FastAPI re-raises HTTPExceptions
+                    # from there, so the client sees 413 rather than a parse error.
+                    raise HTTPException(status_code=413, detail=_TOO_LARGE)
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -1,10 +1,25 @@
 import base64
 import hmac
 import json
-from typing import Any, Dict
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 
 from . import config
 
+# Tokens are prefixed with the id of the key that produced them:
+#
+#   signed:  kid~msg.sig
+#   sealed:  kid~nonce.ciphertext.tag
+#
+# Tokens without a "kid~" prefix predate the key ring and are checked against
+# the active key.
+_KID_SEP = "~"
+
 
 def _b64encode(data: bytes) -> str:
     return base64.urlsafe_b64encode(data).decode().rstrip("=")
@@ -15,20 +30,175 @@ def _b64decode(data: str) -> bytes:
     return base64.urlsafe_b64decode(data + pad)
 
 
+# ─── Key ring ────────────────────────────────────────────────────────────
+
+
+class _KeyRing:
+    """
+    Pre-keyed HMAC objects for every key in ``config.TOKEN_KEYS``.
+
+    Keying HMAC-SHA256 hashes the secret into the inner/outer pads; doing it
+    once and handing out ``.copy()`` per call avoids redoing that work (and
+    re-encoding the secret) on every sign/verify.
+    """
+
+    def __init__(self, keys: List[Tuple[str, str]]):
+        self.source = keys
+        self.active_kid = keys[0][0]
+        self.sign_macs: Dict[str, Any] = {}
+        self.seal_aeads: Dict[str, AESGCM] = {}
+        for kid, secret in keys:
+            secret_bytes = secret.encode()
+            self.sign_macs[kid] = hmac.new(secret_bytes, digestmod="sha256")
+            self.seal_aeads[kid] = AESGCM(_derive_key(secret_bytes, b"seal-aes-gcm"))
+
+    def split(self, token: str) -> Tuple[str, str]:
+        kid, sep, body = token.partition(_KID_SEP)
+        if not sep:
+            return self.active_kid, token
+        if kid not in self.sign_macs:
+            raise ValueError("unknown key id")
+        return kid, body
+
+
+def _derive_key(secret: bytes, label: bytes) -> bytes:
+    return hmac.new(secret, label, digestmod="sha256").digest()
+
+
+_ring_lock = threading.Lock()
+_ring_instance: Optional[_KeyRing] = None
+
+
+def _ring() -> _KeyRing:
+    """Current key ring; rebuilt (and the verify cache dropped) when config.TOKEN_KEYS changes."""
+    global _ring_instance
+    ring = _ring_instance
+    if ring is None or ring.source is not config.TOKEN_KEYS:
+        with _ring_lock:
+            ring = _ring_instance
+            if ring is None or ring.source is not config.TOKEN_KEYS:
+                ring = _KeyRing(config.TOKEN_KEYS)
+                _ring_instance = ring
+                _verified.clear()
+    return ring
+
+
+# ─── Verification cache ──────────────────────────────────────────────────
+
+
+class _VerifiedCache:
+    """
+    Small LRU of token → claims for tokens that already passed verification.
+
+    The peek path presents the same challenge token dozens of times; a hit
+    skips the MAC and the JSON parse.  Only successful verifications are
+    stored, keyed on the token kind and full token string, so a tampered
+    token can never hit and a sealed token is never accepted by ``verify``.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+
+    def get(self, kind: str, token: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            claims = self._entries.get((kind, token))
+            if claims is not None:
+                self._entries.move_to_end((kind, token))
+                self.hits += 1
+            return claims
+
+    def put(self, kind: str, token: str, claims: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[(kind, token)] = claims
+            self._entries.move_to_end((kind, token))
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_verified = _VerifiedCache(config.TOKEN_VERIFY_CACHE_SIZE)
+
+
+# ─── Signed tokens ───────────────────────────────────────────────────────
+
+
 def sign(payload: Dict[str, Any]) -> str:
+    ring = _ring()
     msg = json.dumps(payload, separators=(",", ":"), sort_keys=True).encode()
-    sig = hmac.new(config.SECRET_KEY.encode(), msg, digestmod="sha256").digest()
-    return f"{_b64encode(msg)}.{_b64encode(sig)}"
+    mac = ring.sign_macs[ring.active_kid].copy()
+    mac.update(msg)
+    return f"{ring.active_kid}{_KID_SEP}{_b64encode(msg)}.{_b64encode(mac.digest())}"
 
 
 def verify(token: str) -> Dict[str, Any]:
+    ring = _ring()
+    cached = _verified.get("signed", token)
+    if cached is not None:
+        return dict(cached)
+    kid, body = ring.split(token)
     try:
-        msg_b64, sig_b64 = token.split(".")
+        msg_b64, sig_b64 = body.split(".")
     except ValueError:
         raise ValueError("invalid token format")
     msg = _b64decode(msg_b64)
-    expected = hmac.new(config.SECRET_KEY.encode(), msg, digestmod="sha256").digest()
+    mac = ring.sign_macs[kid].copy()
+    mac.update(msg)
     actual = _b64decode(sig_b64)
-    if not hmac.compare_digest(expected, actual):
+    if not hmac.compare_digest(mac.digest(), actual):
+        raise ValueError("invalid signature")
+    claims = json.loads(msg.decode())
+    _verified.put("signed", token, claims)
+    return dict(claims)
+
+
+# ─── Sealed (encrypted + authenticated) tokens ───────────────────────────
+#
+# Body format: nonce.ciphertext.tag — AES-256-GCM under a key derived from
+# the ring key, with a random 96-bit nonce and the key id as associated
+# data, so claims such as tolerances and jitter can ride in the token
+# without being readable by the client.
+
+_GCM_NONCE_BYTES = 12
+_GCM_TAG_BYTES = 16
+
+
+def is_sealed(token: str) -> bool:
+    return token.count(".") == 2
+
+
+def seal(payload: Dict[str, Any]) -> str:
+    ring = _ring()
+    kid = ring.active_kid
+    msg = json.dumps(payload, separators=(",", ":"), sort_keys=True).encode()
+    nonce = os.urandom(_GCM_NONCE_BYTES)
+    sealed = ring.seal_aeads[kid].encrypt(nonce, msg, kid.encode())
+    ct, tag = sealed[:-_GCM_TAG_BYTES], sealed[-_GCM_TAG_BYTES:]
+    return f"{kid}{_KID_SEP}{_b64encode(nonce)}.{_b64encode(ct)}.{_b64encode(tag)}"
+
+
+def unseal(token: str) -> Dict[str, Any]:
+    ring = _ring()
+    cached = _verified.get("sealed", token)
+    if cached is not None:
+        return dict(cached)
+    kid, body = ring.split(token)
+    try:
+        nonce_b64, ct_b64, tag_b64 = body.split(".")
+        nonce, ct, tag = _b64decode(nonce_b64), _b64decode(ct_b64), _b64decode(tag_b64)
+    except ValueError:
+        raise ValueError("invalid token format")
+    if len(nonce) != _GCM_NONCE_BYTES or len(tag) != _GCM_TAG_BYTES:
+        raise ValueError("invalid token format")
+    try:
+        msg = ring.seal_aeads[kid].decrypt(nonce, ct + tag, kid.encode())
+    except InvalidTag:
         raise ValueError("invalid signature")
-    return json.loads(msg.decode())
+    claims = json.loads(msg.decode())
+    _verified.put("sealed", token, claims)
+    return dict(claims)
@@ -1,6 +1,6 @@
 import os
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional, Tuple
 
 from dotenv import load_dotenv
 
@@ -30,6 +30,8 @@ TRAIL_VISIBLE_MS = 700
 TRAIL_FADEOUT_MS = 900
 REQUIRED_COVERAGE_RATIO = 0.75  # 70–80% allowed; default to 75%
 MIN_SAMPLES = 20
+# Pointer events arrive at up to ~240 Hz; this covers a full TTL of tracing.
+LINE_MAX_TRAJECTORY_SAMPLES = int(os.getenv("LINE_MAX_TRAJECTORY_SAMPLES", "6000"))
 
 # Peek behavior
 PEEK_AHEAD_PX = 90
@@ -80,6 +82,19 @@ FINISH_REVEAL_PX = 80
 
 FALLBACK_AFTER_FAILURES = 3
 
+# Stateless mode: line challenges live entirely in a sealed token (no
+# `challenges` row); geometry is regenerated from the seed and single use is
+# enforced by the replay store.  Sealed tokens are refused while this is off.
+LINE_STATELESS_CHALLENGES = _env_bool("LINE_STATELESS_CHALLENGES", False)
+# "sqlite" shares used nonces across all uvicorn workers on the host via
+# DATA_DIR / REPLAY_DB_NAME; "memory" is a per-process Bloom filter
+# partitioned by issue time (single worker or sticky routing only).
+REPLAY_STORE = os.getenv("REPLAY_STORE", "sqlite")
+REPLAY_DB_NAME = "replay.db"
+REPLAY_FILTER_PARTITION_S = 5
+REPLAY_FILTER_BITS = 1 << 20  # 128 KiB per partition; ~1e-4 FP rate at 50k nonces
+REPLAY_FILTER_HASHES = 7
+
 # Storage
 DATA_DIR = Path("data")
 DB_PATH = DATA_DIR / "captcha.db"
@@ -151,8 +166,25 @@ POINTER_BEHAVIOR = {
 # Secret key for signing tokens (use env override in production)
 SECRET_KEY = os.getenv("LINE_CAPTCHA_SECRET", "dev-secret-change-me")
 
+
+def _parse_token_keys(value: str) -> List[Tuple[str, str]]:
+    keys = []
+    for entry in value.split(","):
+        kid, sep, secret = entry.strip().partition(":")
+        if sep and kid and secret:
+            keys.append((kid, secret))
+    return keys
+
+
+# Token key ring as "kid:secret,kid:secret". The first key signs; the rest are
+# retiring keys accepted for verification only. Rotate by prepending a new key
+# and dropping the old one once its tokens have expired. Without
+# LINE_CAPTCHA_KEYS the ring is just SECRET_KEY under kid "k0".
+TOKEN_KEYS = _parse_token_keys(os.getenv("LINE_CAPTCHA_KEYS", "")) or [("k0", SECRET_KEY)]
+TOKEN_VERIFY_CACHE_SIZE = 2048
+
 # Warn loudly if running in production with the default dev secret
-if os.getenv("RENDER") and SECRET_KEY == "dev-secret-change-me":
+if os.getenv("RENDER") and any(secret == "dev-secret-change-me" for _, secret in TOKEN_KEYS):
     import warnings
     warnings.warn(
         "\n\n*** SECURITY WARNING: LINE_CAPTCHA_SECRET is using the default dev key! "
@@ -173,6 +205,11 @@ IMAGE_CLICK_TOLERANCE_MOUSE_PX = int(os.getenv("IMAGE_CLICK_TOLERANCE_MOUSE_PX",
 IMAGE_CLICK_TOLERANCE_TOUCH_PX = int(os.getenv("IMAGE_CLICK_TOLERANCE_TOUCH_PX", "22"))
 IMAGE_CLICK_TOLERANCE_PX = IMAGE_CLICK_TOLERANCE_MOUSE_PX  # backwards compat alias
 
+# Clicks are capped at parse time; a submission with more than
+# (intersections + grace) clicks is rejected before any matching.
+IMAGE_MAX_CLICKS = int(os.getenv("IMAGE_MAX_CLICKS", "32"))
+IMAGE_CLICK_GRACE = int(os.getenv("IMAGE_CLICK_GRACE", "3"))
+
 # Timing — TTL is configurable; TODO: match line CAPTCHA once confirmed
 IMAGE_CHALLENGE_TTL_MS = int(os.getenv("IMAGE_CAPTCHA_TTL_MS", "20000"))
 IMAGE_MIN_SOLVE_TIME_MS = int(os.getenv("IMAGE_MIN_SOLVE_MS", "800"))  # below this is bot-like
@@ -181,9 +218,104 @@ ENFORCE_IMAGE_MIN_SOLVE = _env_bool("ENFORCE_IMAGE_MIN_SOLVE", True)
 # Geometry computation
 IMAGE_BEZIER_SAMPLE_RESOLUTION = int(os.getenv("IMAGE_BEZIER_SAMPLE_RESOLUTION", "500"))
 IMAGE_INTERSECTION_CLUSTER_RADIUS_PX = float(os.getenv("IMAGE_INTERSECTION_CLUSTER_RADIUS_PX", "3.0"))
+# Solve straight/quadratic pairs in closed form and cubic/degenerate pairs by
+# bounding-box subdivision; 0 falls back to the sampled polyline test.
+IMAGE_ANALYTIC_INTERSECTIONS = _env_bool("IMAGE_ANALYTIC_INTERSECTIONS", True)
+# Candidates whose curves pass this close without crossing, or cross at a
+# shallower angle than this, are rejected as visually ambiguous.
+IMAGE_NEAR_MISS_PX = float(os.getenv("IMAGE_NEAR_MISS_PX", "4.0"))
+IMAGE_MIN_CROSSING_ANGLE_DEG = float(os.getenv("IMAGE_MIN_CROSSING_ANGLE_DEG", "15.0"))
 
 # Generation retry budget
 IMAGE_MAX_GENERATION_RETRIES = int(os.getenv("IMAGE_MAX_GENERATION_RETRIES", "50"))
+# Candidates are drawn this many at a time and screened with a coarse
+# vectorised crossing count at IMAGE_BATCH_SCREEN_SAMPLES points per curve.
+IMAGE_GENERATION_BATCH_SIZE = int(os.getenv("IMAGE_GENERATION_BATCH_SIZE", "4"))
+IMAGE_BATCH_SCREEN_SAMPLES = int(os.getenv("IMAGE_BATCH_SCREEN_SAMPLES", "32"))
+
+# "constructive" (default) places the crossings first and builds straight and
+# quadratic lines through them in at most IMAGE_MAX_GENERATION_RETRIES
+# draws, then falls back to a randomly placed two-line cross.
+# "rejection" draws random lines and keeps those with 1–3 crossings; it is
+# the only mode that draws cubics.  If its budget runs out the lines are
+# built constructively instead.
+# "template" places a template from IMAGE_TEMPLATE_LIBRARY (see below).
+IMAGE_GENERATION_MODE = os.getenv("IMAGE_GENERATION_MODE", "constructive")
+# Relative frequency of 1, 2 and 3 crossings in constructive mode
+IMAGE_CONSTRUCTIVE_TARGET_WEIGHTS = {1: 1.0, 2: 1.0, 3: 1.0}
+IMAGE_MIN_INTERSECTION_SEPARATION_PX = float(os.getenv("IMAGE_MIN_INTERSECTION_SEPARATION_PX", "40.0"))
+IMAGE_CONSTRUCTIVE_OVERHANG_PX = 25.0  # minimum line length past a crossing
+
+# Pre-generated challenge pool: refilled to HIGH_WATER by a background thread
+# whenever depth drops below LOW_WATER; entries older than MAX_AGE_S are dropped.
+# The thread is started by the app lifespan, only when the pool is enabled.
+IMAGE_POOL_ENABLED = _env_bool("IMAGE_POOL_ENABLED", True)
+IMAGE_POOL_LOW_WATER = int(os.getenv("IMAGE_POOL_LOW_WATER", "16"))
+IMAGE_POOL_HIGH_WATER = int(os.getenv("IMAGE_POOL_HIGH_WATER", "64"))
+IMAGE_POOL_MAX_AGE_S = float(os.getenv("IMAGE_POOL_MAX_AGE_S", "300"))
+
+# Image challenges are stored as (seed, generator version, config fingerprint)
+# and regenerated on validation; a seed issued under different generation
+# settings (or template library) is refused with 410.  This LRU holds recently
+# issued/regenerated challenges; a miss costs a full generation (about 2 ms on
+# average) inside the validate request.
+IMAGE_REGENERATE_CACHE_SIZE = int(os.getenv("IMAGE_REGENERATE_CACHE_SIZE", "512"))
+
+# ─── Challenge templates ─────────────────────────────────────────
+# Libraries of vetted base challenges built offline with
+# `python -m backend.scripts.build_templates`.  IMAGE_GENERATION_MODE="template"
+# and PATH_TEMPLATES_ENABLED instance challenges from them under a random
+# similarity transform; without a matching library file both fall back to
+# normal generation.  A library is part of the configuration: rebuilding it
+# changes what an existing seed regenerates to.
+TEMPLATE_DIR = Path(os.getenv("TEMPLATE_DIR", str(DATA_DIR / "templates")))
+PATH_TEMPLATE_LIBRARY = TEMPLATE_DIR / "path_templates.json"
+IMAGE_TEMPLATE_LIBRARY = TEMPLATE_DIR / "image_templates.json"
+PATH_TEMPLATES_ENABLED = _env_bool("PATH_TEMPLATES_ENABLED", False)
+
+# ─── Rate limiting ───────────────────────────────────────────────
+# "memory" keeps counters per process; "sqlite" shares them across all
+# uvicorn workers on the host via DATA_DIR / RATE_LIMIT_DB_NAME.
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_DB_NAME = "rate_limit.db"
+
+# Per-route limiter policies, keyed on the client address. The *_challenge
+# policies ("key": "challenge") key on the submitted challenge id instead and
+# cap how much work a single id can cause, before any HMAC or DB work is
+# done.  Ids are client-chosen, so those scopes get their own counter store:
+# a flood of random ids can only evict other id counters, never the per-IP
+# ones.
+RATE_LIMIT_POLICIES = {
+    # Generous for issuance — 60 req/60s to handle computer lab NAT
+    # where multiple participants share a single public IP address.
+    "challenge": {"window_s": 60, "max_requests": 60},
+    "feedback": {"window_s": 60, "max_requests": 3},
+    # Peeks arrive at up to ~16/s per active trace; allow a full lab behind NAT.
+    "peek": {"window_s": 60, "max_requests": 6000},
+    "verify": {"window_s": 60, "max_requests": 120},
+    "image_validate": {"window_s": 60, "max_requests": 120},
+    "questionnaire": {"window_s": 60, "max_requests": 10},
+    # Hard per-challenge ceilings, independent of the ENFORCE_PEEK_* ablation toggles.
+    "peek_challenge": {"window_s": 60, "max_requests": PEEK_MAX_COUNT * 5, "key": "challenge"},
+    "verify_challenge": {"window_s": 60, "max_requests": 5, "key": "challenge"},
+    "image_validate_challenge": {"window_s": 60, "max_requests": 5, "key": "challenge"},
+}
+
+# Request bodies above these sizes are refused with 413 before parsing.
+MAX_REQUEST_BODY_BYTES = int(os.getenv("MAX_REQUEST_BODY_BYTES", str(1024 * 1024)))
+FEEDBACK_MAX_BODY_BYTES = 32 * 1024 * 1024  # 3 images of up to 10 MB plus form fields
+
+# Feedback is posted to Discord by a background worker; failed deliveries
+# are retried after RETRY_BASE_S, doubling each time, up to MAX_ATTEMPTS.
+FEEDBACK_DISCORD_MAX_ATTEMPTS = int(os.getenv("FEEDBACK_DISCORD_MAX_ATTEMPTS", "5"))
+FEEDBACK_DISCORD_RETRY_BASE_S = float(os.getenv("FEEDBACK_DISCORD_RETRY_BASE_S", "2.0"))
+# Each attempt claims its row first; a claim older than this is assumed to
+# belong to a crashed process and may be taken over (must exceed a post).
+FEEDBACK_DISCORD_LEASE_S = float(os.getenv("FEEDBACK_DISCORD_LEASE_S", "120"))
+
+# Unknown challenge ids are remembered so repeated lookups skip SQLite.
+NEGATIVE_CACHE_TTL_S = 300
+NEGATIVE_CACHE_MAX_KEYS = 10_000
 
 # ─── Supabase backup (optional cloud mirror of SQLite data) ──────
 SUPABASE_URL: Optional[str] = os.getenv("SUPABASE_URL")
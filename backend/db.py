@@ -1,8 +1,10 @@
 import json
 import sqlite3
+import threading
 import time
+from collections import OrderedDict
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 import httpx
 
@@ -33,6 +35,51 @@ def _supabase_insert(table: str, row: Dict[str, Any]) -> None:
         print(f"[supabase] {table} insert failed: {exc}")
 
 
+# ─── Negative lookup cache ───────────────────────────────────────────────
+
+
+class _MissCache:
+    """
+    Bounded TTL set of challenge ids known to be absent.
+
+    Lookups of random ids (scanners, replayed garbage) are answered from
+    memory after the first miss instead of opening a SQLite connection.
+    """
+
+    def __init__(self, ttl_s: float, max_keys: int):
+        self.ttl_s = ttl_s
+        self.max_keys = max_keys
+        self._entries: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            expires_at = self._entries.get(key)
+            if expires_at is None:
+                return False
+            if expires_at <= time.time():
+                del self._entries[key]
+                return False
+            self.hits += 1
+            return True
+
+    def add(self, key: str) -> None:
+        with self._lock:
+            self._entries[key] = time.time() + self.ttl_s
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_keys:
+                self._entries.popitem(last=False)
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+_missing_challenges = _MissCache(config.NEGATIVE_CACHE_TTL_S, config.NEGATIVE_CACHE_MAX_KEYS)
+_missing_image_challenges = _MissCache(config.NEGATIVE_CACHE_TTL_S, config.NEGATIVE_CACHE_MAX_KEYS)
+
+
 def _get_conn() -> sqlite3.Connection:
     config.DATA_DIR.mkdir(exist_ok=True)
     conn = sqlite3.connect(config.DB_PATH, timeout=30.0)
@@ -66,21 +113,80 @@ def init_db() -> None:
         except sqlite3.OperationalError:
             pass
 
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_feedback_created ON feedback(created_at DESC, id DESC)"
+        )
+
+        # Discord delivery of each feedback row: pending → sending → sent | failed
+        # (sending → pending again on a retryable failure)
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS feedback_deliveries (
+                feedback_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        conn.commit()
+
         # ── Image CAPTCHA challenges ─────────────────────────────
         conn.execute(
             """
             CREATE TABLE IF NOT EXISTS image_challenges (
                 id TEXT PRIMARY KEY,
-                intersections_json TEXT NOT NULL,
+                intersections_json TEXT,
                 num_intersections INTEGER NOT NULL,
                 ttl_ms INTEGER NOT NULL,
                 used INTEGER DEFAULT 0,
-                created_at REAL NOT NULL
+                created_at REAL NOT NULL,
+                seed INTEGER,
+                generator_version INTEGER,
+                generator_fingerprint TEXT
             )
             """
         )
         conn.commit()
 
+        # Migration: challenges are now stored as (seed, generator_version)
+        # with intersections_json NULL; older tables declared it NOT NULL,
+        # which ALTER TABLE cannot relax, so rebuild them once.
+        columns = {r["name"]: r for r in conn.execute("PRAGMA table_info(image_challenges)")}
+        if "seed" not in columns or columns["intersections_json"]["notnull"]:
+            conn.executescript(
+                """
+                BEGIN;
+                ALTER TABLE image_challenges RENAME TO image_challenges_old;
+                CREATE TABLE image_challenges (
+                    id TEXT PRIMARY KEY,
+                    intersections_json TEXT,
+                    num_intersections INTEGER NOT NULL,
+                    ttl_ms INTEGER NOT NULL,
+                    used INTEGER DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    seed INTEGER,
+                    generator_version INTEGER,
+                    generator_fingerprint TEXT
+                );
+                INSERT INTO image_challenges
+                    (id, intersections_json, num_intersections, ttl_ms, used, created_at)
+                SELECT id, intersections_json, num_intersections, ttl_ms, used, created_at
+                FROM image_challenges_old;
+                DROP TABLE image_challenges_old;
+                COMMIT;
+                """
+            )
+
+        # Migration: seeds also carry the generator config fingerprint; rows
+        # without one are refused on validation rather than regenerated.
+        try:
+            conn.execute("ALTER TABLE image_challenges ADD COLUMN generator_fingerprint TEXT")
+            conn.commit()
+        except sqlite3.OperationalError:
+            pass
+
         # ── Image CAPTCHA attempt logs ────────────────────────────
         conn.execute(
             """
@@ -204,6 +310,7 @@ def init_db() -> None:
                 regularity_dd_cv REAL,
                 curvature_var_low REAL,
                 curvature_var_high REAL,
+                peek_count INTEGER,
                 trajectory_json TEXT,
                 created_at REAL NOT NULL
             )
@@ -211,6 +318,13 @@ def init_db() -> None:
         )
         conn.commit()
 
+        # Time-window scans (incremental metric exports)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_attempt_logs_created ON attempt_logs(created_at)")
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_image_attempt_logs_created ON image_attempt_logs(created_at)"
+        )
+        conn.commit()
+
         # Attempt to add new columns if missing (SQLite is forgiving with extra columns)
         try:
             conn.execute("ALTER TABLE challenges ADD COLUMN nonce TEXT")
@@ -246,6 +360,7 @@ def init_db() -> None:
             "ALTER TABLE attempt_logs ADD COLUMN regularity_dd_cv REAL",
             "ALTER TABLE attempt_logs ADD COLUMN curvature_var_low REAL",
             "ALTER TABLE attempt_logs ADD COLUMN curvature_var_high REAL",
+            "ALTER TABLE attempt_logs ADD COLUMN peek_count INTEGER",
         ]:
             try:
                 conn.execute(col_def)
@@ -253,6 +368,178 @@ def init_db() -> None:
             except sqlite3.OperationalError:
                 pass
 
+        _init_rollups(conn)
+
+
+# ─── Hourly rollups ──────────────────────────────────────────────────────
+#
+# attempt_rollups and attempt_rollup_hist hold per-hour aggregates of both
+# attempt logs, keyed by (hour, challenge type, pointer type, outcome).
+# AFTER INSERT triggers keep them current for every writer, so reading any
+# time range costs O(buckets) rather than O(attempts).  "time" is the line
+# attempt's duration_ms or the image attempt's solve_time_ms.
+
+ROLLUP_BUCKET_MS = 250  # histogram bucket width; changing it needs a rebuild
+ROLLUP_MAX_BUCKET = 80  # last bucket collects everything from 20 s up
+ROLLUP_KEYS = ("hour", "challenge_type", "pointer_type", "outcome")
+
+# (challenge type, table, outcome column, passed expression, time column)
+_ROLLUP_SOURCES = [
+    ("line", "attempt_logs", "outcome_reason", "{row}outcome_reason = 'success'", "duration_ms"),
+    ("image", "image_attempt_logs", "reason", "{row}passed != 0", "solve_time_ms"),
+]
+
+
+def _rollup_upserts(source: Tuple[str, str, str, str, str], row: str) -> List[str]:
+    """Upserts adding the attempt(s) *row* refers to ("NEW." or a SELECT alias)."""
+    kind, table, outcome, passed, time_col = source
+    passed = passed.format(row=row)
+    hour = f"CAST({row}created_at / 3600 AS INTEGER)"
+    pointer = f"COALESCE({row}pointer_type, 'unknown')"
+    # Client-supplied timestamps can make a logged duration negative; those
+    # count in the first bucket rather than indexing before it.
+    bucket = f"MAX(0, MIN(CAST({row}{time_col} / {ROLLUP_BUCKET_MS} AS INTEGER), {ROLLUP_MAX_BUCKET}))"
+    t = f"{row}{time_col}"
+    if row == "NEW.":
+        totals = f"VALUES ({hour}, '{kind}', {pointer}, {row}{outcome}, 1, {passed}, {t}, {t} * {t})"
+        hist = f"VALUES ({hour}, '{kind}', {pointer}, {row}{outcome}, {bucket}, 1)"
+    else:
+        src = f"FROM {table} AS r WHERE true GROUP BY 1, 2, 3, 4"
+        totals = (f"SELECT {hour}, '{kind}', {pointer}, {row}{outcome}, COUNT(*), "
+                  f"SUM({passed}), SUM({t}), SUM({t} * {t}) {src}")
+        hist = f"SELECT {hour}, '{kind}', {pointer}, {row}{outcome}, {bucket}, COUNT(*) {src}, 5"
+    return [
+        f"""
+        INSERT INTO attempt_rollups
+            (hour, challenge_type, pointer_type, outcome, count, passed, time_sum, time_sumsq)
+        {totals}
+        ON CONFLICT (hour, challenge_type, pointer_type, outcome) DO UPDATE SET
+            count = count + excluded.count,
+            passed = passed + excluded.passed,
+            time_sum = time_sum + excluded.time_sum,
+            time_sumsq = time_sumsq + excluded.time_sumsq
+        """,
+        f"""
+        INSERT INTO attempt_rollup_hist
+            (hour, challenge_type, pointer_type, outcome, bucket, count)
+        {hist}
+        ON CONFLICT (hour, challenge_type, pointer_type, outcome, bucket) DO UPDATE SET
+            count = count + excluded.count
+        """,
+    ]
+
+
+def _init_rollups(conn: sqlite3.Connection) -> None:
+    fresh = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'attempt_rollups'"
+    ).fetchone() is None
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS attempt_rollups (
+            hour INTEGER NOT NULL,
+            challenge_type TEXT NOT NULL,
+            pointer_type TEXT NOT NULL,
+            outcome TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            passed INTEGER NOT NULL,
+            time_sum REAL NOT NULL,
+            time_sumsq REAL NOT NULL,
+            PRIMARY KEY (hour, challenge_type, pointer_type, outcome)
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS attempt_rollup_hist (
+            hour INTEGER NOT NULL,
+            challenge_type TEXT NOT NULL,
+            pointer_type TEXT NOT NULL,
+            outcome TEXT NOT NULL,
+            bucket INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (hour, challenge_type, pointer_type, outcome, bucket)
+        )
+        """
+    )
+    for source in _ROLLUP_SOURCES:
+        kind, table = source[0], source[1]
+        # Recreated on every start so the trigger always matches this code
+        conn.execute(f"DROP TRIGGER IF EXISTS trg_{table}_rollup")
+        body = ";\n".join(_rollup_upserts(source, "NEW."))
+        conn.execute(f"CREATE TRIGGER trg_{table}_rollup AFTER INSERT ON {table} BEGIN {body}; END")
+        if fresh:
+            # Existing databases: fold in the attempts logged before rollups existed
+            for statement in _rollup_upserts(source, "r."):
+                conn.execute(statement)
+    conn.commit()
+
+
+def get_rollups(
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    challenge_type: Optional[str] = None,
+    by: Tuple[str, ...] = ("challenge_type", "pointer_type", "outcome"),
+) -> List[Dict[str, Any]]:
+    """
+    Attempt aggregates over the hours overlapping [start, end), grouped *by*
+    any of ROLLUP_KEYS.  Each row has count, passed, time_sum, time_sumsq,
+    time_mean and time_std, and a ``histogram`` list of counts per
+    ROLLUP_BUCKET_MS bucket (the last one open-ended).
+    """
+    unknown = set(by) - set(ROLLUP_KEYS)
+    if unknown:
+        raise ValueError(f"unknown rollup keys: {sorted(unknown)}")
+    clauses, params = ["1 = 1"], []
+    if start is not None:
+        clauses.append("hour >= ?")
+        params.append(int(start // 3600))
+    if end is not None:
+        clauses.append("hour < ?")
+        params.append(-int(-end // 3600))
+    if challenge_type is not None:
+        clauses.append("challenge_type = ?")
+        params.append(challenge_type)
+    where = " AND ".join(clauses)
+    keys = ", ".join(by)
+    select_keys = f"{keys}, " if by else ""
+    group = f"GROUP BY {keys}" if by else ""
+
+    with _get_conn() as conn:
+        totals = conn.execute(
+            f"""
+            SELECT {select_keys}SUM(count) AS count, SUM(passed) AS passed,
+                   SUM(time_sum) AS time_sum, SUM(time_sumsq) AS time_sumsq
+            FROM attempt_rollups WHERE {where} {group} ORDER BY {keys or 'count'}
+            """,
+            params,
+        ).fetchall()
+        buckets = conn.execute(
+            f"""
+            SELECT {select_keys}bucket, SUM(count) AS count
+            FROM attempt_rollup_hist WHERE {where} {group}{', ' if by else 'GROUP BY '}bucket
+            """,
+            params,
+        ).fetchall()
+
+    histograms: Dict[Tuple[Any, ...], List[int]] = {}
+    for row in buckets:
+        key = tuple(row[k] for k in by)
+        # Rows written before buckets were clamped may lie outside the range.
+        bucket = min(max(row["bucket"], 0), ROLLUP_MAX_BUCKET)
+        histograms.setdefault(key, [0] * (ROLLUP_MAX_BUCKET + 1))[bucket] += row["count"]
+
+    result = []
+    for row in totals:
+        item = dict(row)
+        if not item["count"]:
+            continue
+        mean = item["time_sum"] / item["count"]
+        item["time_mean"] = mean
+        item["time_std"] = max(0.0, item["time_sumsq"] / item["count"] - mean * mean) ** 0.5
+        item["histogram"] = histograms.get(tuple(row[k] for k in by), [0] * (ROLLUP_MAX_BUCKET + 1))
+        result.append(item)
+    return result
+
 
 def save_challenge(
     challenge_id: str,
@@ -266,6 +553,7 @@ def save_challenge(
     jitter_mouse: float,
     jitter_touch: float,
 ) -> None:
+    _missing_challenges.discard(challenge_id)
     with _get_conn() as conn:
         conn.execute(
             """
@@ -309,11 +597,15 @@ def save_challenge(
 
 
 def get_challenge(challenge_id: str) -> Optional[sqlite3.Row]:
+    if challenge_id in _missing_challenges:
+        return None
     with _get_conn() as conn:
         row = conn.execute(
             "SELECT * FROM challenges WHERE id = ?", (challenge_id,)
         ).fetchone()
-        return row
+    if row is None:
+        _missing_challenges.add(challenge_id)
+    return row
 
 
 def save_attempt(log: Dict[str, Any]) -> None:
@@ -354,9 +646,10 @@ def save_attempt(log: Dict[str, Any]) -> None:
                 regularity_dd_cv,
                 curvature_var_low,
                 curvature_var_high,
+                peek_count,
                 trajectory_json,
                 created_at
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """,
             (
                 log["attempt_id"],
@@ -392,6 +685,7 @@ def save_attempt(log: Dict[str, Any]) -> None:
                 log.get("regularity_dd_cv"),
                 log.get("curvature_var_low"),
                 log.get("curvature_var_high"),
+                log.get("peek_count"),
                 json.dumps(log.get("trajectory") or []),
                 time.time(),
             ),
@@ -437,23 +731,20 @@ def save_attempt(log: Dict[str, Any]) -> None:
     })
 
 
-def mark_challenge_used(challenge_id: str) -> None:
-    with _get_conn() as conn:
-        conn.execute(
-            "UPDATE challenges SET nonce_used = 1 WHERE id = ?", (challenge_id,)
-        )
-        conn.commit()
-
-
-def update_peek_progress(
+def finish_challenge(
     challenge_id: str,
     peek_pos: float,
-    last_peek_at: float,
+    last_peek_at: Optional[float],
     peek_count: int,
 ) -> None:
+    """Mark a challenge used and record its final peek counters in one write."""
     with _get_conn() as conn:
         conn.execute(
-            "UPDATE challenges SET peek_pos = ?, last_peek_at = ?, peek_count = ? WHERE id = ?",
+            """
+            UPDATE challenges
+            SET nonce_used = 1, peek_pos = ?, last_peek_at = ?, peek_count = ?
+            WHERE id = ?
+            """,
             (peek_pos, last_peek_at, peek_count, challenge_id),
         )
         conn.commit()
@@ -464,19 +755,27 @@ def update_peek_progress(
 
 def save_image_challenge(
     challenge_id: str,
-    intersections: List[List[float]],
+    seed: int,
+    generator_version: int,
+    generator_fingerprint: str,
     num_intersections: int,
     ttl_ms: int,
 ) -> None:
+    """Persist an issued image challenge; its lines are regenerated from *seed*."""
+    _missing_image_challenges.discard(challenge_id)
     with _get_conn() as conn:
         conn.execute(
             """
-            INSERT INTO image_challenges (id, intersections_json, num_intersections, ttl_ms, used, created_at)
-            VALUES (?, ?, ?, ?, 0, ?)
+            INSERT INTO image_challenges
+                (id, seed, generator_version, generator_fingerprint,
+                 num_intersections, ttl_ms, used, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, 0, ?)
             """,
             (
                 challenge_id,
-                json.dumps(intersections),
+                seed,
+                generator_version,
+                generator_fingerprint,
                 num_intersections,
                 ttl_ms,
                 time.time(),
@@ -486,10 +785,15 @@ def save_image_challenge(
 
 
 def get_image_challenge(challenge_id: str) -> Optional[sqlite3.Row]:
+    if challenge_id in _missing_image_challenges:
+        return None
     with _get_conn() as conn:
-        return conn.execute(
+        row = conn.execute(
             "SELECT * FROM image_challenges WHERE id = ?", (challenge_id,)
         ).fetchone()
+    if row is None:
+        _missing_image_challenges.add(challenge_id)
+    return row
 
 
 def mark_image_challenge_used(challenge_id: str) -> None:
@@ -537,12 +841,137 @@ def save_feedback(
     })
 
 
-def get_all_feedback() -> List[Dict[str, Any]]:
+def get_feedback(feedback_id: str) -> Optional[Dict[str, Any]]:
+    with _get_conn() as conn:
+        row = conn.execute("SELECT * FROM feedback WHERE id = ?", (feedback_id,)).fetchone()
+    return dict(row) if row is not None else None
+
+
+def create_feedback_delivery(feedback_id: str) -> None:
+    with _get_conn() as conn:
+        conn.execute(
+            """
+            INSERT OR IGNORE INTO feedback_deliveries (feedback_id, status, attempts, updated_at)
+            VALUES (?, 'pending', 0, ?)
+            """,
+            (feedback_id, time.time()),
+        )
+        conn.commit()
+
+
+def update_feedback_delivery(
+    feedback_id: str, status: str, attempts: int, last_error: Optional[str],
+) -> None:
+    with _get_conn() as conn:
+        conn.execute(
+            """
+            UPDATE feedback_deliveries
+            SET status = ?, attempts = ?, last_error = ?, updated_at = ?
+            WHERE feedback_id = ?
+            """,
+            (status, attempts, last_error, time.time(), feedback_id),
+        )
+        conn.commit()
+
+
+def claim_feedback_delivery(feedback_id: str, lease_s: float) -> Optional[Dict[str, Any]]:
+    """
+    Atomically mark a delivery as sending and return it, or None if it is
+    not claimable.  Only pending rows, or sending rows whose claim is older
+    than *lease_s*, can be claimed, so one process posts each attempt.
+    """
+    now = time.time()
+    with _get_conn() as conn:
+        cur = conn.execute(
+            """
+            UPDATE feedback_deliveries SET status = 'sending', updated_at = ?
+            WHERE feedback_id = ?
+              AND (status = 'pending' OR (status = 'sending' AND updated_at < ?))
+            """,
+            (now, feedback_id, now - lease_s),
+        )
+        conn.commit()
+        if cur.rowcount != 1:
+            return None
+        row = conn.execute(
+            "SELECT * FROM feedback_deliveries WHERE feedback_id = ?", (feedback_id,)
+        ).fetchone()
+    return dict(row) if row is not None else None
+
+
+def get_feedback_delivery(feedback_id: str) -> Optional[Dict[str, Any]]:
+    with _get_conn() as conn:
+        row = conn.execute(
+            "SELECT * FROM feedback_deliveries WHERE feedback_id = ?", (feedback_id,)
+        ).fetchone()
+    return dict(row) if row is not None else None
+
+
+def pending_feedback_deliveries(lease_s: Optional[float] = None) -> List[str]:
+    """Ids awaiting delivery, plus claims older than *lease_s* when given."""
+    stale_before = -1.0 if lease_s is None else time.time() - lease_s
+    with _get_conn() as conn:
+        rows = conn.execute(
+            """
+            SELECT feedback_id FROM feedback_deliveries
+            WHERE status = 'pending' OR (status = 'sending' AND updated_at < ?)
+            ORDER BY updated_at
+            """,
+            (stale_before,),
+        ).fetchall()
+    return [row["feedback_id"] for row in rows]
+
+
+def _feedback_filters(
+    category: Optional[str], device: Optional[str],
+) -> Tuple[List[str], List[Any]]:
+    clauses: List[str] = []
+    params: List[Any] = []
+    if category is not None:
+        clauses.append("category = ?")
+        params.append(category)
+    if device is not None:
+        clauses.append("device = ?")
+        params.append(device)
+    return clauses, params
+
+
+def feedback_version(
+    category: Optional[str] = None, device: Optional[str] = None,
+) -> Tuple[int, Optional[float]]:
+    """Row count and newest created_at of the filtered feedback, for cache validators."""
+    clauses, params = _feedback_filters(category, device)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    with _get_conn() as conn:
+        row = conn.execute(
+            f"SELECT COUNT(*), MAX(created_at) FROM feedback {where}", params
+        ).fetchone()
+    return row[0], row[1]
+
+
+def get_feedback_page(
+    limit: Optional[int],
+    before: Optional[Tuple[float, str]] = None,
+    category: Optional[str] = None,
+    device: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Newest-first feedback after the keyset cursor *before* = (created_at, id).
+
+    Walks idx_feedback_created, so a page costs O(limit) whatever the
+    table size or page depth.  A *limit* of None returns every row.
+    """
+    clauses, params = _feedback_filters(category, device)
+    if before is not None:
+        clauses.append("(created_at < ? OR (created_at = ? AND id < ?))")
+        params.extend([before[0], before[0], before[1]])
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
     with _get_conn() as conn:
         rows = conn.execute(
-            "SELECT * FROM feedback ORDER BY created_at DESC"
+            f"SELECT * FROM feedback {where} ORDER BY created_at DESC, id DESC LIMIT ?",
+            [*params, -1 if limit is None else limit],  # LIMIT -1: no limit
         ).fetchall()
-        return [dict(row) for row in rows]
+    return [dict(row) for row in rows]
 
 
 def save_questionnaire_response(data: Dict[str, Any]) -> None:
@@ -0,0 +1,212 @@
+"""
+Background Discord delivery for feedback submissions.
+
+``/feedback`` used to post to the Discord webhook before responding, so a
+slow or failing webhook held the request open.  Submissions are now only
+queued here once their row is written; a background thread delivers them
+with one pooled ``httpx.Client``:
+
+* every submission gets a ``feedback_deliveries`` row (pending → sent or
+  failed) with its attempt count and last error;
+* each attempt first claims its row (pending → sending) in one UPDATE, so
+  with several server processes a delivery is posted by only one of them;
+  a claim older than ``lease_s`` (its process died mid-post) is reclaimable;
+* failures are retried with exponential backoff, honouring Discord's
+  ``Retry-After`` on 429, up to ``max_attempts``;
+* the worker is started by the app lifespan, and re-queues rows left
+  pending by a restart from its own thread.
+
+Like the image pool, the queue is per-process; the claim is what keeps
+processes from posting the same row.
+"""
+
+import heapq
+import json
+import mimetypes
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import httpx
+
+from . import config, db
+
+
+def _embed_payload(row: Dict[str, Any], image_filenames: List[str]) -> Dict[str, Any]:
+    embed = {
+        "title": "New Feedback",
+        "color": 0x5865F2,  # Discord blurple
+        "fields": [
+            {"name": "From", "value": row["name"] or "Anonymous", "inline": True},
+            {"name": "Category", "value": row["category"].title(), "inline": True},
+            {"name": "Device", "value": row["device"].title(), "inline": True},
+            {"name": "Message", "value": row["message"][:1024]},
+        ],
+        "footer": {"text": f"ID: {row['id']}"},
+    }
+    if image_filenames:
+        embed["fields"].append(
+            {"name": "Attachments", "value": f"{len(image_filenames)} image(s)", "inline": True}
+        )
+    return {"embeds": [embed]}
+
+
+class DiscordNotifier:
+    def __init__(
+        self,
+        webhook_url: str,
+        images_dir: Path,
+        max_attempts: int = config.FEEDBACK_DISCORD_MAX_ATTEMPTS,
+        retry_base_s: float = config.FEEDBACK_DISCORD_RETRY_BASE_S,
+        lease_s: float = config.FEEDBACK_DISCORD_LEASE_S,
+        transport: Optional[httpx.BaseTransport] = None,
+    ):
+        self.webhook_url = webhook_url
+        self.images_dir = images_dir
+        self.max_attempts = max_attempts
+        self.retry_base_s = retry_base_s
+        self.lease_s = lease_s
+        self.transport = transport
+        self._client: Optional[httpx.Client] = None
+        self._due: List[Tuple[float, str]] = []  # heap of (due time, feedback id)
+        self._queued: Set[str] = set()
+        self._cond = threading.Condition()
+        self._worker: Optional[threading.Thread] = None
+        self._stopping = False
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.webhook_url)
+
+    # ── Queueing ────────────────────────────────────────────────────
+
+    def enqueue(self, feedback_id: str, delay_s: float = 0.0) -> None:
+        """Schedule delivery of *feedback_id* by the worker."""
+        with self._cond:
+            self._push(feedback_id, time.time() + delay_s)
+            self._cond.notify()
+
+    def _push(self, feedback_id: str, due: float) -> None:
+        if feedback_id not in self._queued:
+            self._queued.add(feedback_id)
+            heapq.heappush(self._due, (due, feedback_id))
+
+    def _next_due(self) -> Optional[str]:
+        with self._cond:
+            while not self._stopping:
+                if self._due:
+                    wait = self._due[0][0] - time.time()
+                    if wait <= 0:
+                        feedback_id = heapq.heappop(self._due)[1]
+                        self._queued.discard(feedback_id)
+                        return feedback_id
+                    self._cond.wait(timeout=wait)
+                else:
+                    self._cond.wait()
+            return None
+
+    # ── Delivery ────────────────────────────────────────────────────
+
+    def _http(self) -> httpx.Client:
+        if self._client is None:
+            self._client = httpx.Client(timeout=10, transport=self.transport)
+        return self._client
+
+    def _post(self, row: Dict[str, Any]) -> httpx.Response:
+        image_filenames = json.loads(row["image_filenames_json"])
+        payload = _embed_payload(row, image_filenames)
+        files = []
+        for fname in image_filenames:
+            fpath = self.images_dir / fname
+            if fpath.exists():
+                mime = mimetypes.guess_type(fname)[0] or "application/octet-stream"
+                files.append(("files", (fname, fpath.read_bytes(), mime)))
+        if files:
+            return self._http().post(
+                self.webhook_url, data={"payload_json": json.dumps(payload)}, files=files,
+            )
+        return self._http().post(self.webhook_url, json=payload)
+
+    def deliver(self, feedback_id: str) -> Optional[float]:
+        """
+        Make one delivery attempt and record it.
+
+        Returns the delay before the next attempt, or None once the
+        delivery has succeeded or given up.
+        """
+        delivery = db.claim_feedback_delivery(feedback_id, self.lease_s)
+        if delivery is None:  # finished, or another process holds it
+            return None
+        attempts = delivery["attempts"] + 1
+        row = db.get_feedback(feedback_id)
+        if row is None:
+            db.update_feedback_delivery(feedback_id, "failed", attempts, "feedback row missing")
+            return None
+        retry_after: Optional[float] = None
+        try:
+            resp = self._post(row)
+            if resp.status_code in (200, 204):
+                db.update_feedback_delivery(feedback_id, "sent", attempts, None)
+                return None
+            error = f"Discord returned {resp.status_code}: {resp.text[:200]}"
+            if resp.status_code == 429:
+                try:
+                    retry_after = float(resp.headers.get("retry-after", ""))
+                except ValueError:
+                    retry_after = None
+        except Exception as exc:
+            error = str(exc) or type(exc).__name__
+
+        if attempts >= self.max_attempts:
+            db.update_feedback_delivery(feedback_id, "failed", attempts, error)
+            return None
+        db.update_feedback_delivery(feedback_id, "pending", attempts, error)
+        backoff = self.retry_base_s * (2 ** (attempts - 1))
+        return max(backoff, retry_after or 0.0)
+
+    # ── Background worker ───────────────────────────────────────────
+
+    def start(self) -> None:
+        """Start the delivery worker if it is not already running."""
+        with self._cond:
+            if self._worker is not None and self._worker.is_alive():
+                return
+            self._stopping = False
+            self._worker = threading.Thread(
+                target=self._run, name="feedback-discord", daemon=True,
+            )
+            self._worker.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Ask the worker to exit after its current delivery and wait for it."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        worker = self._worker
+        if worker is not None:
+            worker.join(timeout)
+
+    def _run(self) -> None:
+        try:
+            pending = db.pending_feedback_deliveries(self.lease_s)
+        except Exception as exc:
+            print(f"[feedback] could not load pending discord deliveries: {exc}")
+            pending = []
+        with self._cond:
+            for feedback_id in pending:
+                self._push(feedback_id, time.time())
+        while True:
+            feedback_id = self._next_due()
+            if feedback_id is None:
+                break
+            try:
+                delay = self.deliver(feedback_id)
+            except Exception as exc:  # keep the worker alive on DB errors
+                print(f"[feedback] discord delivery of {feedback_id} failed: {exc}")
+                delay = None
+            if delay is not None:
+                self.enqueue(feedback_id, delay)
+        if self._client is not None:
+            self._client.close()
+            self._client = None
@@ -1,16 +1,22 @@
+import hashlib
 import hmac
 import json
 import os
+import tempfile
 import uuid
+from email.utils import formatdate, parsedate_to_datetime
 from pathlib import Path
-from typing import List
+from typing import BinaryIO, List, Optional, Tuple
 
-import httpx
 import fastapi
-from fastapi import File, Form, Request, UploadFile
+from fastapi import File, Form, Query, Request, Response, UploadFile
+from fastapi.responses import JSONResponse
+from PIL import Image
+from starlette.concurrency import run_in_threadpool
 
 from . import db, models
-from .rate_limit import feedback_limiter
+from .feedback_notify import DiscordNotifier
+from .rate_limit import client_ip, feedback_limiter
 
 router = fastapi.APIRouter()
 
@@ -19,6 +25,12 @@ FEEDBACK_SECRET = os.getenv("FEEDBACK_SECRET", "change-me")
 FEEDBACK_IMAGES_DIR = Path("data/feedback_images")
 MAX_IMAGES = 3
 MAX_IMAGE_SIZE_BYTES = 10 * 1024 * 1024  # 10 MB per image
+_UPLOAD_CHUNK_BYTES = 1024 * 64
+FEEDBACK_PAGE_DEFAULT = 50
+FEEDBACK_PAGE_MAX = 200
+FEEDBACK_THUMBNAIL_PX = 320  # longest side of ?thumbnail=true images
+
+notifier = DiscordNotifier(DISCORD_WEBHOOK_URL, FEEDBACK_IMAGES_DIR)
 
 
 @router.post("/feedback")
@@ -30,8 +42,7 @@ async def submit_feedback(
     name: str = Form(""),
     images: List[UploadFile] = File(default=[]),
 ):
-    client_ip = request.client.host if request.client else "unknown"
-    feedback_limiter.check(client_ip)
+    feedback_limiter.check(client_ip(request))
 
     category = category.strip()
     device = device.strip()
@@ -49,86 +60,147 @@ async def submit_feedback(
     feedback_id = uuid.uuid4().hex
     saved_filenames: List[str] = []
 
-    # Save uploaded images
+    # Stream uploaded images to disk off the event loop
     if images:
         FEEDBACK_IMAGES_DIR.mkdir(parents=True, exist_ok=True)
-        for img in images:
-            if not img.filename:
-                continue
-            # Read in chunks to reject oversized uploads early
-            chunks: list[bytes] = []
-            total = 0
-            while True:
-                chunk = await img.read(1024 * 64)  # 64KB chunks
-                if not chunk:
-                    break
-                total += len(chunk)
-                if total > MAX_IMAGE_SIZE_BYTES:
-                    raise fastapi.HTTPException(status_code=400, detail="Image too large (max 10 MB)")
-                chunks.append(chunk)
-            content = b"".join(chunks)
-            if not content:
-                continue
-            if not img.content_type or not img.content_type.startswith("image/"):
-                raise fastapi.HTTPException(status_code=400, detail="Only image files are allowed")
-            ext = Path(img.filename).suffix or ".png"
-            filename = f"{feedback_id}_{len(saved_filenames)}{ext}"
-            filepath = FEEDBACK_IMAGES_DIR / filename
-            filepath.write_bytes(content)
-            saved_filenames.append(filename)
-
-    clean_name = name.strip() or None
-
-    db.save_feedback(
-        feedback_id=feedback_id,
-        name=clean_name,
-        category=category,
-        device=device,
-        message=message.strip(),
-        image_filenames=saved_filenames,
-    )
-
-    # Send Discord webhook notification
-    discord_sent = False
-    discord_error = None
-    if DISCORD_WEBHOOK_URL:
-        discord_sent, discord_error = await _send_discord_notification(
+        try:
+            for img in images:
+                if not img.filename:
+                    continue
+                if not img.content_type or not img.content_type.startswith("image/"):
+                    raise fastapi.HTTPException(status_code=400, detail="Only image files are allowed")
+                ext = Path(img.filename).suffix or ".png"
+                filename = f"{feedback_id}_{len(saved_filenames)}{ext}"
+                try:
+                    size = await run_in_threadpool(_store_upload, img.file, FEEDBACK_IMAGES_DIR / filename)
+                except ValueError as exc:
+                    raise fastapi.HTTPException(status_code=400, detail=str(exc))
+                if size:
+                    saved_filenames.append(filename)
+        except fastapi.HTTPException:
+            _discard_images(saved_filenames)
+            raise
+
+    try:
+        await run_in_threadpool(
+            _record_feedback,
             feedback_id=feedback_id,
-            name=clean_name,
+            name=name.strip() or None,
             category=category,
             device=device,
             message=message.strip(),
             image_filenames=saved_filenames,
         )
-    else:
-        discord_error = "DISCORD_WEBHOOK_URL not set"
+    except Exception:
+        _discard_images(saved_filenames)
+        raise
+    if notifier.enabled:
+        notifier.enqueue(feedback_id)
+
+    return {
+        "ok": True,
+        "feedbackId": feedback_id,
+        "discordStatus": "queued" if notifier.enabled else "disabled",
+    }
+
+
+def _store_upload(src: BinaryIO, dest: Path) -> int:
+    """
+    Copy an upload to *dest* through a temp file in the same directory.
+
+    The temp file is renamed into place only when complete, so readers
+    never see a partial image.  Returns the size; empty uploads are
+    dropped.  Raises ValueError past MAX_IMAGE_SIZE_BYTES.
+    """
+    fd, tmp = tempfile.mkstemp(dir=dest.parent, suffix=".part")
+    total = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = src.read(_UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+                total += len(chunk)
+                if total > MAX_IMAGE_SIZE_BYTES:
+                    raise ValueError("Image too large (max 10 MB)")
+                out.write(chunk)
+        if total:
+            os.replace(tmp, dest)
+    finally:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+    return total
 
-    return {"ok": True, "feedbackId": feedback_id, "discordSent": discord_sent, "discordError": discord_error}
+
+def _discard_images(filenames: List[str]) -> None:
+    """Remove images saved for a submission that was not recorded."""
+    for filename in filenames:
+        (FEEDBACK_IMAGES_DIR / filename).unlink(missing_ok=True)
+
+
+def _record_feedback(feedback_id: str, **fields) -> None:
+    db.save_feedback(feedback_id=feedback_id, **fields)
+    if notifier.enabled:
+        db.create_feedback_delivery(feedback_id)
 
 
 @router.get("/feedback")
-def list_feedback(secret: str = ""):
+def list_feedback(
+    request: Request,
+    secret: str = "",
+    limit: Optional[int] = Query(None, ge=1, le=FEEDBACK_PAGE_MAX),
+    cursor: Optional[str] = None,
+    category: Optional[str] = None,
+    device: Optional[str] = None,
+):
+    """
+    Newest-first feedback, all of it unless paginated.
+
+    Without ``limit`` or ``cursor`` every row is returned, as before
+    pagination existed.  With either, a page of ``limit`` rows (default
+    FEEDBACK_PAGE_DEFAULT) is returned; the body stays a plain list and the
+    cursor for the next page, if any, is in the ``X-Next-Cursor`` header.  ETag/Last-Modified come from the
+    filtered row count and newest timestamp, so an unchanged listing is
+    answered 304 without reading the page.
+    """
     if not hmac.compare_digest(secret, FEEDBACK_SECRET):
         raise fastapi.HTTPException(status_code=403, detail="Forbidden")
-    rows = db.get_all_feedback()
-    items = []
-    for row in rows:
-        items.append(
-            models.FeedbackItem(
-                id=row["id"],
-                name=row["name"],
-                category=row["category"],
-                device=row.get("device", "unknown") if isinstance(row, dict) else (row["device"] if "device" in row.keys() else "unknown"),
-                message=row["message"],
-                imageFilenames=json.loads(row["image_filenames_json"]),
-                createdAt=row["created_at"],
-            )
-        )
-    return items
+    before = _parse_cursor(cursor) if cursor else None
+    if limit is None and cursor:
+        limit = FEEDBACK_PAGE_DEFAULT
+
+    count, latest = db.feedback_version(category, device)
+    validator = f"{count}:{latest}:{limit}:{cursor}:{category}:{device}"
+    headers = {
+        "ETag": f'"{hashlib.sha1(validator.encode()).hexdigest()[:20]}"',
+        "Cache-Control": "private, no-cache",
+    }
+    if latest is not None:
+        headers["Last-Modified"] = formatdate(latest, usegmt=True)
+    if _not_modified(request, headers["ETag"], latest):
+        return Response(status_code=304, headers=headers)
+
+    rows = db.get_feedback_page(None if limit is None else limit + 1, before, category, device)
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        headers["X-Next-Cursor"] = f"{rows[-1]['created_at']!r}_{rows[-1]['id']}"
+    items = [
+        models.FeedbackItem(
+            id=row["id"],
+            name=row["name"],
+            category=row["category"],
+            device=row["device"],
+            message=row["message"],
+            imageFilenames=json.loads(row["image_filenames_json"]),
+            createdAt=row["created_at"],
+        ).model_dump()
+        for row in rows
+    ]
+    return JSONResponse(items, headers=headers)
 
 
 @router.get("/feedback/images/{filename}")
-def get_feedback_image(filename: str, secret: str = ""):
+def get_feedback_image(request: Request, filename: str, secret: str = "", thumbnail: bool = False):
     if not hmac.compare_digest(secret, FEEDBACK_SECRET):
         raise fastapi.HTTPException(status_code=403, detail="Forbidden")
     filepath = FEEDBACK_IMAGES_DIR / filename
@@ -137,58 +209,67 @@ def get_feedback_image(filename: str, secret: str = ""):
     # Prevent path traversal
     if filepath.resolve().parent != FEEDBACK_IMAGES_DIR.resolve():
         raise fastapi.HTTPException(status_code=400, detail="Invalid filename")
-    return fastapi.responses.FileResponse(filepath)
-
-
-async def _send_discord_notification(
-    feedback_id: str,
-    name: str | None,
-    category: str,
-    device: str,
-    message: str,
-    image_filenames: List[str],
-) -> tuple[bool, str | None]:
-    embed = {
-        "title": "New Feedback",
-        "color": 0x5865F2,  # Discord blurple
-        "fields": [
-            {"name": "From", "value": name or "Anonymous", "inline": True},
-            {"name": "Category", "value": category.title(), "inline": True},
-            {"name": "Device", "value": device.title(), "inline": True},
-            {"name": "Message", "value": message[:1024]},
-        ],
-        "footer": {"text": f"ID: {feedback_id}"},
+    if thumbnail:
+        filepath = _thumbnail(filepath)
+
+    # Stored images never change, so clients may keep them for a day
+    stat = filepath.stat()
+    headers = {
+        "ETag": f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"',
+        "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+        "Cache-Control": "private, max-age=86400",
     }
-    if image_filenames:
-        embed["fields"].append(
-            {"name": "Attachments", "value": f"{len(image_filenames)} image(s)", "inline": True}
-        )
+    if _not_modified(request, headers["ETag"], stat.st_mtime):
+        return Response(status_code=304, headers=headers)
+    return fastapi.responses.FileResponse(filepath, headers=headers)
+
+
+def _parse_cursor(cursor: str) -> Tuple[float, str]:
+    created_at, sep, feedback_id = cursor.partition("_")
+    try:
+        if not sep or not feedback_id:
+            raise ValueError(cursor)
+        return float(created_at), feedback_id
+    except ValueError:
+        raise fastapi.HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _not_modified(request: Request, etag: str, last_modified: Optional[float]) -> bool:
+    """Whether the request's validators still match (RFC 9110 §13.1)."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags or f"W/{etag}" in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(last_modified) <= since
+    return False
+
 
-    payload = {"embeds": [embed]}
+def _thumbnail(source: Path) -> Path:
+    """
+    Cached PNG thumbnail of *source*, at most FEEDBACK_THUMBNAIL_PX a side.
 
+    Thumbnails are built on first request and kept under ``thumbs/``.  For
+    a file Pillow cannot read, the original is served instead.
+    """
+    target = source.parent / "thumbs" / f"{source.stem}_{FEEDBACK_THUMBNAIL_PX}.png"
+    if target.exists() and target.stat().st_mtime >= source.stat().st_mtime:
+        return target
+    target.parent.mkdir(exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=target.parent, suffix=".part")
     try:
-        async with httpx.AsyncClient(timeout=10) as client:
-            # If there are images, send them as attachments
-            if image_filenames:
-                files = []
-                for fname in image_filenames:
-                    fpath = FEEDBACK_IMAGES_DIR / fname
-                    if fpath.exists():
-                        files.append(
-                            ("files", (fname, fpath.read_bytes(), "image/png"))
-                        )
-                resp = await client.post(
-                    DISCORD_WEBHOOK_URL,
-                    data={"payload_json": json.dumps(payload)},
-                    files=files,
-                )
-            else:
-                resp = await client.post(
-                    DISCORD_WEBHOOK_URL,
-                    json=payload,
-                )
-            if resp.status_code in (200, 204):
-                return True, None
-            return False, f"Discord returned {resp.status_code}: {resp.text[:200]}"
-    except Exception as e:
-        return False, str(e)
+        with os.fdopen(fd, "wb") as out, Image.open(source) as img:
+            img.thumbnail((FEEDBACK_THUMBNAIL_PX, FEEDBACK_THUMBNAIL_PX))
+            img.save(out, format="PNG")
+        os.replace(tmp, target)
+    except OSError:  # includes PIL.UnidentifiedImageError
+        return source
+    finally:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+    return target
@@ -0,0 +1,152 @@
+"""
+Pre-generated image challenge pool.
+
+``generate_challenge`` is a rejection-sampling loop, so its latency has a
+long tail.  The pool keeps fully generated challenges (client_data +
+server_data) ready in memory and a background thread tops it up:
+
+* when depth falls below ``low_water`` the worker refills to ``high_water``;
+* entries older than ``max_age_s`` are discarded rather than served, so
+  the pool never hands out stale geometry;
+* an empty pool falls back to generating inline — requests never wait on
+  the worker.
+
+The worker is started by the app lifespan (``start``/``stop``), never by
+``take``, so importing the module or serving without it runs no threads.
+Nothing here is issued yet: ids, tokens and TTLs are assigned by the route
+when a challenge is taken.  The pool is per-process.
+"""
+
+import threading
+import time
+from collections import Counter, deque
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+from . import config
+from . import image_challenge as gen
+
+
+class ChallengePool:
+    def __init__(
+        self,
+        low_water: int,
+        high_water: int,
+        max_age_s: float,
+        generator: Optional[Callable[[], Dict[str, Any]]] = None,
+    ):
+        self.low_water = low_water
+        self.high_water = high_water
+        self.max_age_s = max_age_s
+        self.generator = generator
+        self._items: Deque[Tuple[float, Dict[str, Any]]] = deque()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.generated = 0
+        self.generation_ms_total = 0.0
+        self.attempts: Counter = Counter()
+
+    # ── Generation ──────────────────────────────────────────────────
+
+    def _generate(self) -> Dict[str, Any]:
+        started = time.perf_counter()
+        challenge = (self.generator or gen.generate_challenge)()
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        with self._lock:
+            self.generated += 1
+            self.generation_ms_total += elapsed_ms
+            self.attempts[challenge["server_data"].get("attempts", 1)] += 1
+        return challenge
+
+    def _evict_stale(self, now: float) -> None:
+        while self._items and now - self._items[0][0] > self.max_age_s:
+            self._items.popleft()
+            self.expired += 1
+
+    def refill(self) -> int:
+        """Generate until the pool holds ``high_water`` fresh entries. Returns the number added."""
+        added = 0
+        while True:
+            with self._lock:
+                self._evict_stale(time.time())
+                if len(self._items) >= self.high_water:
+                    return added
+            challenge = self._generate()
+            with self._lock:
+                self._items.append((time.time(), challenge))
+            added += 1
+
+    # ── Serving ─────────────────────────────────────────────────────
+
+    def take(self) -> Dict[str, Any]:
+        """Pop the oldest fresh challenge, or generate one inline if the pool is empty."""
+        with self._lock:
+            self._evict_stale(time.time())
+            item = self._items.popleft() if self._items else None
+            depth = len(self._items)
+            if item is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if depth < self.low_water:
+            self._wake.set()
+        if item is not None:
+            return item[1]
+        return self._generate()
+
+    # ── Background worker ───────────────────────────────────────────
+
+    def start(self) -> None:
+        """Start the refill worker if it is not already running."""
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive():
+                return
+            self._stop.clear()
+            self._worker = threading.Thread(
+                target=self._run, name="image-challenge-pool", daemon=True,
+            )
+            self._worker.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Ask the worker to exit after its current refill and wait for it."""
+        self._stop.set()
+        self._wake.set()
+        worker = self._worker
+        if worker is not None:
+            worker.join(timeout)
+
+    def _run(self) -> None:
+        # Wake on demand (depth below low water) and at least twice per
+        # max age, so idle periods still rotate out stale entries.
+        while not self._stop.is_set():
+            self.refill()
+            self._wake.wait(timeout=self.max_age_s / 2)
+            self._wake.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "depth": len(self._items),
+                "low_water": self.low_water,
+                "high_water": self.high_water,
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "generated": self.generated,
+                "avg_generation_ms": (
+                    round(self.generation_ms_total / self.generated, 3) if self.generated else None
+                ),
+                "attempts_histogram": {str(k): v for k, v in sorted(self.attempts.items())},
+            }
+
+
+pool = ChallengePool(
+    low_water=config.IMAGE_POOL_LOW_WATER,
+    high_water=config.IMAGE_POOL_HIGH_WATER,
+    max_age_s=config.IMAGE_POOL_MAX_AGE_S,
+)
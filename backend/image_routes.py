@@ -3,17 +3,21 @@ Ephemeral Image CAPTCHA — API Routes
 
 POST /captcha/image/generate  → issue a new challenge
 POST /captcha/image/validate  → verify user clicks
+GET  /captcha/image/pool      → challenge pool depth and generation metrics (secret)
 """
 
+import hmac
 import json
 import time
 import uuid
+from typing import List, Tuple
 
 from fastapi import APIRouter, HTTPException, Request
 
-from . import captcha_token, config, db
-from .rate_limit import challenge_limiter
+from . import captcha_token, config, db, feedback_routes
+from .rate_limit import challenge_limiter, client_ip, limiters
 from . import image_challenge as gen
+from . import image_pool
 from . import image_validator as val
 from . import models
 
@@ -28,9 +32,11 @@ def generate(request: Request) -> models.ImageNewChallengeResponse:
     Returns line definitions and canvas config to the client.
     Intersection coordinates are stored server-side only.
     """
-    client_ip = request.client.host if request.client else "unknown"
-    challenge_limiter.check(client_ip)
-    challenge = gen.generate_challenge()
+    challenge_limiter.check(client_ip(request))
+    if config.IMAGE_POOL_ENABLED:
+        challenge = image_pool.pool.take()
+    else:
+        challenge = gen.generate_challenge()
     client = challenge["client_data"]
     server = challenge["server_data"]
 
@@ -48,13 +54,17 @@ def generate(request: Request) -> models.ImageNewChallengeResponse:
     }
     token = captcha_token.sign(token_payload)
 
-    # Persist server-side (intersections never leave the server)
+    # Persist server-side: only the seed is stored, and the intersections
+    # (which never leave the server) are regenerated from it on validation.
     db.save_image_challenge(
         challenge_id=challenge_id,
-        intersections=server["intersections"],
+        seed=server["seed"],
+        generator_version=server["version"],
+        generator_fingerprint=server["fingerprint"],
         num_intersections=server["numIntersections"],
         ttl_ms=ttl_ms,
     )
+    gen.remember_challenge(challenge)
 
     return models.ImageNewChallengeResponse(
         challengeId=challenge_id,
@@ -67,8 +77,30 @@ def generate(request: Request) -> models.ImageNewChallengeResponse:
     )
 
 
+@router.get("/pool")
+def pool_stats(secret: str = "") -> dict:
+    """Pool depth, hit/miss counts and the generation-attempt histogram."""
+    if not hmac.compare_digest(secret, feedback_routes.FEEDBACK_SECRET):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return {"enabled": config.IMAGE_POOL_ENABLED, **image_pool.pool.stats()}
+
+
+def _stored_challenge(row) -> Tuple[List[List[float]], int]:
+    """Ground-truth intersections and line count for a stored challenge row."""
+    if row["seed"] is None:
+        # Stored before seed-only persistence: intersections only, no lines.
+        return json.loads(row["intersections_json"]), 0
+    try:
+        challenge = gen.regenerate_challenge(
+            row["seed"], row["generator_version"], row["generator_fingerprint"],
+        )
+    except ValueError:
+        raise HTTPException(status_code=410, detail="challenge generator changed")
+    return challenge["server_data"]["intersections"], len(challenge["client_data"]["lines"])
+
+
 @router.post("/validate", response_model=models.ImageVerifyResponse)
-def validate(req: models.ImageVerifyRequest) -> models.ImageVerifyResponse:
+def validate(req: models.ImageVerifyRequest, request: Request) -> models.ImageVerifyResponse:
     """
     Validate user clicks against stored intersection coordinates.
 
@@ -76,6 +108,9 @@ def validate(req: models.ImageVerifyRequest) -> models.ImageVerifyResponse:
     against ground-truth intersections within a tolerance radius.
     The challenge is consumed after one attempt (pass or fail).
     """
+    limiters["image_validate"].check(client_ip(request))
+    limiters["image_validate_challenge"].check(req.challengeId)
+
     # ── Token verification ───────────────────────────────────────
     try:
         payload = captcha_token.verify(req.token)
@@ -115,7 +150,7 @@ def validate(req: models.ImageVerifyRequest) -> models.ImageVerifyResponse:
     db.mark_image_challenge_used(challenge_id)
 
     # ── Validate clicks ──────────────────────────────────────────
-    intersections = json.loads(row["intersections_json"])
+    intersections, num_lines = _stored_challenge(row)
     clicks = [{"x": c.x, "y": c.y} for c in req.clicks]
 
     pointer_type = req.pointerType or "mouse"
@@ -136,7 +171,7 @@ def validate(req: models.ImageVerifyRequest) -> models.ImageVerifyResponse:
     db.save_image_attempt({
         "attempt_id": uuid.uuid4().hex,
         "challenge_id": challenge_id,
-        "num_lines": 0,  # line count not stored in DB schema
+        "num_lines": num_lines,
         "num_intersections": row["num_intersections"],
         "num_clicks": len(req.clicks),
         "matched": result["matched"],
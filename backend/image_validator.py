@@ -3,9 +3,15 @@ Ephemeral Image CAPTCHA — Click Validator
 
 Validates user clicks against stored intersection coordinates.
 Tolerance-radius matching with configurable grace clicks and timing checks.
+
+Matching is done on stacked arrays so one call can score a single
+submission (``validate_clicks``) or thousands of them
+(``validate_click_batch``, for offline re-scoring and load tests).
 """
 
-from typing import Any, Dict, List
+import functools
+from itertools import permutations
+from typing import Any, Dict, List, Optional, Sequence, Union
 
 import numpy as np
 
@@ -37,127 +43,189 @@ def validate_clicks(
             excess (int): Clicks that didn't match any intersection.
             too_fast (bool): Whether solve time was suspiciously fast.
     """
-    if pointer_type in ("touch", "pen"):
-        tolerance = config.IMAGE_CLICK_TOLERANCE_TOUCH_PX
-    else:
-        tolerance = config.IMAGE_CLICK_TOLERANCE_MOUSE_PX
-    min_time = config.IMAGE_MIN_SOLVE_TIME_MS
-
+    # Over the click limit: reject before building any distance matrix.
     expected = len(intersections)
-
-    # ── Timing check ─────────────────────────────────────────────
-    too_fast = solve_time_ms < min_time
-    if too_fast and config.ENFORCE_IMAGE_MIN_SOLVE:
+    too_fast = solve_time_ms < config.IMAGE_MIN_SOLVE_TIME_MS and config.ENFORCE_IMAGE_MIN_SOLVE
+    if expected > 0 and not too_fast and len(clicks) > click_limit(expected):
         return {
             "passed": False,
-            "reason": "solved too fast",
+            "reason": "too many clicks",
             "matched": 0,
             "expected": expected,
-            "excess": len(clicks),
-            "too_fast": True,
-        }
-
-    if expected == 0:
-        # Edge case: no intersections (shouldn't happen with good generation)
-        return {
-            "passed": len(clicks) == 0,
-            "reason": "no intersections expected" if len(clicks) == 0 else "unexpected clicks",
-            "matched": 0,
-            "expected": 0,
-            "excess": len(clicks),
+            "excess": len(clicks) - expected,
             "too_fast": False,
         }
 
-    # ── Convert to numpy arrays ──────────────────────────────────
-    if len(clicks) == 0:
-        return {
-            "passed": False,
-            "reason": "no clicks submitted",
-            "matched": 0,
-            "expected": expected,
-            "excess": 0,
-            "too_fast": False,
-        }
+    result = validate_click_batch(
+        clicks=np.array([[[c["x"], c["y"]] for c in clicks]], dtype=float).reshape(1, -1, 2),
+        intersections=np.array([intersections], dtype=float).reshape(1, -1, 2),
+        solve_time_ms=[solve_time_ms],
+        pointer_type=pointer_type,
+    )
+    return {
+        "passed": bool(result["passed"][0]),
+        "reason": result["reason"][0],
+        "matched": int(result["matched"][0]),
+        "expected": int(result["expected"][0]),
+        "excess": int(result["excess"][0]),
+        "too_fast": bool(result["too_fast"][0]),
+    }
+
+
+def click_limit(expected: int) -> int:
+    """Most clicks a submission for *expected* intersections may contain."""
+    return expected + config.IMAGE_CLICK_GRACE
+
+
+# ─── Matching ────────────────────────────────────────────────────────────
+
+# Exhaustive assignment is used while an attempt has at most this many
+# ordered intersection → click assignments (e.g. 3 intersections with up to
+# 9 clicks); beyond it matching falls back to greedy.
+_MAX_ASSIGNMENTS = 720
+
+
+@functools.lru_cache(maxsize=64)
+def _assignments(num_cols: int, num_rows: int) -> np.ndarray:
+    """(P, num_rows) array of every injective row → column assignment."""
+    return np.array(list(permutations(range(num_cols), num_rows)), dtype=np.intp).reshape(-1, num_rows)
 
-    click_arr = np.array([[c["x"], c["y"]] for c in clicks])  # (C, 2)
-    ix_arr = np.array(intersections)  # (I, 2)
 
-    # ── Check every click is near SOME intersection ──────────────
-    # Distance from each click to its nearest intersection: (C, I)
+def _max_matching(dists: np.ndarray, within: np.ndarray) -> np.ndarray:
+    """
+    Number of intersections matched to distinct clicks, per attempt.
+
+    *dists* and *within* are (N, I, C): click distances and whether each
+    pair is inside tolerance.  Small matrices get an optimal assignment
+    (maximum matching, found by scoring every injective assignment at once);
+    larger ones a batched greedy pass — each intersection in turn takes its
+    nearest unused click.
+    """
+    n, rows, cols = within.shape
+    if rows == 0 or cols == 0:
+        return np.zeros(n, dtype=int)
+
+    width = max(cols, rows)  # padding columns stand for "unmatched"
+    num_assignments = int(np.prod(np.arange(width - rows + 1, width + 1)))
+    if num_assignments <= _MAX_ASSIGNMENTS:
+        padded = np.zeros((n, rows, width), dtype=bool)
+        padded[:, :, :cols] = within
+        hits = padded[:, np.arange(rows), _assignments(width, rows)]  # (N, P, I)
+        return hits.sum(axis=2).max(axis=1)
+
+    remaining = np.where(within, dists, np.inf)
+    matched = np.zeros(n, dtype=int)
+    attempts = np.arange(n)
+    for i in range(rows):
+        row = remaining[:, i, :]
+        best = row.argmin(axis=1)
+        ok = np.isfinite(row[attempts, best])
+        remaining[attempts[ok], :, best[ok]] = np.inf
+        matched += ok
+    return matched
+
+
+def _missed_reason(missing: int) -> str:
+    return f"missed {missing} intersection{'s' if missing != 1 else ''}"
+
+
+def validate_click_batch(
+    clicks: np.ndarray,
+    intersections: np.ndarray,
+    solve_time_ms: Sequence[float],
+    pointer_type: Union[str, Sequence[str]] = "mouse",
+    num_clicks: Optional[Sequence[int]] = None,
+    num_intersections: Optional[Sequence[int]] = None,
+) -> Dict[str, Any]:
+    """
+    Validate many submissions at once; same rules as ``validate_clicks``.
+
+    Args:
+        clicks: (N, C, 2) click coordinates, padded to a common C.
+        intersections: (N, I, 2) intersection coordinates, padded to a common I.
+        solve_time_ms: (N,) solve times.
+        pointer_type: One pointer type for every attempt, or one per attempt.
+        num_clicks: Real clicks per attempt (default: all C).
+        num_intersections: Real intersections per attempt (default: all I).
+
+    Returns:
+        Dict of length-N arrays under the ``validate_clicks`` keys
+        (``reason`` is a list of str).
+    """
+    clicks = np.asarray(clicks, dtype=float)
+    intersections = np.asarray(intersections, dtype=float)
+    n, max_clicks = clicks.shape[:2]
+    max_ix = intersections.shape[1]
+    solve_time_ms = np.asarray(solve_time_ms, dtype=float)
+
+    touch_tol = config.IMAGE_CLICK_TOLERANCE_TOUCH_PX
+    mouse_tol = config.IMAGE_CLICK_TOLERANCE_MOUSE_PX
+    if isinstance(pointer_type, str):
+        tolerance = touch_tol if pointer_type in ("touch", "pen") else mouse_tol
+    else:
+        touch = np.isin(np.asarray(pointer_type), ("touch", "pen"))
+        tolerance = np.where(touch, touch_tol, mouse_tol)[:, np.newaxis, np.newaxis]
+
+    # ── Distances and tolerance, with padding masked out ─────────
     dists = np.linalg.norm(
-        click_arr[:, np.newaxis, :] - ix_arr[np.newaxis, :, :],
-        axis=2,
+        intersections[:, :, np.newaxis, :] - clicks[:, np.newaxis, :, :],
+        axis=3,
+    )  # (N, I, C)
+    if num_clicks is None:
+        num_clicks = np.full(n, max_clicks)
+    else:
+        num_clicks = np.asarray(num_clicks)
+        dists[np.broadcast_to(np.arange(max_clicks) >= num_clicks[:, np.newaxis, np.newaxis], dists.shape)] = np.inf
+    if num_intersections is None:
+        expected = np.full(n, max_ix)
+    else:
+        expected = np.asarray(num_intersections)
+        dists[np.broadcast_to(np.arange(max_ix)[:, np.newaxis] >= expected[:, np.newaxis, np.newaxis], dists.shape)] = np.inf
+    within = dists <= tolerance
+
+    # A click is stray if it is not near any intersection (padding never is)
+    click_valid = np.arange(max_clicks) < num_clicks[:, np.newaxis]  # (N, C)
+    stray = (~within.any(axis=1) & click_valid).sum(axis=1)
+    matched = _max_matching(dists, within)
+
+    # ── Outcome per attempt, in the order the rules are checked ──
+    too_fast = (solve_time_ms < config.IMAGE_MIN_SOLVE_TIME_MS) & config.ENFORCE_IMAGE_MIN_SOLVE
+    no_ix = ~too_fast & (expected == 0)
+    over_limit = ~too_fast & ~no_ix & (num_clicks > click_limit(expected))
+    no_clicks = ~too_fast & ~no_ix & (num_clicks == 0)
+    scored = ~(too_fast | no_ix | over_limit | no_clicks)
+
+    matched = np.where(scored, matched, 0)
+    excess = np.where(
+        scored,
+        np.where(stray == 0, num_clicks - matched, stray),
+        np.select([no_clicks, over_limit], [0, num_clicks - expected], default=num_clicks),
     )
-    min_dist_per_click = dists.min(axis=1)  # (C,)
-    stray_clicks = int(np.sum(min_dist_per_click > tolerance))
-
-    if stray_clicks > 0:
-        # At least one click is not near any intersection
-        # Count how many intersections were matched by the valid clicks
-        matched_intersections = 0
-        used_clicks = set()
-        # Recompute with (I, C) orientation for intersection matching
-        dists_ic = dists.T  # (I, C)
-        for i in range(len(ix_arr)):
-            row = dists_ic[i]
-            order = np.argsort(row)
-            for j in order:
-                if j not in used_clicks and row[j] <= tolerance:
-                    used_clicks.add(j)
-                    matched_intersections += 1
-                    break
-
-        if matched_intersections < expected:
-            missing = expected - matched_intersections
-            return {
-                "passed": False,
-                "reason": f"missed {missing} intersection{'s' if missing != 1 else ''}",
-                "matched": matched_intersections,
-                "expected": expected,
-                "excess": stray_clicks,
-                "too_fast": False,
-            }
-        return {
-            "passed": False,
-            "reason": f"too many extra clicks ({stray_clicks})",
-            "matched": matched_intersections,
-            "expected": expected,
-            "excess": stray_clicks,
-            "too_fast": False,
-        }
-
-    # ── All clicks are near an intersection; check coverage ──────
-    # Greedy matching: for each intersection, find the closest unused click
-    matched_intersections = 0
-    used_clicks = set()
-    dists_ic = dists.T  # (I, C)
-    for i in range(len(ix_arr)):
-        row = dists_ic[i]
-        order = np.argsort(row)
-        for j in order:
-            if j not in used_clicks and row[j] <= tolerance:
-                used_clicks.add(j)
-                matched_intersections += 1
-                break
-
-    excess = len(clicks) - len(used_clicks)
-
-    if matched_intersections == expected:
-        return {
-            "passed": True,
-            "reason": "all intersections clicked",
-            "matched": matched_intersections,
-            "expected": expected,
-            "excess": excess,
-            "too_fast": False,
-        }
+    passed = np.where(no_ix, num_clicks == 0, scored & (stray == 0) & (matched == expected))
+
+    reasons: List[str] = []
+    for k in range(n):
+        if too_fast[k]:
+            reasons.append("solved too fast")
+        elif no_ix[k]:
+            # Edge case: no intersections (shouldn't happen with good generation)
+            reasons.append("no intersections expected" if num_clicks[k] == 0 else "unexpected clicks")
+        elif over_limit[k]:
+            reasons.append("too many clicks")
+        elif no_clicks[k]:
+            reasons.append("no clicks submitted")
+        elif matched[k] < expected[k]:
+            reasons.append(_missed_reason(int(expected[k] - matched[k])))
+        elif stray[k] > 0:
+            reasons.append(f"too many extra clicks ({int(stray[k])})")
+        else:
+            reasons.append("all intersections clicked")
 
-    missing = expected - matched_intersections
     return {
-        "passed": False,
-        "reason": f"missed {missing} intersection{'s' if missing != 1 else ''}",
-        "matched": matched_intersections,
+        "passed": passed,
+        "reason": reasons,
+        "matched": matched,
         "expected": expected,
         "excess": excess,
-        "too_fast": False,
+        "too_fast": too_fast,
     }
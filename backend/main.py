@@ -1,18 +1,35 @@
+import contextlib
+import functools
 import hashlib
 import json
 import math
 import random
 import time
 import uuid
-from typing import Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 import fastapi
 from fastapi.middleware.cors import CORSMiddleware
 
-from . import config, db, models, path, captcha_token
-from .rate_limit import challenge_limiter
+from . import config, db, feedback_routes, image_pool, models, path, captcha_token, replay
+from .rate_limit import challenge_limiter, client_ip, limiters
 
-app = fastapi.FastAPI(title="Ephemeral Line CAPTCHA")
+
+@contextlib.asynccontextmanager
+async def _lifespan(app: fastapi.FastAPI):
+    # Background workers run only in a served app, not on import.
+    if config.IMAGE_POOL_ENABLED:
+        image_pool.pool.start()
+    if feedback_routes.notifier.enabled:
+        feedback_routes.notifier.start()
+    try:
+        yield
+    finally:
+        image_pool.pool.stop(timeout=1.0)
+        feedback_routes.notifier.stop(timeout=1.0)
+
+
+app = fastapi.FastAPI(title="Ephemeral Line CAPTCHA", lifespan=_lifespan)
 
 # CORS: Use ALLOWED_ORIGINS env var (comma-separated) or default to localhost for dev
 import os
@@ -21,12 +38,22 @@ _allowed_origins = os.getenv(
     "http://localhost:3000"
 ).split(",")
 
+# The last middleware added runs outermost: the body limit goes first so
+# CORS wraps it and its 413 responses are readable cross-origin.
+from .body_limit import BodySizeLimitMiddleware
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    max_bytes=config.MAX_REQUEST_BODY_BYTES,
+    path_limits={"/feedback": config.FEEDBACK_MAX_BODY_BYTES},
+)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=_allowed_origins,
     allow_credentials=True,
     allow_methods=["POST", "GET", "OPTIONS"],
     allow_headers=["Content-Type"],
+    expose_headers=["X-Next-Cursor"],  # feedback pagination cursor
 )
 
 from .image_routes import router as image_router
@@ -44,6 +71,133 @@ def _challenge_tolerance(challenge_row: Dict, pointer_type: str) -> float:
     return float(challenge_row["tolerance_touch"])
 
 
+@functools.lru_cache(maxsize=1024)
+def _path_for_seed(seed: str) -> Tuple[Tuple[Tuple[float, float], ...], float]:
+    """Regenerate a challenge path from its seed, rounded exactly as save_challenge stores it."""
+    points, length = path.generate_path(seed)
+    return tuple((float(f"{x:.2f}"), float(f"{y:.2f}")) for x, y in points), length
+
+
+def _challenge_points(challenge_row, stateless: bool) -> List:
+    if stateless:
+        return challenge_row["points"]
+    return json.loads(challenge_row["points_json"])
+
+
+def _stateless_challenge(claims: Dict[str, Any]) -> Dict[str, Any]:
+    """Build a row-shaped challenge dict from sealed token claims."""
+    points, length = _path_for_seed(claims["seed"])
+    return {
+        "id": claims["cid"],
+        "seed": claims["seed"],
+        "points": points,
+        "path_length": length,
+        "ttl_ms": claims["ttl"],
+        "nonce": claims["nonce"],
+        "tolerance_mouse": claims["tm"],
+        "tolerance_touch": claims["tt"],
+        "jitter_mouse": claims["jm"],
+        "jitter_touch": claims["jt"],
+        "peek_pos": 0.0,
+        "last_peek_at": None,
+        "peek_count": 0,
+        "nonce_used": 0,
+        "created_at": claims["iat"],
+    }
+
+
+def _load_line_challenge(challenge_id: str, nonce: str, token: str) -> Tuple[Any, Dict[str, Any], bool]:
+    """
+    Resolve a line challenge, its verified token claims and whether it is stateless.
+
+    Sealed tokens are self-contained (stateless mode) and only accepted
+    while LINE_STATELESS_CHALLENGES is on; plain signed tokens refer to a
+    `challenges` row.  Raises 404 for unknown ids and 401 for bad or
+    mismatched tokens.
+    """
+    if captcha_token.is_sealed(token):
+        if not config.LINE_STATELESS_CHALLENGES:
+            raise fastapi.HTTPException(status_code=401, detail="Invalid token")
+        try:
+            claims = captcha_token.unseal(token)
+        except Exception:
+            raise fastapi.HTTPException(status_code=401, detail="Invalid token")
+        if claims.get("cid") != challenge_id or claims.get("nonce") != nonce:
+            raise fastapi.HTTPException(status_code=401, detail="Token mismatch")
+        return _stateless_challenge(claims), claims, True
+
+    challenge_row = db.get_challenge(challenge_id)
+    if not challenge_row:
+        raise fastapi.HTTPException(status_code=404, detail="Unknown challenge")
+    try:
+        claims = captcha_token.verify(token)
+    except Exception:
+        raise fastapi.HTTPException(status_code=401, detail="Invalid token")
+    if (
+        claims.get("typ") == "peek"
+        or claims.get("cid") != challenge_id
+        or claims.get("nonce") != nonce
+    ):
+        raise fastapi.HTTPException(status_code=401, detail="Token mismatch")
+    return challenge_row, claims, False
+
+
+def _read_peek_state(
+    peek_state: Optional[str],
+    challenge_row: Any,
+    challenge_id: str,
+    nonce: str,
+) -> Tuple[float, Optional[float], int]:
+    """
+    Return (peek_pos, last_peek_at, peek_count) carried by *peek_state*.
+
+    Peek progress travels with the client as a signed state token rather than
+    being written to the DB on every peek.  With no token the challenge row's
+    initial values apply (always the defaults for stateless challenges).
+    """
+    if not peek_state:
+        row_keys = challenge_row.keys()
+        last_pos = float(challenge_row["peek_pos"]) if "peek_pos" in row_keys and challenge_row["peek_pos"] is not None else 0.0
+        last_peek_at = float(challenge_row["last_peek_at"]) if challenge_row["last_peek_at"] else None
+        peek_count = int(challenge_row["peek_count"]) if "peek_count" in row_keys and challenge_row["peek_count"] is not None else 0
+        return last_pos, last_peek_at, peek_count
+    try:
+        state = captcha_token.verify(peek_state)
+    except Exception:
+        raise fastapi.HTTPException(status_code=401, detail="Invalid peek state")
+    if state.get("typ") != "peek" or state.get("cid") != challenge_id or state.get("nonce") != nonce:
+        raise fastapi.HTTPException(status_code=401, detail="Peek state mismatch")
+    # Issued states always have n >= 1 and pos >= 0; anything else was not
+    # produced by _next_peek_state.
+    if int(state["n"]) < 1 or float(state["pos"]) < 0:
+        raise fastapi.HTTPException(status_code=401, detail="Invalid peek state")
+    return float(state["pos"]), state["at"], int(state["n"])
+
+
+def _next_peek_state(
+    claims: Dict[str, Any],
+    peek_count: int,
+    new_pos: float,
+    now: float,
+) -> str:
+    """
+    Sign state *peek_count + 1* at progress *new_pos*.
+
+    Nothing is stored: the successor's ``n`` and ``pos`` never go below
+    the state it was derived from, and it is bound to this challenge's
+    ``cid``/``nonce``, so the chain is checked from the signed state alone.
+    The counters are written once, at verify.
+    """
+    return captcha_token.sign({
+        "typ": "peek",
+        "cid": claims["cid"],
+        "nonce": claims["nonce"],
+        "n": peek_count + 1,
+        "pos": new_pos,
+        "at": now,
+    })
+
+
 def _compute_trajectory_hash(trajectory: List[models.TrajectorySample], nonce: str, challenge_id: str) -> str:
     """Compute SHA-256 hash of trajectory data + nonce + challenge_id for client binding."""
     # Normalize trajectory to prevent floating point differences
@@ -96,11 +250,10 @@ def _percentile(values: List[float], pct: float) -> float:
 
 @app.post("/captcha/line/new", response_model=models.NewChallengeResponse)
 def new_challenge(request: fastapi.Request) -> models.NewChallengeResponse:
-    client_ip = request.client.host if request.client else "unknown"
-    challenge_limiter.check(client_ip)
+    challenge_limiter.check(client_ip(request))
     challenge_id = uuid.uuid4().hex
     seed = uuid.uuid4().hex
-    points, length = path.generate_path(seed)
+    points, length = _path_for_seed(seed)
     ttl_ms = config.CHALLENGE_TTL_MS
     expires_at = time.time() + ttl_ms / 1000.0
     nonce = uuid.uuid4().hex
@@ -114,19 +267,6 @@ def new_challenge(request: fastapi.Request) -> models.NewChallengeResponse:
     tolerance_mouse = max(1.0, base_mouse + jitter_mouse)
     tolerance_touch = max(1.0, base_touch + jitter_touch)
 
-    db.save_challenge(
-        challenge_id=challenge_id,
-        seed=seed,
-        points=[[float(f"{x:.2f}"), float(f"{y:.2f}")] for x, y in points],
-        path_length=length,
-        ttl_ms=ttl_ms,
-        nonce=nonce,
-        tolerance_mouse=tolerance_mouse,
-        tolerance_touch=tolerance_touch,
-        jitter_mouse=jitter_mouse,
-        jitter_touch=jitter_touch,
-    )
-
     token_payload = {
         "cid": challenge_id,
         "seed": seed,
@@ -134,7 +274,29 @@ def new_challenge(request: fastapi.Request) -> models.NewChallengeResponse:
         "iat": issued_at,
         "nonce": nonce,
     }
-    signed_token = captcha_token.sign(token_payload)
+    if config.LINE_STATELESS_CHALLENGES:
+        # Everything verify needs rides in the encrypted token; no DB write.
+        signed_token = captcha_token.seal({
+            **token_payload,
+            "tm": tolerance_mouse,
+            "tt": tolerance_touch,
+            "jm": jitter_mouse,
+            "jt": jitter_touch,
+        })
+    else:
+        db.save_challenge(
+            challenge_id=challenge_id,
+            seed=seed,
+            points=[list(p) for p in points],
+            path_length=length,
+            ttl_ms=ttl_ms,
+            nonce=nonce,
+            tolerance_mouse=tolerance_mouse,
+            tolerance_touch=tolerance_touch,
+            jitter_mouse=jitter_mouse,
+            jitter_touch=jitter_touch,
+        )
+        signed_token = captcha_token.sign(token_payload)
 
     return models.NewChallengeResponse(
         challengeId=challenge_id,
@@ -157,12 +319,17 @@ def new_challenge(request: fastapi.Request) -> models.NewChallengeResponse:
 
 
 @app.post("/captcha/line/peek", response_model=models.PeekResponse)
-def peek_path(payload: models.PeekRequest):
-    challenge_row = db.get_challenge(payload.challengeId)
-    if not challenge_row:
-        raise fastapi.HTTPException(status_code=404, detail="Unknown challenge")
+def peek_path(payload: models.PeekRequest, request: fastapi.Request):
+    limiters["peek"].check(client_ip(request))
+    limiters["peek_challenge"].check(payload.challengeId)
+    challenge_row, claims, stateless = _load_line_challenge(
+        payload.challengeId, payload.nonce, payload.token,
+    )
     row_keys = challenge_row.keys()
-    nonce_used = challenge_row["nonce_used"] if "nonce_used" in row_keys else 0
+    if stateless:
+        nonce_used = replay.line_nonces.is_used(claims["nonce"], claims["iat"])
+    else:
+        nonce_used = challenge_row["nonce_used"] if "nonce_used" in row_keys else 0
     if nonce_used:
         raise fastapi.HTTPException(status_code=410, detail="Challenge already used")
 
@@ -170,31 +337,24 @@ def peek_path(payload: models.PeekRequest):
     ttl_ms = int(challenge_row["ttl_ms"])
     expires_at = created_at + ttl_ms / 1000.0
 
-    try:
-        claims = captcha_token.verify(payload.token)
-    except Exception:
-        raise fastapi.HTTPException(status_code=401, detail="Invalid token")
-    if claims.get("cid") != payload.challengeId or claims.get("nonce") != payload.nonce:
-        raise fastapi.HTTPException(status_code=401, detail="Token mismatch")
-
     if time.time() > expires_at:
         raise fastapi.HTTPException(status_code=410, detail="Challenge expired")
 
-    points = json.loads(challenge_row["points_json"])
+    points = _challenge_points(challenge_row, stateless)
     now = time.time()
-    last_peek_at = float(challenge_row["last_peek_at"]) if challenge_row["last_peek_at"] else None
+    last_pos, last_peek_at, peek_count = _read_peek_state(
+        payload.peekState, challenge_row, payload.challengeId, payload.nonce,
+    )
     if config.ENFORCE_PEEK_RATE and last_peek_at is not None:
         since_ms = (now - last_peek_at) * 1000.0
         if since_ms < config.PEEK_MIN_INTERVAL_MS:
             raise fastapi.HTTPException(status_code=429, detail="Peek rate limit")
 
-    peek_count = int(challenge_row["peek_count"]) if "peek_count" in row_keys and challenge_row["peek_count"] is not None else 0
     if config.ENFORCE_PEEK_BUDGET and peek_count >= config.PEEK_MAX_COUNT:
         raise fastapi.HTTPException(status_code=429, detail="Peek budget exceeded")
 
     cursor = (payload.cursor[0], payload.cursor[1])
     pos, dist = path.position_and_distance(points, cursor)
-    last_pos = float(challenge_row["peek_pos"]) if "peek_pos" in row_keys and challenge_row["peek_pos"] is not None else 0.0
 
     if config.ENFORCE_PEEK_DISTANCE:
         tol_mouse = (
@@ -209,12 +369,12 @@ def peek_path(payload: models.PeekRequest):
         )
         max_tol = max(tol_mouse, tol_touch)
         if dist > max_tol * config.PEEK_DISTANCE_FACTOR:
-            db.update_peek_progress(payload.challengeId, last_pos, now, peek_count + 1)
             return models.PeekResponse(
                 ahead=[],
                 behind=[],
                 distanceToEnd=float(f"{path.distance_to_end(points, cursor):.2f}"),
                 finish=None,
+                peekState=_next_peek_state(claims, peek_count, last_pos, now),
             )
 
     if config.ENFORCE_PEEK_STATE and last_peek_at is not None:
@@ -246,8 +406,6 @@ def peek_path(payload: models.PeekRequest):
     else:
         effective_ahead = base_ahead_px
 
-    db.update_peek_progress(payload.challengeId, new_pos, now, peek_count + 1)
-
     ahead_polyline = path.lookahead(
         points,
         cursor,
@@ -261,14 +419,17 @@ def peek_path(payload: models.PeekRequest):
         behind=[],
         distanceToEnd=float(f"{distance_to_end:.2f}"),
         finish=[float(f"{points[-1][0]:.2f}"), float(f"{points[-1][1]:.2f}")] if finish_point else None,
+        peekState=_next_peek_state(claims, peek_count, new_pos, now),
     )
 
 
 @app.post("/captcha/line/verify", response_model=models.VerifyResponse)
-def verify_attempt(payload: models.VerifyRequest):
-    challenge_row = db.get_challenge(payload.challengeId)
-    if not challenge_row:
-        raise fastapi.HTTPException(status_code=404, detail="Unknown challenge")
+def verify_attempt(payload: models.VerifyRequest, request: fastapi.Request):
+    limiters["verify"].check(client_ip(request))
+    limiters["verify_challenge"].check(payload.challengeId)
+    challenge_row, claims, stateless = _load_line_challenge(
+        payload.challengeId, payload.nonce, payload.token,
+    )
     row_keys = challenge_row.keys()
     nonce_used = challenge_row["nonce_used"] if "nonce_used" in row_keys else 0
     if nonce_used:
@@ -280,16 +441,20 @@ def verify_attempt(payload: models.VerifyRequest):
     now = time.time()
     ttl_expired = now > expires_at
 
-    try:
-        claims = captcha_token.verify(payload.token)
-    except Exception:
-        raise fastapi.HTTPException(status_code=401, detail="Invalid token")
-    if (
-        claims.get("cid") != payload.challengeId
-        or claims.get("nonce") != payload.nonce
-        or claims.get("ttl") != ttl_ms
-    ):
+    if claims.get("ttl") != ttl_ms:
         raise fastapi.HTTPException(status_code=401, detail="Token mismatch")
+    peek_pos, last_peek_at, peek_count = _read_peek_state(
+        payload.peekState, challenge_row, payload.challengeId, payload.nonce,
+    )
+
+    # Stateless challenges are consumed up front. An expired one may already
+    # have aged out of the replay filter, so it cannot be consumed; refuse it
+    # here, before anything is logged, so re-posting it costs nothing.
+    if stateless:
+        if ttl_expired:
+            raise fastapi.HTTPException(status_code=410, detail="Challenge expired")
+        if not replay.line_nonces.consume(claims["nonce"], claims["iat"]):
+            raise fastapi.HTTPException(status_code=410, detail="Challenge already used")
 
     # Verify trajectory hash if provided (client binding)
     trajectory_hash_valid = True
@@ -332,7 +497,7 @@ def verify_attempt(payload: models.VerifyRequest):
     ballistic_final_decel_min = behaviour.get("ballistic_final_decel_min", config.BALLISTIC_FINAL_DECEL_MIN)
     hesitation_min_count = int(behaviour.get("hesitation_min_count", config.HESITATION_MIN_COUNT))
 
-    path_points = json.loads(challenge_row["points_json"])
+    path_points = _challenge_points(challenge_row, stateless)
     cums = path.cumulative_lengths(path_points)
     curvatures = path.curvature_profile(path_points)
     curvature_values = [c for c in curvatures if c > 0]
@@ -713,12 +878,14 @@ def verify_attempt(payload: models.VerifyRequest):
             "hesitation_flag": hesitation_flag,
             "hesitation_count": hesitation_count,
             "hesitation_at_curves": hesitation_at_curves,
+            "peek_count": peek_count,
             "trajectory": [s.dict() for s in payload.trajectory],
         }
     )
 
-    # Mark nonce used to prevent replay
-    db.mark_challenge_used(payload.challengeId)
+    # Mark nonce used to prevent replay, persisting the final peek counters
+    if not stateless:
+        db.finish_challenge(payload.challengeId, peek_pos, last_peek_at, peek_count)
 
     return models.VerifyResponse(
         passed=passed,
@@ -763,12 +930,8 @@ def verify_attempt(payload: models.VerifyRequest):
             "curvatureCheckApplied": curvature_check_applied,
             "curvatureCheckInconclusive": curvature_check_inconclusive,
             "curvatureContrastRad": curvature_contrast_rad,
-            "peekCount": int(challenge_row["peek_count"]) if "peek_count" in row_keys and challenge_row["peek_count"] is not None else 0,
-            "peekEfficiency": (
-                (int(challenge_row["peek_count"]) / max(1, float(challenge_row["path_length"]) / 100))
-                if "peek_count" in row_keys and challenge_row["peek_count"] is not None
-                else None
-            ),
+            "peekCount": peek_count,
+            "peekEfficiency": peek_count / max(1, float(challenge_row["path_length"]) / 100),
             "ballisticFlag": ballistic_flag,
             "ballisticFirstRatio": ballistic_first_ratio,
             "ballisticFinalRatio": ballistic_final_ratio,
@@ -781,7 +944,8 @@ def verify_attempt(payload: models.VerifyRequest):
 
 
 @app.post("/questionnaire")
-def submit_questionnaire(payload: models.QuestionnaireRequest):
+def submit_questionnaire(payload: models.QuestionnaireRequest, request: fastapi.Request):
+    limiters["questionnaire"].check(client_ip(request))
     response_id = uuid.uuid4().hex
     db.save_questionnaire_response(
         {
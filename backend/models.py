@@ -30,6 +30,7 @@ class PeekRequest(BaseModel):
     token: str
     cursor: List[float]
     pointerType: Optional[Literal["mouse", "touch", "pen"]] = "mouse"
+    peekState: Optional[str] = None  # signed state from the previous peek response
 
 
 class PeekResponse(BaseModel):
@@ -37,6 +38,7 @@ class PeekResponse(BaseModel):
     behind: List[List[float]]
     distanceToEnd: float
     finish: Optional[List[float]] = None
+    peekState: Optional[str] = None  # echo on the next peek and on verify
 
 
 class VerifyRequest(BaseModel):
@@ -48,9 +50,10 @@ class VerifyRequest(BaseModel):
     osFamily: Optional[str] = None
     browserFamily: Optional[str] = None
     devicePixelRatio: Optional[float] = None
-    trajectory: List[TrajectorySample]
+    trajectory: List[TrajectorySample] = Field(..., max_length=config.LINE_MAX_TRAJECTORY_SAMPLES)
     trajectoryHash: Optional[str] = None  # Client-computed hash for binding
     clientTimingMs: Optional[float] = None  # Client-reported total duration
+    peekState: Optional[str] = None  # final signed peek state
 
     @validator("trajectory")
     def trajectory_has_samples(cls, v: List[TrajectorySample]) -> List[TrajectorySample]:
@@ -101,7 +104,7 @@ class ImageClickCoordinate(BaseModel):
 class ImageVerifyRequest(BaseModel):
     challengeId: str
     token: str
-    clicks: List[ImageClickCoordinate]
+    clicks: List[ImageClickCoordinate] = Field(..., max_length=config.IMAGE_MAX_CLICKS)
     pointerType: Optional[Literal["mouse", "touch", "pen"]] = "mouse"
 
 
@@ -1,8 +1,8 @@
 import math
 import random
-from typing import List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
-from . import config
+from . import config, template_library
 
 Point = Tuple[float, float]
 
@@ -245,21 +245,8 @@ PATH_FAMILIES = [
 ]
 
 
-def generate_path(seed: str) -> Tuple[List[Point], float]:
-    """
-    Generate a smooth path from one of several families.
-    Returns the sampled points and approximate length.
-
-    Path families:
-    - horizontal_lr: left to right (classic)
-    - horizontal_rl: right to left
-    - vertical_tb: top to bottom
-    - vertical_bt: bottom to top
-    - diagonal: corner to corner
-    - s_curve: S-shaped with two bends (better curvature testing)
-    """
-    rnd = random.Random(seed)
-
+def _generate_family_path(rnd: random.Random) -> Tuple[str, List[Point], float]:
+    """Draw a family by weight and generate a path from it with *rnd*."""
     # Weighted random selection of path family
     total_weight = sum(f[3] for f in PATH_FAMILIES)
     choice = rnd.uniform(0, total_weight)
@@ -280,11 +267,120 @@ def generate_path(seed: str) -> Tuple[List[Point], float]:
         length = _approx_length(pts)
 
         if config.PATH_TRAVEL_PX_MIN <= length <= config.PATH_TRAVEL_PX_MAX:
-            return pts, length
+            return family_name, pts, length
         if attempts >= 10:
             # Accept closest we found after several tries to avoid dead loops.
+            return family_name, pts, length
+
+
+def generate_path(seed: str) -> Tuple[List[Point], float]:
+    """
+    Generate a smooth path from one of several families.
+    Returns the sampled points and approximate length.
+
+    Path families:
+    - horizontal_lr: left to right (classic)
+    - horizontal_rl: right to left
+    - vertical_tb: top to bottom
+    - vertical_bt: bottom to top
+    - diagonal: corner to corner
+    - s_curve: S-shaped with two bends (better curvature testing)
+
+    With PATH_TEMPLATES_ENABLED and a template library on disk, the path is
+    instead a randomly placed template (see instance_path_template).
+    """
+    rnd = random.Random(seed)
+
+    if config.PATH_TEMPLATES_ENABLED:
+        library = load_path_templates()
+        if library is not None:
+            pts, length, _ = instance_path_template(library, rnd)
             return pts, length
 
+    _, pts, length = _generate_family_path(rnd)
+    return pts, length
+
+
+# ─── Template library ────────────────────────────────────────────────────
+
+# Instanced paths must stay this far inside the canvas
+_TEMPLATE_MARGIN_PX = 20
+
+
+def _template_box() -> Tuple[float, float, float, float]:
+    m = _TEMPLATE_MARGIN_PX
+    return (m, m, config.CANVAS_WIDTH_PX - m, config.CANVAS_HEIGHT_PX - m)
+
+
+def build_path_templates(count: int, seed: int = 0) -> Dict[str, Any]:
+    """
+    Build a library of *count* vetted paths from a fixed *seed*.
+
+    Each template keeps its family, points (rounded to 0.001 px), length
+    and curvature profile, both computed from the rounded points.  Paths
+    outside the travel-length bounds or the template box are dropped.
+    """
+    rnd = random.Random(seed)
+    x0, y0, x1, y1 = _template_box()
+    templates: List[Dict[str, Any]] = []
+    while len(templates) < count:
+        family, pts, _ = _generate_family_path(random.Random(rnd.getrandbits(64)))
+        pts = [(round(x, 3), round(y, 3)) for x, y in pts]
+        length = _approx_length(pts)
+        if not config.PATH_TRAVEL_PX_MIN <= length <= config.PATH_TRAVEL_PX_MAX:
+            continue
+        if not all(x0 <= x <= x1 and y0 <= y <= y1 for x, y in pts):
+            continue
+        templates.append({
+            "family": family,
+            "points": [list(p) for p in pts],
+            "length": length,
+            "curvature": curvature_profile(pts),
+        })
+    return {
+        "kind": "path",
+        "canvas": [config.CANVAS_WIDTH_PX, config.CANVAS_HEIGHT_PX],
+        "seed": seed,
+        "templates": templates,
+    }
+
+
+def load_path_templates() -> Optional[Dict[str, Any]]:
+    """The path template library for the current canvas, or None."""
+    return template_library.load_library(
+        config.PATH_TEMPLATE_LIBRARY,
+        kind="path",
+        canvas=[config.CANVAS_WIDTH_PX, config.CANVAS_HEIGHT_PX],
+    )
+
+
+def instance_path_template(
+    library: Dict[str, Any], rnd: random.Random,
+) -> Tuple[List[Point], float, List[float]]:
+    """
+    Pick a template and place it with a random similarity transform.
+
+    Returns the points, length and curvature profile.  Length scales with
+    the transform and the scale is drawn so it stays within the travel
+    bounds; turning angles are invariant, so the curvature profile is the
+    template's own (reversed along with the points half of the time).
+    """
+    template = library["templates"][rnd.randrange(len(library["templates"]))]
+    length = template["length"]
+    scale_range = (
+        max(template_library.TEMPLATE_SCALE_RANGE[0], config.PATH_TRAVEL_PX_MIN / length),
+        min(template_library.TEMPLATE_SCALE_RANGE[1], config.PATH_TRAVEL_PX_MAX / length),
+    )
+    transform, scale = template_library.fit_similarity(
+        template["points"], _template_box(), rnd, scale_range,
+    )
+    pts = [(x, y) for x, y in template_library.apply_similarity(transform, template["points"])]
+    curvature = list(template["curvature"])
+    if rnd.random() < 0.5:
+        pts.reverse()
+        curvature.reverse()
+    return pts, length * scale, curvature
+
 
 def min_distance_to_polyline(point: Point, polyline: List[Point]) -> float:
     """
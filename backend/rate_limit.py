@@ -1,30 +1,297 @@
+import sqlite3
+import threading
 import time
-from collections import defaultdict
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
 
 import fastapi
 
+from . import config
+
+
+def _roll(slot_window: int, prev: int, curr: int, window: int) -> Tuple[int, int]:
+    """Shift (prev, curr) counts forward to *window*."""
+    if window == slot_window:
+        return prev, curr
+    if window == slot_window + 1:
+        return curr, 0
+    return 0, 0
+
+
+def _estimate(prev: int, curr: int, now: float, window: int, window_s: int) -> float:
+    """Sliding-window estimate: previous window weighted by its remaining overlap."""
+    elapsed_frac = (now - window * window_s) / window_s
+    return prev * (1.0 - elapsed_frac) + curr
+
+
+# ─── Backends ────────────────────────────────────────────────────────────
+
+
+class RateLimitBackend:
+    """
+    Storage for sliding-window counters.
+
+    ``acquire`` must atomically roll the key's window, decide whether one more
+    request fits under *max_requests*, and record it if so.  Any object with
+    ``acquire`` and ``stats`` can be handed to ``RateLimiter`` — e.g. a client
+    for a small shared counter service in multi-node deployments.
+    """
+
+    def acquire(self, scope: str, key: str, window_s: int, max_requests: int, now: float) -> bool:
+        raise NotImplementedError
+
+    def stats(self, scope: str) -> Dict[str, int]:
+        return {}
+
+
+class MemoryBackend(RateLimitBackend):
+    """
+    Per-process counters with a bounded, LRU-ordered key table.
+
+    Keys idle for two full windows carry no information and are dropped as
+    they age out; if more than *max_keys* are active at once, the least
+    recently seen key is evicted.  Keys are kept in one LRU queue per window
+    length, so within a queue expiry follows LRU order and pruning can stop
+    at the first live key even when scopes with different windows share a
+    backend.
+    """
+
+    def __init__(self, max_keys: int = 10_000):
+        self.max_keys = max_keys
+        # window_s -> (scope, key) -> [window_index, prev_count, curr_count, expires_at]
+        self._state: "Dict[int, OrderedDict[Tuple[str, str], list]]" = {}
+        self._lock = threading.Lock()
+        self.evicted = 0
+        self.expired = 0
+
+    def _prune(self, now: float) -> None:
+        for queue in self._state.values():
+            while queue:
+                key, slot = next(iter(queue.items()))
+                if slot[3] > now:
+                    break
+                del queue[key]
+                self.expired += 1
+        while sum(len(queue) for queue in self._state.values()) > self.max_keys:
+            # Least recently seen head across queues: last seen = expires_at - 2 * window_s.
+            window_s = min(
+                (w for w, queue in self._state.items() if queue),
+                key=lambda w: next(iter(self._state[w].values()))[3] - 2 * w,
+            )
+            self._state[window_s].popitem(last=False)
+            self.evicted += 1
+
+    def acquire(self, scope: str, key: str, window_s: int, max_requests: int, now: float) -> bool:
+        window = int(now // window_s)
+        with self._lock:
+            queue = self._state.setdefault(window_s, OrderedDict())
+            slot = queue.get((scope, key))
+            if slot is None:
+                slot = [window, 0, 0, now + 2 * window_s]
+                queue[(scope, key)] = slot
+            else:
+                queue.move_to_end((scope, key))
+                slot[1], slot[2] = _roll(slot[0], slot[1], slot[2], window)
+                slot[0] = window
+                slot[3] = now + 2 * window_s
+
+            allowed = _estimate(slot[1], slot[2], now, window, window_s) < max_requests
+            if allowed:
+                slot[2] += 1
+            self._prune(now)
+            return allowed
+
+    def stats(self, scope: str) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "tracked_keys": sum(1 for queue in self._state.values() for s, _ in queue if s == scope),
+                "evicted": self.evicted,
+                "expired": self.expired,
+            }
+
+
+class SQLiteBackend(RateLimitBackend):
+    """
+    Counters in a SQLite table shared by every worker process on the host.
+
+    Each ``acquire`` runs inside a ``BEGIN IMMEDIATE`` transaction, so the
+    read-roll-increment is atomic across processes.  The table lives in its
+    own file (default ``DATA_DIR/rate_limit.db``) so limiter traffic does not
+    contend with the challenge and attempt-log writes in ``captcha.db``.
+    Idle rows are swept every *sweep_every* calls and the row count is capped
+    at *max_keys* per scope.  Each thread keeps one open connection.
+    """
+
+    def __init__(self, db_path: Optional[Path] = None, max_keys: int = 10_000, sweep_every: int = 256):
+        self._db_path = db_path
+        self.max_keys = max_keys
+        self.sweep_every = sweep_every
+        self._calls = 0
+        self._local = threading.local()
+        self.evicted = 0
+        self.expired = 0
+
+    def _get_conn(self) -> sqlite3.Connection:
+        path = self._db_path or config.DATA_DIR / config.RATE_LIMIT_DB_NAME
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.path == path:
+            return conn
+        if conn is not None:
+            conn.close()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(path, timeout=5.0, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS rate_limits (
+                scope TEXT NOT NULL,
+                key TEXT NOT NULL,
+                window_idx INTEGER NOT NULL,
+                prev_count INTEGER NOT NULL,
+                curr_count INTEGER NOT NULL,
+                last_seen REAL NOT NULL,
+                PRIMARY KEY (scope, key)
+            )
+            """
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_rate_limits_seen ON rate_limits (scope, last_seen)"
+        )
+        self._local.conn, self._local.path = conn, path
+        return conn
+
+    def _sweep(self, conn: sqlite3.Connection, scope: str, window_s: int, now: float) -> None:
+        cur = conn.execute(
+            "DELETE FROM rate_limits WHERE scope = ? AND last_seen <= ?",
+            (scope, now - 2 * window_s),
+        )
+        self.expired += max(0, cur.rowcount)
+        cur = conn.execute(
+            """
+            DELETE FROM rate_limits WHERE scope = ? AND key IN (
+                SELECT key FROM rate_limits WHERE scope = ?
+                ORDER BY last_seen DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (scope, scope, self.max_keys),
+        )
+        self.evicted += max(0, cur.rowcount)
+
+    def acquire(self, scope: str, key: str, window_s: int, max_requests: int, now: float) -> bool:
+        window = int(now // window_s)
+        conn = self._get_conn()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT window_idx, prev_count, curr_count FROM rate_limits WHERE scope = ? AND key = ?",
+                (scope, key),
+            ).fetchone()
+            prev, curr = _roll(row[0], row[1], row[2], window) if row else (0, 0)
+            allowed = _estimate(prev, curr, now, window, window_s) < max_requests
+            if allowed:
+                curr += 1
+            conn.execute(
+                """
+                INSERT INTO rate_limits (scope, key, window_idx, prev_count, curr_count, last_seen)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (scope, key) DO UPDATE SET
+                    window_idx = excluded.window_idx,
+                    prev_count = excluded.prev_count,
+                    curr_count = excluded.curr_count,
+                    last_seen = excluded.last_seen
+                """,
+                (scope, key, window, prev, curr, now),
+            )
+            self._calls += 1
+            if self._calls % self.sweep_every == 0:
+                self._sweep(conn, scope, window_s, now)
+            conn.execute("COMMIT")
+            return allowed
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+
+    def stats(self, scope: str) -> Dict[str, int]:
+        tracked = self._get_conn().execute(
+            "SELECT COUNT(*) FROM rate_limits WHERE scope = ?", (scope,)
+        ).fetchone()[0]
+        return {"tracked_keys": tracked, "evicted": self.evicted, "expired": self.expired}
+
+
+_BACKENDS = {
+    "memory": MemoryBackend,
+    "sqlite": SQLiteBackend,
+}
+
+
+def make_backend(name: str) -> RateLimitBackend:
+    try:
+        return _BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f"unknown rate limit backend: {name!r}")
+
+
+# ─── Limiter ─────────────────────────────────────────────────────────────
+
 
 class RateLimiter:
-    def __init__(self, window_s: int, max_requests: int):
+    """
+    Sliding-window counter rate limiter.
+
+    Each key holds a fixed three-slot state (window index, previous window
+    count, current window count) instead of a list of timestamps.  The
+    request rate is estimated as ``prev * (1 - elapsed_frac) + curr``, which
+    approximates a true sliding log to within one window's worth of skew.
+    Counter storage is delegated to a ``RateLimitBackend``; *scope* keeps
+    limiters that share a backend from sharing counts.
+    """
+
+    def __init__(
+        self,
+        window_s: int,
+        max_requests: int,
+        scope: str = "default",
+        backend: Optional[RateLimitBackend] = None,
+    ):
         self.window_s = window_s
         self.max_requests = max_requests
-        self._log: dict[str, list[float]] = defaultdict(list)
+        self.scope = scope
+        self.backend = backend or MemoryBackend()
+        self.rejected = 0
 
     def check(self, key: str) -> None:
-        now = time.time()
-        cutoff = now - self.window_s
-        self._log[key] = [t for t in self._log[key] if t > cutoff]
-        if len(self._log[key]) >= self.max_requests:
+        if not self.backend.acquire(self.scope, key, self.window_s, self.max_requests, time.time()):
+            self.rejected += 1
             raise fastapi.HTTPException(
                 status_code=429,
                 detail="Rate limit exceeded. Try again shortly.",
             )
-        self._log[key].append(now)
 
+    def stats(self) -> Dict[str, int]:
+        return {"rejected": self.rejected, **self.backend.stats(self.scope)}
+
+
+def client_ip(request: fastapi.Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+
+# Per-IP scopes share one backend so the SQLite file (if any) is opened once;
+# scopes keyed on client-supplied challenge ids get a separate one so random
+# ids cannot evict the per-IP counters.
+_backend = make_backend(config.RATE_LIMIT_BACKEND)
+_id_backend = make_backend(config.RATE_LIMIT_BACKEND)
 
-# Generous for CAPTCHA endpoints — 60 req/60s to handle computer lab NAT
-# where multiple participants share a single public IP address.
-challenge_limiter = RateLimiter(window_s=60, max_requests=60)
+limiters: Dict[str, RateLimiter] = {
+    name: RateLimiter(
+        window_s=policy["window_s"],
+        max_requests=policy["max_requests"],
+        scope=name,
+        backend=_id_backend if policy.get("key") == "challenge" else _backend,
+    )
+    for name, policy in config.RATE_LIMIT_POLICIES.items()
+}
 
-# Strict for feedback
-feedback_limiter = RateLimiter(window_s=60, max_requests=3)
+challenge_limiter = limiters["challenge"]
+feedback_limiter = limiters["feedback"]
@@ -0,0 +1,196 @@
+"""
+Single-use nonce stores for stateless line challenges.
+
+Stateless line challenges have no DB row to flip ``nonce_used`` on, so
+single use is enforced here instead.  Two stores implement the same
+``consume`` / ``is_used`` interface (selected by ``config.REPLAY_STORE``):
+
+* ``SQLiteReplayStore`` (default) keeps used nonces in its own SQLite file
+  (``DATA_DIR / REPLAY_DB_NAME``), shared by every uvicorn worker on the
+  host.  A nonce replayed on another worker is still rejected.
+* ``ReplayFilter`` is a per-process time-partitioned Bloom filter.  Nonces
+  are bucketed by the issue time carried in their token; a nonce can only
+  be valid for one TTL after issue, so buckets older than that are dropped
+  wholesale — memory is bounded by (TTL / partition_s + 1) filters
+  regardless of traffic.  False positives reject a fresh nonce as "already
+  used"; replay across workers is not detected, so use it only behind a
+  single worker or sticky routing.
+
+Neither store spans hosts: multi-node deployments need sticky routing (or
+a shared store implementing the same interface).
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from . import config
+
+
+class _Bloom:
+    def __init__(self, num_bits: int, num_hashes: int):
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        self.bits = bytearray((num_bits + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        # Kirsch–Mitzenmacher double hashing: g_i = h1 + i·h2
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, item: str) -> bool:
+        """Insert *item*; return True if it was (probably) already present."""
+        present = True
+        for pos in self._positions(item):
+            byte, bit = divmod(pos, 8)
+            if not self.bits[byte] & (1 << bit):
+                present = False
+                self.bits[byte] |= 1 << bit
+        return present
+
+    def __contains__(self, item: str) -> bool:
+        for pos in self._positions(item):
+            byte, bit = divmod(pos, 8)
+            if not self.bits[byte] & (1 << bit):
+                return False
+        return True
+
+
+class ReplayFilter:
+    def __init__(
+        self,
+        max_age_s: float,
+        partition_s: float,
+        num_bits: int,
+        num_hashes: int,
+    ):
+        self.max_age_s = max_age_s
+        self.partition_s = partition_s
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        self._partitions: Dict[int, _Bloom] = {}
+        self._lock = threading.Lock()
+
+    def _partition(self, issued_at: float, create: bool) -> Optional[_Bloom]:
+        now = time.time()
+        oldest = int((now - self.max_age_s) // self.partition_s)
+        for idx in [i for i in self._partitions if i < oldest]:
+            del self._partitions[idx]
+        idx = int(issued_at // self.partition_s)
+        if idx < oldest:
+            return None
+        bloom = self._partitions.get(idx)
+        if bloom is None and create:
+            bloom = self._partitions[idx] = _Bloom(self.num_bits, self.num_hashes)
+        return bloom
+
+    def is_used(self, nonce: str, issued_at: float) -> bool:
+        with self._lock:
+            bloom = self._partition(issued_at, create=False)
+            return bloom is not None and nonce in bloom
+
+    def consume(self, nonce: str, issued_at: float) -> bool:
+        """
+        Mark *nonce* used.  Returns False if it had already been used.
+
+        Nonces issued before the retention horizon are reported as used —
+        their tokens are past TTL and can no longer be tracked.
+        """
+        with self._lock:
+            bloom = self._partition(issued_at, create=True)
+            if bloom is None:
+                return False
+            return not bloom.add(nonce)
+
+
+class SQLiteReplayStore:
+    """
+    Used nonces in a SQLite table shared by every worker process on the host.
+
+    ``consume`` is a single ``INSERT OR IGNORE`` on the primary key, so two
+    workers racing on one nonce cannot both succeed.  Rows expire *max_age_s*
+    after issue and are swept every *sweep_every* calls.  Each thread keeps
+    one open connection.
+    """
+
+    def __init__(self, max_age_s: float, db_path: Optional[Path] = None, sweep_every: int = 256):
+        self.max_age_s = max_age_s
+        self._db_path = db_path
+        self.sweep_every = sweep_every
+        self._calls = 0
+        self._local = threading.local()
+
+    def _get_conn(self) -> sqlite3.Connection:
+        path = self._db_path or config.DATA_DIR / config.REPLAY_DB_NAME
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.path == path:
+            return conn
+        if conn is not None:
+            conn.close()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(path, timeout=5.0, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS used_nonces (
+                nonce TEXT PRIMARY KEY,
+                expires_at REAL NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_used_nonces_expiry ON used_nonces (expires_at)")
+        self._local.conn, self._local.path = conn, path
+        return conn
+
+    def _sweep(self, conn: sqlite3.Connection, now: float) -> None:
+        self._calls += 1
+        if self._calls % self.sweep_every == 0:
+            conn.execute("DELETE FROM used_nonces WHERE expires_at <= ?", (now,))
+
+    def is_used(self, nonce: str, issued_at: float) -> bool:
+        if issued_at + self.max_age_s <= time.time():
+            return True
+        row = self._get_conn().execute(
+            "SELECT 1 FROM used_nonces WHERE nonce = ?", (nonce,)
+        ).fetchone()
+        return row is not None
+
+    def consume(self, nonce: str, issued_at: float) -> bool:
+        """
+        Mark *nonce* used.  Returns False if it had already been used.
+
+        Nonces issued before the retention horizon are reported as used.
+        """
+        now = time.time()
+        expires_at = issued_at + self.max_age_s
+        if expires_at <= now:
+            return False
+        conn = self._get_conn()
+        cur = conn.execute(
+            "INSERT OR IGNORE INTO used_nonces (nonce, expires_at) VALUES (?, ?)",
+            (nonce, expires_at),
+        )
+        self._sweep(conn, now)
+        return cur.rowcount == 1
+
+
+def make_store(name: str):
+    max_age_s = config.CHALLENGE_TTL_MS / 1000.0
+    if name == "sqlite":
+        return SQLiteReplayStore(max_age_s)
+    if name == "memory":
+        return ReplayFilter(
+            max_age_s=max_age_s,
+            partition_s=config.REPLAY_FILTER_PARTITION_S,
+            num_bits=config.REPLAY_FILTER_BITS,
+            num_hashes=config.REPLAY_FILTER_HASHES,
+        )
+    raise ValueError(f"unknown replay store: {name!r}")
+
+
+line_nonces = make_store(config.REPLAY_STORE)
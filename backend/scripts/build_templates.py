@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Build Challenge Template Libraries
+
+Generates the vetted path and image template libraries that
+PATH_TEMPLATES_ENABLED and IMAGE_GENERATION_MODE="template" instance
+challenges from, and writes them to PATH_TEMPLATE_LIBRARY and
+IMAGE_TEMPLATE_LIBRARY.  A build is deterministic in --seed and --count,
+so every host built with the same arguments issues the same challenge for
+the same seed.
+
+Usage:
+    python -m backend.scripts.build_templates
+    python -m backend.scripts.build_templates --kind image --count 5000 --seed 7
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend import config, image_challenge, path, template_library
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build challenge template libraries")
+    parser.add_argument("--kind", choices=["path", "image", "all"], default="all")
+    parser.add_argument("--count", type=int, default=2000, help="Templates per library")
+    parser.add_argument("--seed", type=int, default=0, help="Build seed")
+    args = parser.parse_args()
+
+    builds = []
+    if args.kind in ("path", "all"):
+        builds.append(("path", config.PATH_TEMPLATE_LIBRARY, path.build_path_templates))
+    if args.kind in ("image", "all"):
+        builds.append(("image", config.IMAGE_TEMPLATE_LIBRARY, image_challenge.build_image_templates))
+
+    for kind, out, build in builds:
+        started = time.perf_counter()
+        library = build(args.count, args.seed)
+        template_library.save_library(out, library)
+        print(f"{kind}: {len(library['templates'])} templates → {out} "
+              f"({time.perf_counter() - started:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
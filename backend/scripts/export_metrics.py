@@ -8,14 +8,27 @@ and produces a summary JSON for the FYP paper.
 Usage:
     python -m backend.scripts.export_metrics
     python -m backend.scripts.export_metrics --output metrics.json
+    python -m backend.scripts.export_metrics --since   # only rows since last run
+
+All counts, sums and group-bys run in SQLite; no attempt rows (or their
+trajectory blobs) are loaded into Python.  With --since, the aggregate
+state from the previous run is read from --cache, only rows inserted
+since (by rowid) are aggregated and merged in, and the cache is rewritten.
+Each cached state records the identity of the database it was taken from
+(file inode, first row's created_at and the row at the high-water mark);
+if the file has been replaced or vacuumed since, the state is rebuilt by
+a full scan.  Solve-time percentiles are exact and always computed over
+the whole table, by sorting in SQL.
 """
 
 import argparse
 import json
+import math
+import os
 import sqlite3
 import sys
-from collections import Counter
 from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
 
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
@@ -28,84 +41,320 @@ def _get_conn() -> sqlite3.Connection:
     return conn
 
 
-def _safe_avg(values: list) -> float:
-    return sum(values) / len(values) if values else 0.0
+PERCENTILES = (50, 90, 95)
 
 
-def export_image_metrics(conn: sqlite3.Connection) -> dict:
-    """Extract metrics from image_attempt_logs."""
-    rows = conn.execute("SELECT * FROM image_attempt_logs").fetchall()
+def _safe_div(num: float, den: float) -> float:
+    return num / den if den else 0.0
 
-    if not rows:
-        return {"total_attempts": 0, "message": "No image CAPTCHA attempts logged"}
 
-    total = len(rows)
-    passed = sum(1 for r in rows if r["passed"])
-    solve_times = [r["solve_time_ms"] for r in rows]
-    passed_solve_times = [r["solve_time_ms"] for r in rows if r["passed"]]
-    reasons = Counter(r["reason"] for r in rows if not r["passed"])
+def _window(after_rowid: Optional[int]) -> Tuple[str, tuple]:
+    """WHERE clause selecting rows inserted after *after_rowid* (all rows if None).
+
+    The log tables are append-only and SQLite serialises writers, so rowid
+    order is commit order; created_at is stamped before the insert commits
+    and can arrive out of order, or tie with the previous high-water mark.
+    """
+    if after_rowid is None:
+        return "1 = 1", ()
+    return "rowid > ?", (after_rowid,)
+
+
+def _percentiles(conn: sqlite3.Connection, column: str, table: str, where: str) -> Dict[str, float]:
+    """Exact nearest-rank percentiles of *column*, each picked by sorting in SQL.
+
+    Percentiles do not merge across incremental runs, so they are always
+    taken over every matching row rather than read from the cached state.
+    """
+    total = conn.execute(f"SELECT COUNT({column}) FROM {table} WHERE {where}").fetchone()[0]
+    if not total:
+        return {}
+    result = {}
+    for q in PERCENTILES:
+        rank = max(1, math.ceil(q / 100 * total))
+        result[f"p{q}"] = conn.execute(
+            f"SELECT {column} FROM {table} WHERE {where} AND {column} IS NOT NULL "
+            f"ORDER BY {column} LIMIT 1 OFFSET ?",
+            (rank - 1,),
+        ).fetchone()[0]
+    return result
 
+
+def _db_identity(conn: sqlite3.Connection, table: str, rowid_max: Optional[int]) -> Dict[str, Any]:
+    """
+    What a cached high-water mark is only valid against.
+
+    A replaced database file shows up as a new inode or a different first
+    row; a VACUUM that renumbered rowids moves a different row (or none)
+    under the mark.
+    """
+    path = conn.execute("PRAGMA database_list").fetchone()[2]
+    first = conn.execute(f"SELECT created_at FROM {table} ORDER BY rowid LIMIT 1").fetchone()
+    mark = None
+    if rowid_max is not None:
+        mark = conn.execute(f"SELECT attempt_id FROM {table} WHERE rowid = ?", (rowid_max,)).fetchone()
+    return {
+        "inode": os.stat(path).st_ino if path else None,
+        "first_created_at": first[0] if first else None,
+        "mark_attempt_id": mark[0] if mark else None,
+    }
+
+
+def _merge(a: Dict[str, Any], b: Dict[str, Any]) -> Dict[str, Any]:
+    """Merge two aggregate states: counts and sums add, *_min/*_max combine."""
+    out = dict(a)
+    for key, value in b.items():
+        if key not in out or out[key] is None:
+            out[key] = value
+        elif value is None:
+            continue
+        elif isinstance(value, dict):
+            out[key] = _merge(out[key], value)
+        elif key.endswith("_min"):
+            out[key] = min(out[key], value)
+        elif key.endswith("_max"):
+            out[key] = max(out[key], value)
+        else:
+            out[key] = out[key] + value
+    return out
+
+
+# ─── Image CAPTCHA ───────────────────────────────────────────────────────
+
+
+def image_state(conn: sqlite3.Connection, after_rowid: Optional[int] = None) -> Dict[str, Any]:
+    """Mergeable aggregates over image_attempt_logs, computed in SQL."""
+    where, params = _window(after_rowid)
+    row = conn.execute(
+        f"""
+        SELECT COUNT(*), COALESCE(SUM(passed), 0),
+               COALESCE(SUM(solve_time_ms), 0),
+               COALESCE(SUM(CASE WHEN passed THEN solve_time_ms END), 0),
+               COALESCE(SUM(excess), 0), MAX(created_at), MAX(rowid)
+        FROM image_attempt_logs WHERE {where}
+        """,
+        params,
+    ).fetchone()
+    reasons = conn.execute(
+        f"SELECT reason, COUNT(*) FROM image_attempt_logs WHERE {where} AND NOT passed GROUP BY reason",
+        params,
+    ).fetchall()
+    pointers = conn.execute(
+        f"""
+        SELECT COALESCE(pointer_type, 'unknown'), COUNT(*), SUM(passed)
+        FROM image_attempt_logs WHERE {where} GROUP BY 1
+        """,
+        params,
+    ).fetchall()
+    return {
+        "total": row[0],
+        "passed": row[1],
+        "solve_time_sum": row[2],
+        "passed_solve_time_sum": row[3],
+        "excess_sum": row[4],
+        "created_at_max": row[5],
+        "rowid_max": row[6],
+        "failure_reasons": {reason: count for reason, count in reasons},
+        "by_pointer_type": {pt: {"total": n, "passed": ok} for pt, n, ok in pointers},
+    }
+
+
+def image_percentiles(conn: sqlite3.Connection) -> Dict[str, float]:
+    """Exact solve-time percentiles of passed image attempts."""
+    return _percentiles(conn, "solve_time_ms", "image_attempt_logs", "passed")
+
+
+def image_metrics(state: Dict[str, Any], percentiles: Optional[Dict[str, float]] = None) -> dict:
+    total = state["total"]
+    if not total:
+        return {"total_attempts": 0, "message": "No image CAPTCHA attempts logged"}
+    passed = state["passed"]
+    reasons = sorted(state["failure_reasons"].items(), key=lambda kv: -kv[1])
     return {
         "total_attempts": total,
         "passed": passed,
         "solve_rate": passed / total,
-        "avg_solve_time_ms": _safe_avg(passed_solve_times),
-        "avg_all_solve_time_ms": _safe_avg(solve_times),
-        "failure_reasons": dict(reasons.most_common()),
-        "avg_excess_clicks": _safe_avg([r["excess"] for r in rows]),
+        "avg_solve_time_ms": _safe_div(state["passed_solve_time_sum"], passed),
+        "avg_all_solve_time_ms": state["solve_time_sum"] / total,
+        "solve_time_percentiles_ms": percentiles or {},
+        "failure_reasons": dict(reasons),
+        "avg_excess_clicks": state["excess_sum"] / total,
+        "by_pointer_type": {
+            pt: {**v, "solve_rate": _safe_div(v["passed"], v["total"])}
+            for pt, v in sorted(state["by_pointer_type"].items())
+        },
     }
 
 
-def export_line_metrics(conn: sqlite3.Connection) -> dict:
-    """Extract metrics from attempt_logs (line CAPTCHA)."""
-    try:
-        rows = conn.execute("SELECT * FROM attempt_logs").fetchall()
-    except sqlite3.OperationalError:
-        return {"total_attempts": 0, "message": "No line CAPTCHA attempt_logs table"}
+def export_image_metrics(conn: sqlite3.Connection) -> dict:
+    """Extract metrics from image_attempt_logs."""
+    return image_metrics(image_state(conn), image_percentiles(conn))
 
-    if not rows:
-        return {"total_attempts": 0, "message": "No line CAPTCHA attempts logged"}
 
-    total = len(rows)
-    passed = sum(1 for r in rows if r["outcome_reason"] == "success")
-    durations = [r["duration_ms"] for r in rows if r["outcome_reason"] == "success"]
-    reasons = Counter(r["outcome_reason"] for r in rows if r["outcome_reason"] != "success")
+# ─── Line CAPTCHA ────────────────────────────────────────────────────────
 
-    bot_scores = [r["bot_score"] for r in rows if r["bot_score"] is not None]
-    behavioural_flagged = sum(
-        1 for r in rows if r["behavioural_flag"]
-    )
 
+def line_state(conn: sqlite3.Connection, after_rowid: Optional[int] = None) -> Dict[str, Any]:
+    """Mergeable aggregates over attempt_logs, computed in SQL."""
+    where, params = _window(after_rowid)
+    row = conn.execute(
+        f"""
+        SELECT COUNT(*),
+               COALESCE(SUM(outcome_reason = 'success'), 0),
+               COALESCE(SUM(CASE WHEN outcome_reason = 'success' THEN duration_ms END), 0),
+               COUNT(bot_score), COALESCE(SUM(bot_score), 0), MIN(bot_score), MAX(bot_score),
+               COALESCE(SUM(behavioural_flag != 0), 0), MAX(created_at), MAX(rowid)
+        FROM attempt_logs WHERE {where}
+        """,
+        params,
+    ).fetchone()
+    reasons = conn.execute(
+        f"""
+        SELECT outcome_reason, COUNT(*) FROM attempt_logs
+        WHERE {where} AND outcome_reason != 'success' GROUP BY outcome_reason
+        """,
+        params,
+    ).fetchall()
+    pointers = conn.execute(
+        f"""
+        SELECT pointer_type, COUNT(*), SUM(outcome_reason = 'success')
+        FROM attempt_logs WHERE {where} GROUP BY pointer_type
+        """,
+        params,
+    ).fetchall()
+    return {
+        "total": row[0],
+        "passed": row[1],
+        "success_duration_sum": row[2],
+        "bot_score_count": row[3],
+        "bot_score_sum": row[4],
+        "bot_score_min": row[5],
+        "bot_score_max": row[6],
+        "behavioural_flagged": row[7],
+        "created_at_max": row[8],
+        "rowid_max": row[9],
+        "failure_reasons": {reason: count for reason, count in reasons},
+        "by_pointer_type": {pt: {"total": n, "passed": ok} for pt, n, ok in pointers},
+    }
+
+
+def line_percentiles(conn: sqlite3.Connection) -> Dict[str, float]:
+    """Exact duration percentiles of successful line attempts."""
+    return _percentiles(conn, "duration_ms", "attempt_logs", "outcome_reason = 'success'")
+
+
+def line_metrics(state: Dict[str, Any], percentiles: Optional[Dict[str, float]] = None) -> dict:
+    total = state["total"]
+    if not total:
+        return {"total_attempts": 0, "message": "No line CAPTCHA attempts logged"}
+    passed = state["passed"]
+    reasons = sorted(state["failure_reasons"].items(), key=lambda kv: -kv[1])
     return {
         "total_attempts": total,
         "passed": passed,
         "solve_rate": passed / total,
-        "avg_solve_time_ms": _safe_avg(durations),
-        "failure_reasons": dict(reasons.most_common()),
+        "avg_solve_time_ms": _safe_div(state["success_duration_sum"], passed),
+        "solve_time_percentiles_ms": percentiles or {},
+        "failure_reasons": dict(reasons),
         "bot_score_distribution": {
-            "mean": _safe_avg(bot_scores),
-            "max": max(bot_scores) if bot_scores else 0,
-            "min": min(bot_scores) if bot_scores else 0,
+            "mean": _safe_div(state["bot_score_sum"], state["bot_score_count"]),
+            "max": state["bot_score_max"] if state["bot_score_max"] is not None else 0,
+            "min": state["bot_score_min"] if state["bot_score_min"] is not None else 0,
+        },
+        "behavioural_flag_count": state["behavioural_flagged"],
+        "behavioural_flag_rate": state["behavioural_flagged"] / total,
+        "by_pointer_type": {
+            pt: {**v, "solve_rate": _safe_div(v["passed"], v["total"])}
+            for pt, v in sorted(state["by_pointer_type"].items())
         },
-        "behavioural_flag_count": behavioural_flagged,
-        "behavioural_flag_rate": behavioural_flagged / total if total else 0,
     }
 
 
+def export_line_metrics(conn: sqlite3.Connection) -> dict:
+    """Extract metrics from attempt_logs (line CAPTCHA)."""
+    try:
+        state = line_state(conn)
+    except sqlite3.OperationalError:
+        return {"total_attempts": 0, "message": "No line CAPTCHA attempt_logs table"}
+    return line_metrics(state, line_percentiles(conn))
+
+
+# ─── Incremental export ──────────────────────────────────────────────────
+
+
+def update_states(conn: sqlite3.Connection, cached: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Fold rows inserted since each cached state's high-water mark into it.
+
+    *cached* is the previous result of this function (or None for a full
+    scan).  Only rows with rowid past the stored ``rowid_max`` are read.
+    A state cached before rowids were tracked, or whose ``db_identity`` no
+    longer matches the database, is rebuilt from scratch.
+    """
+    cached = cached or {}
+    states = {}
+    for name, build, table in (
+        ("image", image_state, "image_attempt_logs"),
+        ("line", line_state, "attempt_logs"),
+    ):
+        previous = cached.get(name)
+        try:
+            if previous and (
+                "rowid_max" not in previous
+                or previous.get("db_identity") != _db_identity(conn, table, previous["rowid_max"])
+            ):
+                previous = None
+            after_rowid = previous.get("rowid_max") if previous else None
+            fresh = build(conn, after_rowid)
+        except sqlite3.OperationalError:
+            states[name] = previous
+            continue
+        state = _merge(previous, fresh) if previous else fresh
+        state["db_identity"] = _db_identity(conn, table, state["rowid_max"])
+        states[name] = state
+    return states
+
+
 def main():
     parser = argparse.ArgumentParser(description="Export CAPTCHA metrics")
     parser.add_argument("--output", "-o", help="Output file path (default: stdout)")
+    parser.add_argument("--since", action="store_true",
+                        help="Only aggregate rows inserted since the cached previous run and merge")
+    parser.add_argument("--cache", default=str(config.DATA_DIR / "metrics_state.json"),
+                        help="Aggregate state kept between --since runs")
     args = parser.parse_args()
 
     if not config.DB_PATH.exists():
         print(f"Database not found at {config.DB_PATH}", file=sys.stderr)
         sys.exit(1)
 
+    cache_path = Path(args.cache)
+    cached = None
+    if args.since and cache_path.exists():
+        cached = json.loads(cache_path.read_text())
+
     conn = _get_conn()
+    states = update_states(conn, cached)
+    percentiles = {}
+    for name, compute in (("image", image_percentiles), ("line", line_percentiles)):
+        try:
+            percentiles[name] = compute(conn)
+        except sqlite3.OperationalError:
+            percentiles[name] = {}
+    conn.close()
 
+    if args.since:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        cache_path.write_text(json.dumps(states))
+
+    image, line = states["image"], states["line"]
     metrics = {
-        "image_captcha": export_image_metrics(conn),
-        "line_captcha": export_line_metrics(conn),
+        "image_captcha": image_metrics(image, percentiles["image"]) if image else {
+            "total_attempts": 0, "message": "No image CAPTCHA attempts logged",
+        },
+        "line_captcha": line_metrics(line, percentiles["line"]) if line else {
+            "total_attempts": 0, "message": "No line CAPTCHA attempt_logs table",
+        },
         "config": {
             "image_ttl_ms": config.IMAGE_CHALLENGE_TTL_MS,
             "image_click_tolerance_px": config.IMAGE_CLICK_TOLERANCE_PX,
@@ -114,8 +363,6 @@ def main():
         },
     }
 
-    conn.close()
-
     output = json.dumps(metrics, indent=2)
 
     if args.output:
@@ -0,0 +1,135 @@
+"""
+Challenge template libraries.
+
+A template library is a JSON file of vetted base challenges — line paths
+or image line sets — built offline by ``backend/scripts/build_templates.py``
+together with their expensive properties (path length and curvature
+profile; exact image intersections).  Issuance picks a template and places
+it with a random similarity transform (quarter turn, reflection, small
+tilt, uniform scale, translation).  Lengths scale by the transform's scale
+factor, while turning angles, crossing angles and the order of points along
+a curve are unchanged, so the precomputed properties are transformed
+analytically instead of recomputed.
+
+A library file holds a header identifying what it was built for and a list
+of templates::
+
+    {"kind": "path", "canvas": [400, 400], ..., "templates": [...]}
+
+``load_library`` returns None when the file is missing or its header does
+not match the running configuration, and callers then fall back to normal
+generation.
+"""
+
+import json
+import math
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# x' = a·x + b·y + tx,  y' = c·x + d·y + ty
+Similarity = Tuple[float, float, float, float, float, float]
+
+# Bounds of the random transform applied to a template
+TEMPLATE_SCALE_RANGE = (0.85, 1.15)
+TEMPLATE_MAX_TILT_RAD = math.radians(20)
+_FIT_TRIES = 8
+
+_cache: Dict[str, Tuple[int, Optional[Dict[str, Any]]]] = {}
+_cache_lock = threading.Lock()
+
+
+def fit_similarity(
+    points: Sequence[Sequence[float]],
+    box: Tuple[float, float, float, float],
+    rnd: Any,
+    scale_range: Tuple[float, float] = TEMPLATE_SCALE_RANGE,
+    max_tilt: float = TEMPLATE_MAX_TILT_RAD,
+) -> Tuple[Similarity, float]:
+    """
+    Random similarity placing *points* inside *box* (x0, y0, x1, y1).
+
+    Draws a quarter turn, reflection and tilt, then the largest admissible
+    scale in *scale_range* and a translation uniformly within the slack.
+    Orientations that cannot fit at the minimum scale are redrawn; the last
+    try keeps the template's own orientation, which always fits when the
+    template itself lies in *box*.  Returns the transform and its scale.
+    """
+    x0, y0, x1, y1 = box
+    cx = (min(p[0] for p in points) + max(p[0] for p in points)) / 2
+    cy = (min(p[1] for p in points) + max(p[1] for p in points)) / 2
+    s_min, s_max = scale_range
+
+    for attempt in range(_FIT_TRIES):
+        if attempt < _FIT_TRIES - 1:
+            angle = rnd.randrange(4) * (math.pi / 2) + rnd.uniform(-max_tilt, max_tilt)
+            flip = -1.0 if rnd.random() < 0.5 else 1.0
+        else:
+            angle, flip = 0.0, 1.0
+        cos_a, sin_a = math.cos(angle), math.sin(angle)
+        # Rotation after an optional reflection in x
+        a, b, c, d = flip * cos_a, -sin_a, flip * sin_a, cos_a
+        xs = [a * (p[0] - cx) + b * (p[1] - cy) for p in points]
+        ys = [c * (p[0] - cx) + d * (p[1] - cy) for p in points]
+        span_x, span_y = max(xs) - min(xs), max(ys) - min(ys)
+        s_fit = min(
+            (x1 - x0) / span_x if span_x > 0 else math.inf,
+            (y1 - y0) / span_y if span_y > 0 else math.inf,
+        )
+        s_hi = min(s_max, s_fit)
+        if s_hi >= s_min or attempt == _FIT_TRIES - 1:
+            break
+
+    s = rnd.uniform(s_min, s_hi) if s_hi > s_min else s_hi
+    tx = rnd.uniform(x0 - s * min(xs), max(x0 - s * min(xs), x1 - s * max(xs)))
+    ty = rnd.uniform(y0 - s * min(ys), max(y0 - s * min(ys), y1 - s * max(ys)))
+    a, b, c, d = s * a, s * b, s * c, s * d
+    return (a, b, c, d, tx - a * cx - b * cy, ty - c * cx - d * cy), s
+
+
+def apply_similarity(transform: Similarity, points: Sequence[Sequence[float]]) -> List[List[float]]:
+    """Map *points* through *transform*."""
+    a, b, c, d, tx, ty = transform
+    return [[a * x + b * y + tx, c * x + d * y + ty] for x, y in points]
+
+
+def save_library(path: Path, library: Dict[str, Any]) -> None:
+    """Write *library* to *path* atomically."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(json.dumps(library, separators=(",", ":")))
+    os.replace(tmp, path)
+
+
+def load_library(path: Path, **expected: Any) -> Optional[Dict[str, Any]]:
+    """
+    Load the library at *path* if its header matches *expected*.
+
+    Parsed files are cached by modification time, so a rebuilt library is
+    picked up without a restart.  Returns None if the file is missing,
+    unreadable, empty or built for something else.
+    """
+    key = str(path)
+    try:
+        mtime = os.stat(key).st_mtime_ns
+    except OSError:
+        return None
+    with _cache_lock:
+        cached = _cache.get(key)
+    if cached is None or cached[0] != mtime:
+        try:
+            library = json.loads(Path(key).read_text())
+        except (OSError, ValueError):
+            library = None
+        cached = (mtime, library)
+        with _cache_lock:
+            _cache[key] = cached
+    library = cached[1]
+    if not library or not library.get("templates"):
+        return None
+    for name, value in expected.items():
+        if library.get(name) != value:
+            return None
+    return library
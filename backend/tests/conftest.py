@@ -17,9 +17,17 @@ def _tmp_db(tmp_path, monkeypatch):
     monkeypatch.setattr(config, "DATA_DIR", tmp_path)
     monkeypatch.setattr(config, "DB_PATH", tmp_path / "captcha.db")
 
-    from backend import db
+    from backend import db, rate_limit
 
     db.init_db()
+
+    # Fresh limiter counters and miss caches so tests don't share budgets.
+    backend, id_backend = rate_limit.MemoryBackend(), rate_limit.MemoryBackend()
+    for name, limiter in rate_limit.limiters.items():
+        keyed_on_id = config.RATE_LIMIT_POLICIES[name].get("key") == "challenge"
+        monkeypatch.setattr(limiter, "backend", id_backend if keyed_on_id else backend)
+    monkeypatch.setattr(db, "_missing_challenges", db._MissCache(60, 1000))
+    monkeypatch.setattr(db, "_missing_image_challenges", db._MissCache(60, 1000))
     yield
 
 
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Security Benchmark: Parallel Image-Attack Runner
+
+Runs generate → render → attack → validate for thousands of challenges
+across a process pool, fully offline against the local generator and
+validator, and reports:
+
+* solve rate with a 95% Wilson interval, overall and split into
+  straight-only vs curved challenges;
+* throughput (challenges/s);
+* per-stage latency (mean / p50 / p95 ms) for generate, render and
+  attack, each timed per challenge;
+* validator throughput.  Validation runs once per chunk as a single
+  batched call, so it has no per-challenge latency to take percentiles of.
+
+Sample *i* is generated from a seed derived from ``--seed`` and *i*, so a
+run is reproducible whatever the worker count, and two generator versions
+can be compared on the same seeds.
+
+Attacks:
+    colour   Colour-overlap solver on the rendered image (NumPy only).
+    hough    OpenCV Hough Transform pipeline from test_hough_transform.
+
+As in test_hough_transform, each attack submits at most
+``numIntersections + 1`` of its detected points.
+
+Usage:
+    python -m backend.tests.security.attack_bench --attack colour --n 5000
+    python -m backend.tests.security.attack_bench --attack hough --n 5000 --workers 8
+
+Requires:
+    numpy (colour); opencv-python (hough)
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[3]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "scripts"))
+
+from aggregate_ablation_results import _wilson_ci  # noqa: E402
+
+STAGES = ("generate", "render", "attack")
+
+
+# ─── Attacks ─────────────────────────────────────────────────────────────
+
+
+def _dilate(mask: np.ndarray, r: int) -> np.ndarray:
+    """Binary dilation by a (2r+1)² square, separably."""
+    out = mask.copy()
+    for _ in range(r):
+        out[1:, :] |= out[:-1, :].copy()
+        out[:-1, :] |= out[1:, :].copy()
+    for _ in range(r):
+        out[:, 1:] |= out[:, :-1].copy()
+        out[:, :-1] |= out[:, 1:].copy()
+    return out
+
+
+def colour_attack(img: np.ndarray, canvas_w: int, canvas_h: int) -> List[List[float]]:
+    """
+    Find crossings as places where two palette colours touch.
+
+    Each palette colour present in the image is masked and dilated a few
+    pixels; pixels covered by two or more masks are clustered and their
+    centroids returned.
+    """
+    from backend.image_challenge import COLOUR_PALETTE, _cluster_points
+    from backend.tests.security.raster import BACKGROUND
+
+    h, w = img.shape[:2]
+    flat = img.reshape(-1, 3).astype(np.int16)
+    background = np.array([int(BACKGROUND[i:i + 2], 16) for i in (1, 3, 5)], dtype=np.int16)
+    palette = np.array(
+        [[int(c[i:i + 2], 16) for i in (1, 3, 5)] for c in COLOUR_PALETTE], dtype=np.int16,
+    )
+
+    # Label foreground pixels with their nearest palette colour
+    fg = np.flatnonzero(np.abs(flat - background).sum(axis=1) >= 60)
+    dists = np.abs(flat[fg, None, :] - palette[None, :, :]).sum(axis=2)
+    nearest = dists.argmin(axis=1)
+    solid = dists[np.arange(len(fg)), nearest] < 60
+    labels = np.full(h * w, -1, dtype=np.int8)
+    labels[fg[solid]] = nearest[solid]
+    labels = labels.reshape(h, w)
+
+    masks = []
+    for c, count in enumerate(np.bincount(nearest[solid], minlength=len(palette))):
+        if count >= 20:
+            masks.append(_dilate(labels == c, 3))
+    if len(masks) < 2:
+        return []
+
+    overlap = np.sum(masks, axis=0) >= 2
+    ys, xs = np.nonzero(overlap)
+    if len(xs) == 0:
+        return []
+    return _cluster_points(np.column_stack([xs, ys]).astype(float) + 0.5, radius=15.0)
+
+
+def hough_attack(img: np.ndarray, canvas_w: int, canvas_h: int) -> List[List[float]]:
+    """OpenCV Hough pipeline, on the BGR image it expects."""
+    from backend.tests.security.raster import to_bgr
+    from backend.tests.security.test_hough_transform import find_hough_intersections
+
+    return find_hough_intersections(to_bgr(img), canvas_w, canvas_h)
+
+
+ATTACKS: Dict[str, Callable[[np.ndarray, int, int], List[List[float]]]] = {
+    "colour": colour_attack,
+    "hough": hough_attack,
+}
+
+
+# ─── Worker ──────────────────────────────────────────────────────────────
+
+
+def sample_seed(base_seed: int, index: int) -> int:
+    """63-bit challenge seed for sample *index* of a run."""
+    state = np.random.SeedSequence([base_seed, index]).generate_state(1, dtype=np.uint64)
+    return int(state[0] >> np.uint64(1))
+
+
+def run_chunk(attack: str, base_seed: int, start: int, stop: int) -> Dict[str, list]:
+    """Run samples [start, stop) and return per-sample outcomes and stage times.
+
+    ``times`` holds per-sample seconds for each of STAGES; ``validate_s`` is
+    the wall time of the chunk's one batched validation call.
+    """
+    from backend.image_challenge import generate_challenge
+    from backend.image_validator import validate_click_batch
+    from backend.tests.security.raster import render_challenge
+
+    attack_fn = ATTACKS[attack]
+    n = stop - start
+    times = {stage: np.zeros(n) for stage in STAGES}
+    curved: List[bool] = []
+    intersections: List[List[List[float]]] = []
+    clicks: List[List[List[float]]] = []
+    buf: Optional[np.ndarray] = None
+
+    for k, index in enumerate(range(start, stop)):
+        t0 = time.perf_counter()
+        challenge = generate_challenge(seed=sample_seed(base_seed, index))
+        client, server = challenge["client_data"], challenge["server_data"]
+        t1 = time.perf_counter()
+        w, h = client["canvas"]["width"], client["canvas"]["height"]
+        if buf is None or buf.shape != (h, w, 3):
+            buf = np.empty((h, w, 3), dtype=np.uint8)
+        img = render_challenge(client, out=buf)
+        t2 = time.perf_counter()
+        detected = attack_fn(img, w, h)
+        t3 = time.perf_counter()
+
+        times["generate"][k] = t1 - t0
+        times["render"][k] = t2 - t1
+        times["attack"][k] = t3 - t2
+        curved.append(any(line["type"] != "straight" for line in client["lines"]))
+        intersections.append(server["intersections"])
+        clicks.append(detected[: server["numIntersections"] + 1])
+
+    # ── Validate the whole chunk in one batched call ─────────────
+    t0 = time.perf_counter()
+    max_clicks = max(1, max(len(c) for c in clicks))
+    max_ix = max(1, max(len(ix) for ix in intersections))
+    click_arr = np.zeros((n, max_clicks, 2))
+    ix_arr = np.zeros((n, max_ix, 2))
+    for k in range(n):
+        if clicks[k]:
+            click_arr[k, :len(clicks[k])] = clicks[k]
+        if intersections[k]:
+            ix_arr[k, :len(intersections[k])] = intersections[k]
+    result = validate_click_batch(
+        click_arr,
+        ix_arr,
+        solve_time_ms=np.full(n, 5000.0),
+        num_clicks=[len(c) for c in clicks],
+        num_intersections=[len(ix) for ix in intersections],
+    )
+    validate_s = time.perf_counter() - t0
+
+    return {
+        "passed": result["passed"].tolist(),
+        "curved": curved,
+        "times": {stage: values.tolist() for stage, values in times.items()},
+        "validate_s": validate_s,
+    }
+
+
+# ─── Reporting ───────────────────────────────────────────────────────────
+
+
+def _rate(passed: np.ndarray) -> Dict[str, float]:
+    k, n = int(passed.sum()), int(passed.size)
+    low, high = _wilson_ci(k, n)
+    return {"n": n, "solved": k, "rate": k / n if n else 0.0, "ci_low": low, "ci_high": high}
+
+
+def summarise(chunks: List[Dict[str, list]], wall_s: float) -> Dict[str, object]:
+    passed = np.array([p for c in chunks for p in c["passed"]], dtype=bool)
+    curved = np.array([p for c in chunks for p in c["curved"]], dtype=bool)
+    latency = {}
+    for stage in STAGES:
+        ms = np.array([t for c in chunks for t in c["times"][stage]]) * 1000.0
+        latency[stage] = {
+            "mean_ms": float(ms.mean()),
+            "p50_ms": float(np.percentile(ms, 50)),
+            "p95_ms": float(np.percentile(ms, 95)),
+        }
+    validate_s = sum(c["validate_s"] for c in chunks)
+    return {
+        "overall": _rate(passed),
+        "straight_only": _rate(passed[~curved]),
+        "has_curves": _rate(passed[curved]),
+        "throughput_per_s": passed.size / wall_s,
+        "wall_s": wall_s,
+        "latency": latency,
+        "validate": {
+            "batches": len(chunks),
+            "total_s": validate_s,
+            "per_s": passed.size / validate_s if validate_s else 0.0,
+        },
+    }
+
+
+def _print_summary(attack: str, summary: Dict[str, object]) -> None:
+    print(f"\n{'='*50}")
+    print(f"{attack} attack — {summary['overall']['n']} challenges in {summary['wall_s']:.1f}s "
+          f"({summary['throughput_per_s']:.1f}/s)")
+    for key in ("overall", "straight_only", "has_curves"):
+        r = summary[key]
+        if r["n"]:
+            print(f"  {key:14s} {r['solved']:6d}/{r['n']:<6d} {r['rate']*100:5.1f}% "
+                  f"(95% CI {r['ci_low']*100:.1f}–{r['ci_high']*100:.1f}%)")
+    print("  stage latency (ms):   mean    p50    p95")
+    for stage, lat in summary["latency"].items():
+        print(f"    {stage:16s} {lat['mean_ms']:7.2f} {lat['p50_ms']:6.2f} {lat['p95_ms']:6.2f}")
+    v = summary["validate"]
+    print(f"  validate (batched): {v['per_s']:.0f}/s over {v['batches']} batches")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Parallel image-attack benchmark")
+    parser.add_argument("--attack", choices=sorted(ATTACKS), default="colour")
+    parser.add_argument("--n", type=int, default=5000, help="Number of challenges")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk", type=int, default=100, help="Challenges per task")
+    parser.add_argument("--seed", type=int, default=0, help="Base seed for the run")
+    parser.add_argument("--output", default=None, help="Also write the summary as JSON")
+    args = parser.parse_args(argv)
+
+    bounds = [(s, min(s + args.chunk, args.n)) for s in range(0, args.n, args.chunk)]
+    started = time.perf_counter()
+    if args.workers <= 1:
+        chunks = [run_chunk(args.attack, args.seed, s, e) for s, e in bounds]
+    else:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            futures = [pool.submit(run_chunk, args.attack, args.seed, s, e) for s, e in bounds]
+            chunks = []
+            for done, future in enumerate(futures, 1):
+                chunks.append(future.result())
+                print(f"  Progress: {min(done * args.chunk, args.n)}/{args.n}", end="\r", flush=True)
+    summary = summarise(chunks, time.perf_counter() - started)
+
+    _print_summary(args.attack, summary)
+    if args.output:
+        Path(args.output).write_text(json.dumps({"attack": args.attack, "seed": args.seed, **summary}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
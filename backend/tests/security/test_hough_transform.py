@@ -2,14 +2,15 @@
 """
 Security Test: Classical CV Attack (Hough Transform)
 
-Generates CAPTCHA challenges, renders to PNG, runs OpenCV Hough Transform
-pipeline, and records the solve rate.
+Generates CAPTCHA challenges, renders them with the NumPy rasterizer
+(raster.py), runs an OpenCV Hough Transform pipeline, and records the solve
+rate.
 
 Usage:
     python -m backend.tests.security.test_hough_transform --n 50
 
 Requires:
-    pip install opencv-python matplotlib numpy
+    pip install opencv-python numpy
 """
 
 import argparse
@@ -23,64 +24,9 @@ sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
 
 def render_challenge_to_image(client_data: dict) -> np.ndarray:
     """Render a challenge to a numpy array (H, W, 3) BGR image."""
-    try:
-        import matplotlib
+    from backend.tests.security.raster import render_challenge, to_bgr
 
-        matplotlib.use("Agg")
-        import matplotlib.pyplot as plt
-    except ImportError:
-        print("ERROR: matplotlib is required. Install with: pip install matplotlib")
-        sys.exit(1)
-
-    canvas = client_data["canvas"]
-    w, h = canvas["width"], canvas["height"]
-
-    fig, ax = plt.subplots(1, 1, figsize=(w / 100, h / 100), dpi=100)
-    ax.set_xlim(0, w)
-    ax.set_ylim(h, 0)
-    ax.set_facecolor("#0a0f1d")
-    ax.set_aspect("equal")
-    ax.axis("off")
-    fig.patch.set_facecolor("#0a0f1d")
-
-    for line in client_data["lines"]:
-        pts = line["points"]
-        if line["type"] == "straight":
-            ax.plot(
-                [pts[0][0], pts[1][0]],
-                [pts[0][1], pts[1][1]],
-                color=line["colour"],
-                linewidth=line["thickness"],
-            )
-        else:
-            t = np.linspace(0, 1, 200)
-            cp = np.array(pts)
-            if line["type"] == "quadratic":
-                points = (
-                    np.outer((1 - t) ** 2, cp[0])
-                    + np.outer(2 * (1 - t) * t, cp[1])
-                    + np.outer(t**2, cp[2])
-                )
-            else:
-                points = (
-                    np.outer((1 - t) ** 3, cp[0])
-                    + np.outer(3 * (1 - t) ** 2 * t, cp[1])
-                    + np.outer(3 * (1 - t) * t**2, cp[2])
-                    + np.outer(t**3, cp[3])
-                )
-            ax.plot(
-                points[:, 0],
-                points[:, 1],
-                color=line["colour"],
-                linewidth=line["thickness"],
-            )
-
-    fig.canvas.draw()
-    data = np.frombuffer(fig.canvas.tostring_rgb(), dtype=np.uint8)
-    data = data.reshape(fig.canvas.get_width_height()[::-1] + (3,))
-    plt.close()
-
-    return data[:, :, ::-1]  # RGB → BGR for OpenCV
+    return to_bgr(render_challenge(client_data))
 
 
 def find_hough_intersections(img: np.ndarray, canvas_w: int, canvas_h: int) -> list:
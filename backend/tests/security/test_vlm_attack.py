@@ -10,7 +10,7 @@ Usage:
 
 Requires:
     - OPENAI_API_KEY or GOOGLE_API_KEY environment variable
-    - pip install matplotlib Pillow requests
+    - pip install Pillow requests
 """
 
 import argparse
@@ -28,63 +28,14 @@ sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
 def render_challenge_to_png(client_data: dict, output_path: str) -> None:
     """Render a challenge's client_data line definitions to a PNG file."""
     try:
-        import matplotlib.pyplot as plt
-        import matplotlib.patches as patches
-        from matplotlib.path import Path as MplPath
-        import matplotlib.patches as mpatches
+        from PIL import Image
     except ImportError:
-        print("ERROR: matplotlib is required. Install with: pip install matplotlib")
+        print("ERROR: Pillow is required. Install with: pip install Pillow")
         sys.exit(1)
 
-    canvas = client_data["canvas"]
-    w, h = canvas["width"], canvas["height"]
-
-    fig, ax = plt.subplots(1, 1, figsize=(w / 100, h / 100), dpi=100)
-    ax.set_xlim(0, w)
-    ax.set_ylim(h, 0)  # Flip Y axis to match canvas coordinates
-    ax.set_facecolor("#0a0f1d")
-    ax.set_aspect("equal")
-    ax.axis("off")
-    fig.patch.set_facecolor("#0a0f1d")
-
-    # Draw challenge lines
-    for line in client_data["lines"]:
-        pts = line["points"]
-        if line["type"] == "straight":
-            ax.plot(
-                [pts[0][0], pts[1][0]],
-                [pts[0][1], pts[1][1]],
-                color=line["colour"],
-                linewidth=line["thickness"],
-            )
-        else:
-            # For curves, sample points
-            import numpy as np
-
-            t = np.linspace(0, 1, 200)
-            cp = np.array(pts)
-            if line["type"] == "quadratic":
-                points = (
-                    np.outer((1 - t) ** 2, cp[0])
-                    + np.outer(2 * (1 - t) * t, cp[1])
-                    + np.outer(t**2, cp[2])
-                )
-            else:  # cubic
-                points = (
-                    np.outer((1 - t) ** 3, cp[0])
-                    + np.outer(3 * (1 - t) ** 2 * t, cp[1])
-                    + np.outer(3 * (1 - t) * t**2, cp[2])
-                    + np.outer(t**3, cp[3])
-                )
-            ax.plot(
-                points[:, 0],
-                points[:, 1],
-                color=line["colour"],
-                linewidth=line["thickness"],
-            )
+    from backend.tests.security.raster import render_challenge
 
-    plt.savefig(output_path, bbox_inches="tight", pad_inches=0, dpi=100)
-    plt.close()
+    Image.fromarray(render_challenge(client_data)).save(output_path)
 
 
 def query_openai_vlm(image_path: str) -> str:
@@ -0,0 +1,39 @@
+"""Tests for tests/security/attack_bench.py — the offline attack runner."""
+
+from backend.tests.security import attack_bench
+
+
+class TestAttackBench:
+    """Chunked generate → render → attack → validate runs."""
+
+    def test_chunks_are_reproducible(self):
+        """The same base seed and indices give identical outcomes."""
+        first = attack_bench.run_chunk("colour", 7, 0, 6)
+        second = attack_bench.run_chunk("colour", 7, 0, 6)
+        assert first["passed"] == second["passed"]
+        assert first["curved"] == second["curved"]
+        assert set(first["times"]) == set(attack_bench.STAGES)
+
+    def test_sample_seeds_do_not_depend_on_chunking(self):
+        """Sample seeds depend only on the base seed and sample index."""
+        assert attack_bench.sample_seed(1, 5) == attack_bench.sample_seed(1, 5)
+        assert attack_bench.sample_seed(1, 5) != attack_bench.sample_seed(1, 6)
+        assert attack_bench.sample_seed(1, 5) != attack_bench.sample_seed(2, 5)
+        assert 0 <= attack_bench.sample_seed(1, 5) < 2 ** 63
+
+    def test_summary_has_wilson_interval(self):
+        """Solve rates carry a 95% Wilson interval around the point estimate."""
+        chunk = attack_bench.run_chunk("colour", 3, 0, 8)
+        summary = attack_bench.summarise([chunk], wall_s=1.0)
+        overall = summary["overall"]
+        assert overall["n"] == 8
+        assert overall["ci_low"] <= overall["rate"] <= overall["ci_high"]
+        assert summary["throughput_per_s"] == 8.0
+
+    def test_validate_reported_as_throughput(self):
+        """Batched validation has no per-sample latency; it is reported as a rate."""
+        chunk = attack_bench.run_chunk("colour", 3, 0, 4)
+        summary = attack_bench.summarise([chunk, chunk], wall_s=1.0)
+        assert "validate" not in summary["latency"]
+        assert summary["validate"]["batches"] == 2
+        assert summary["validate"]["per_s"] == 8 / (2 * chunk["validate_s"])
@@ -0,0 +1,98 @@
+"""Tests for request size limits — body-size middleware and list caps."""
+
+import json
+
+import pytest
+
+from backend import config, main
+from backend.body_limit import BodySizeLimitMiddleware
+
+
+@pytest.fixture()
+def small_app():
+    """A tiny app behind a 1 KB limit, with a 4 KB allowance under /upload."""
+    import fastapi
+
+    app = fastapi.FastAPI()
+    app.add_middleware(BodySizeLimitMiddleware, max_bytes=1024, path_limits={"/upload": 4096})
+
+    @app.post("/echo")
+    async def echo(request: fastapi.Request):
+        return {"size": len(await request.body())}
+
+    @app.post("/upload")
+    async def upload(request: fastapi.Request):
+        return {"size": len(await request.body())}
+
+    from fastapi.testclient import TestClient
+
+    return TestClient(app)
+
+
+class TestBodySizeLimit:
+    """Oversized bodies are refused before the route parses them."""
+
+    def test_small_body_passes(self, small_app):
+        """A body under the limit reaches the route unchanged."""
+        resp = small_app.post("/echo", content=b"x" * 1000)
+        assert resp.status_code == 200
+        assert resp.json() == {"size": 1000}
+
+    def test_declared_length_over_limit(self, small_app):
+        """A Content-Length over the limit gets 413."""
+        resp = small_app.post("/echo", content=b"x" * 2000)
+        assert resp.status_code == 413
+
+    def test_streamed_body_over_limit(self, small_app):
+        """A chunked body with no Content-Length is cut off once it passes the limit."""
+        def chunks():
+            for _ in range(10):
+                yield b"x" * 512
+
+        resp = small_app.post("/echo", content=chunks())
+        assert resp.status_code == 413
+
+    def test_path_override(self, small_app):
+        """Paths with their own allowance use it instead of the default."""
+        assert small_app.post("/upload", content=b"x" * 3000).status_code == 200
+        assert small_app.post("/upload", content=b"x" * 5000).status_code == 413
+
+    def test_rejection_carries_cors_headers(self, client):
+        """A 413 from the app still has CORS headers, so browsers can read it."""
+        origin = main._allowed_origins[0]
+        resp = client.post(
+            "/feedback",
+            content=b"x" * (config.FEEDBACK_MAX_BODY_BYTES + 1),
+            headers={"Origin": origin},
+        )
+        assert resp.status_code == 413
+        assert resp.headers["access-control-allow-origin"] == origin
+
+
+class TestListCaps:
+    """Click and trajectory lists are capped when the request is parsed."""
+
+    def test_too_many_clicks_rejected(self, client):
+        """More than IMAGE_MAX_CLICKS clicks fails validation with 422."""
+        data = client.post("/captcha/image/generate").json()
+        clicks = [{"x": 1, "y": 1}] * (config.IMAGE_MAX_CLICKS + 1)
+        resp = client.post(
+            "/captcha/image/validate",
+            json={"challengeId": data["challengeId"], "token": data["token"], "clicks": clicks},
+        )
+        assert resp.status_code == 422
+
+    def test_too_many_trajectory_samples_rejected(self, client):
+        """More than LINE_MAX_TRAJECTORY_SAMPLES samples fails validation with 422."""
+        trajectory = [{"x": 1, "y": 1, "t": i} for i in range(config.LINE_MAX_TRAJECTORY_SAMPLES + 1)]
+        body = {
+            "challengeId": "x",
+            "nonce": "x",
+            "token": "x",
+            "sessionId": "x",
+            "pointerType": "mouse",
+            "trajectory": trajectory,
+        }
+        assert len(json.dumps(body)) < config.MAX_REQUEST_BODY_BYTES
+        resp = client.post("/captcha/line/verify", json=body)
+        assert resp.status_code == 422
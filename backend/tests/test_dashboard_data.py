@@ -0,0 +1,144 @@
+"""Tests for scripts/dashboard_data.py — incremental sync and cached aggregates."""
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+from backend import config, db
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "scripts"))
+
+import dashboard_data as dd  # noqa: E402
+
+
+def _log_line(i, outcome="success", pointer="mouse", coverage=0.9, session="s1"):
+    with db._get_conn() as conn:
+        conn.execute(
+            """
+            INSERT INTO attempt_logs (
+                attempt_id, session_id, challenge_id, pointer_type, path_seed, path_length_px,
+                tolerance_px, ttl_ms, started_at, ended_at, duration_ms, outcome_reason,
+                coverage_ratio, trajectory_json, created_at
+            ) VALUES (?, ?, 'c', ?, 'seed', 250, 20, 20000, 0, 1, ?, ?, ?, '[]', ?)
+            """,
+            (f"line{i}", session, pointer, 1000.0 + i * 10, outcome, coverage, 1000.0 + i),
+        )
+        conn.commit()
+
+
+def _log_image(i, passed=True):
+    with db._get_conn() as conn:
+        conn.execute(
+            """
+            INSERT INTO image_attempt_logs (
+                attempt_id, challenge_id, num_lines, num_intersections, num_clicks, matched,
+                excess, passed, reason, solve_time_ms, too_fast, clicks_json, pointer_type,
+                created_at
+            ) VALUES (?, 'c', 3, 2, 2, 2, 0, ?, ?, ?, 0, '[]', 'touch', ?)
+            """,
+            (f"img{i}", int(passed), "all_clicked" if passed else "missed_intersections",
+             2000.0 + i, 1000.0 + i),
+        )
+        conn.commit()
+
+
+@pytest.fixture()
+def data(tmp_path):
+    source = dd.LocalSource(config.DB_PATH)
+    return dd.DashboardData(source, dd.DashboardCache(tmp_path / "cache" / "dashboard.db"))
+
+
+class TestDashboardData:
+    """Local cache sync and the aggregates the figures are drawn from."""
+
+    def test_refresh_fetches_only_new_rows(self, data, monkeypatch):
+        """A second sync copies only the overlap window and new rows, without duplicating them."""
+        monkeypatch.setattr(dd, "SYNC_OVERLAP_S", 2.0)
+        for i in range(5):
+            _log_line(i)
+        assert data.cache.sync(data.source)["attempt_logs"] == 5
+        _log_line(5, outcome="coverage")
+        fetched = data.cache.sync(data.source)
+        # Rows within 2 s of the high-water mark (1002-1004) are refetched and replaced.
+        assert fetched["attempt_logs"] == 4
+        assert data.refresh()["counts"]["line"] == 6
+
+    def test_out_of_order_rows_are_picked_up(self, data):
+        """A row committed after the last sync but stamped before its high-water mark is copied."""
+        for i in range(5):
+            _log_line(i)
+        data.cache.sync(data.source)
+        _log_line(-3)  # created_at 997, older than the high-water mark of 1004
+        assert data.refresh()["counts"]["line"] == 6
+
+    def test_aggregates_match_rows(self, data):
+        """Counts, pass rates, pointer splits and histograms reflect the cached rows."""
+        _log_line(0, session="a", coverage=0.0)
+        _log_line(1, outcome="coverage", pointer="touch", session="a", coverage=0.5)
+        _log_line(2, session="b", coverage=1.0)
+        _log_image(0)
+        _log_image(1, passed=False)
+        agg = data.refresh()
+        assert agg["counts"]["sessions"] == 2
+        assert agg["counts"]["line_pass_rate"] == pytest.approx(200 / 3)
+        assert agg["counts"]["image_pass_rate"] == 50
+        assert agg["line_outcomes"] == {"success": 2, "coverage": 1}
+        assert agg["pointer"]["line"]["touch"] == {"n": 1, "passed": 0}
+        assert agg["pointer"]["image"]["touch"] == {"n": 2, "passed": 1}
+        assert [s["pass_rate"] for s in agg["sessions"]] == [50, 100]
+        assert agg["coverage_histogram"][0] == 1
+        assert agg["coverage_histogram"][dd.COVERAGE_BINS // 2] == 1
+        assert agg["coverage_histogram"][-1] == 1
+        assert agg["solve_times"]["line_pass"]["min"] == 1000.0
+        assert agg["solve_times"]["line_pass"]["max"] == 1020.0
+        assert agg["solve_times"]["image_fail"]["n"] == 1
+
+    def test_aggregates_are_reused_until_rows_change(self, data):
+        """Refreshing without new rows returns the same aggregates object."""
+        _log_line(0)
+        first = data.refresh()
+        assert data.refresh() is first
+        _log_line(1)
+        assert data.refresh() is not first
+
+    def test_supabase_pages_with_range_headers(self, monkeypatch):
+        """Pages are requested with Range headers until a short page, filtered by high-water."""
+        rows = [{"attempt_id": f"a{i}", "created_at": 1000.0 + i} for i in range(5)]
+        requests = []
+
+        class _Resp:
+            def __init__(self, body):
+                self.body = body
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def read(self):
+                return self.body
+
+        def fake_urlopen(req, timeout=None):
+            requests.append(req)
+            start, end = map(int, req.get_header("Range").split("-"))
+            return _Resp(json.dumps(rows[start:end + 1]).encode())
+
+        monkeypatch.setattr(dd.urllib.request, "urlopen", fake_urlopen)
+        source = dd.SupabaseSource("https://example.supabase.co", "key", page_size=2)
+        fetched = list(source.rows_since("image_attempt_logs", 1000.0))
+        assert fetched == rows
+        assert [r.get_header("Range") for r in requests] == ["0-1", "2-3", "4-5"]
+        assert "created_at=gte.1000.0" in requests[0].full_url
+        assert "trajectory" not in requests[0].full_url
+
+    def test_switching_source_resets_cache(self, data, tmp_path):
+        """Rows cached from one source are dropped when syncing from another."""
+        _log_line(0)
+        data.refresh()
+        other = tmp_path / "other.db"
+        other.write_bytes(b"")
+        data.source = dd.LocalSource(other)
+        assert data.refresh()["counts"]["line"] == 0
@@ -0,0 +1,165 @@
+"""Tests for scripts/export_metrics.py — SQL aggregates and incremental merging."""
+
+import math
+import random
+
+import pytest
+
+from backend import db
+from backend.scripts import export_metrics as em
+
+
+def _insert_image(conn, i, created_at, rnd):
+    passed = rnd.random() < 0.6
+    conn.execute(
+        """
+        INSERT INTO image_attempt_logs (
+            attempt_id, challenge_id, num_lines, num_intersections, num_clicks, matched,
+            excess, passed, reason, solve_time_ms, too_fast, clicks_json, pointer_type, created_at
+        ) VALUES (?, 'c', 3, 2, 2, 2, ?, ?, ?, ?, 0, '[]', ?, ?)
+        """,
+        (
+            f"img{i}", rnd.randint(0, 2), int(passed),
+            "passed" if passed else rnd.choice(["missed_intersections", "too_fast"]),
+            rnd.uniform(800, 9000), rnd.choice(["mouse", "touch", None]), created_at,
+        ),
+    )
+
+
+def _insert_line(conn, i, created_at, rnd):
+    outcome = rnd.choice(["success", "success", "coverage", "too_fast"])
+    conn.execute(
+        """
+        INSERT INTO attempt_logs (
+            attempt_id, session_id, challenge_id, pointer_type, path_seed, path_length_px,
+            tolerance_px, ttl_ms, started_at, ended_at, duration_ms, outcome_reason,
+            coverage_ratio, behavioural_flag, bot_score, trajectory_json, created_at
+        ) VALUES (?, 's', 'c', ?, 'seed', 250, 20, 20000, 0, 1, ?, ?, 0.9, ?, ?, '[]', ?)
+        """,
+        (
+            f"line{i}", rnd.choice(["mouse", "touch"]), rnd.uniform(1000, 6000), outcome,
+            int(rnd.random() < 0.2), rnd.choice([None, rnd.random()]), created_at,
+        ),
+    )
+
+
+def _populate(start, stop, seed=0):
+    rnd = random.Random(seed + start)
+    with db._get_conn() as conn:
+        for i in range(start, stop):
+            _insert_image(conn, i, 1000.0 + i, rnd)
+            _insert_line(conn, i, 1000.0 + i, rnd)
+        conn.commit()
+
+
+def _rounded(value):
+    """Round floats in nested metrics so summation order does not matter."""
+    if isinstance(value, dict):
+        return {k: _rounded(v) for k, v in value.items()}
+    if isinstance(value, float):
+        return round(value, 6)
+    return value
+
+
+class TestExportMetrics:
+    """Aggregates pushed into SQL and merged across incremental runs."""
+
+    def test_sql_aggregates_match_python_reference(self):
+        """Counts, averages and reasons equal a straightforward Python pass over the rows."""
+        _populate(0, 200)
+        with db._get_conn() as conn:
+            rows = [dict(r) for r in conn.execute("SELECT * FROM image_attempt_logs")]
+            metrics = em.export_image_metrics(conn)
+        passed = [r for r in rows if r["passed"]]
+        assert metrics["total_attempts"] == len(rows)
+        assert metrics["passed"] == len(passed)
+        assert metrics["avg_solve_time_ms"] == pytest.approx(
+            sum(r["solve_time_ms"] for r in passed) / len(passed)
+        )
+        assert metrics["avg_excess_clicks"] == pytest.approx(sum(r["excess"] for r in rows) / len(rows))
+        failed = [r["reason"] for r in rows if not r["passed"]]
+        assert metrics["failure_reasons"] == {k: failed.count(k) for k in set(failed)}
+        times = sorted(r["solve_time_ms"] for r in passed)
+        for q in em.PERCENTILES:
+            expected = times[max(1, math.ceil(q / 100 * len(times))) - 1]
+            assert metrics["solve_time_percentiles_ms"][f"p{q}"] == expected
+
+    def test_line_metrics_keep_previous_fields(self):
+        """Line metrics still report bot-score spread and behavioural flags."""
+        _populate(0, 50)
+        with db._get_conn() as conn:
+            rows = [dict(r) for r in conn.execute("SELECT * FROM attempt_logs")]
+            metrics = em.export_line_metrics(conn)
+        scores = [r["bot_score"] for r in rows if r["bot_score"] is not None]
+        assert metrics["bot_score_distribution"]["max"] == pytest.approx(max(scores))
+        assert metrics["bot_score_distribution"]["mean"] == pytest.approx(sum(scores) / len(scores))
+        assert metrics["behavioural_flag_count"] == sum(1 for r in rows if r["behavioural_flag"])
+
+    def test_incremental_merge_equals_full_scan(self):
+        """Updating a cached state with newer rows gives the full-scan result."""
+        _populate(0, 120)
+        with db._get_conn() as conn:
+            cached = em.update_states(conn, None)
+        _populate(120, 200)
+        with db._get_conn() as conn:
+            incremental = em.update_states(conn, cached)
+            full = em.update_states(conn, None)
+        assert _rounded(em.image_metrics(incremental["image"])) == _rounded(em.image_metrics(full["image"]))
+        assert _rounded(em.line_metrics(incremental["line"])) == _rounded(em.line_metrics(full["line"]))
+        assert incremental["image"]["created_at_max"] == 1199.0
+
+    def test_late_and_tied_rows_are_not_missed(self):
+        """Rows committed after a run with an older or equal created_at are still folded in."""
+        _populate(0, 10)
+        with db._get_conn() as conn:
+            cached = em.update_states(conn, None)
+        rnd = random.Random(1)
+        with db._get_conn() as conn:
+            _insert_image(conn, 10, 1009.0, rnd)  # ties the previous high-water mark
+            _insert_image(conn, 11, 500.0, rnd)   # stamped before the last run, committed after
+            conn.commit()
+            incremental = em.update_states(conn, cached)
+            full = em.update_states(conn, None)
+        assert incremental["image"]["total"] == 12
+        assert _rounded(em.image_metrics(incremental["image"])) == _rounded(em.image_metrics(full["image"]))
+
+    def test_state_without_rowid_is_rebuilt(self):
+        """A cache written before rowids were tracked is replaced by a full scan, not double counted."""
+        _populate(0, 10)
+        with db._get_conn() as conn:
+            cached = em.update_states(conn, None)
+            for state in cached.values():
+                del state["rowid_max"]
+            assert em.update_states(conn, cached)["image"]["total"] == 10
+
+    def test_state_reset_when_database_rewritten(self):
+        """A cache taken before the rows were deleted and the file vacuumed is rebuilt, not merged."""
+        _populate(0, 10)
+        with db._get_conn() as conn:
+            cached = em.update_states(conn, None)
+            conn.execute("DELETE FROM image_attempt_logs")
+            conn.execute("DELETE FROM attempt_logs")
+            conn.commit()
+            conn.execute("VACUUM")
+        _populate(20, 25)
+        with db._get_conn() as conn:
+            incremental = em.update_states(conn, cached)
+            full = em.update_states(conn, None)
+        assert incremental["image"]["total"] == 5
+        assert _rounded(em.line_metrics(incremental["line"])) == _rounded(em.line_metrics(full["line"]))
+
+    def test_state_reset_when_inode_changes(self):
+        """A cache whose recorded inode differs from the current file is rebuilt."""
+        _populate(0, 10)
+        with db._get_conn() as conn:
+            cached = em.update_states(conn, None)
+            cached["image"]["db_identity"]["inode"] += 1
+            cached["image"]["total"] = 0  # only a rebuild brings this back
+            _populate(10, 12)
+            assert em.update_states(conn, cached)["image"]["total"] == 12
+
+    def test_empty_tables(self):
+        """Empty logs report zero attempts rather than dividing by zero."""
+        with db._get_conn() as conn:
+            assert em.export_image_metrics(conn)["total_attempts"] == 0
+            assert em.export_line_metrics(conn)["total_attempts"] == 0
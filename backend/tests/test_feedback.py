@@ -0,0 +1,301 @@
+"""Tests for feedback submission, Discord delivery and the review endpoints."""
+
+import sqlite3
+import time
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from backend import db, feedback_routes
+from backend.feedback_notify import DiscordNotifier
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 256
+FORM = {"message": "Lines are hard to see", "category": "line", "device": "laptop"}
+
+
+@pytest.fixture()
+def images_dir(tmp_path, monkeypatch):
+    """Store feedback images under the test's temporary directory."""
+    target = tmp_path / "feedback_images"
+    monkeypatch.setattr(feedback_routes, "FEEDBACK_IMAGES_DIR", target)
+    return target
+
+
+def _notifier(images_dir, handler, **kwargs):
+    return DiscordNotifier(
+        "https://discord.example/webhook", images_dir,
+        transport=httpx.MockTransport(handler), **kwargs,
+    )
+
+
+def _submit(client, files=None):
+    return client.post("/feedback", data=FORM, files=files or [])
+
+
+class TestFeedbackUpload:
+    """Streaming uploads to disk."""
+
+    def test_image_is_stored_and_response_does_not_wait(self, client, images_dir):
+        """The image lands in place, no temp files remain, and delivery is not attempted."""
+        resp = _submit(client, [("images", ("shot.png", PNG, "image/png"))])
+        assert resp.status_code == 200
+        body = resp.json()
+        assert body["discordStatus"] == "disabled"
+        stored = list(images_dir.iterdir())
+        assert [p.name for p in stored] == [f"{body['feedbackId']}_0.png"]
+        assert stored[0].read_bytes() == PNG
+        assert db.get_feedback_delivery(body["feedbackId"]) is None
+
+    def test_oversized_image_leaves_nothing_behind(self, client, images_dir, monkeypatch):
+        """An image over the limit is rejected and earlier images are removed."""
+        monkeypatch.setattr(feedback_routes, "MAX_IMAGE_SIZE_BYTES", 300)
+        files = [
+            ("images", ("a.png", PNG, "image/png")),
+            ("images", ("b.png", PNG * 2, "image/png")),
+        ]
+        resp = _submit(client, files)
+        assert resp.status_code == 400
+        assert list(images_dir.iterdir()) == []
+
+    def test_failed_insert_leaves_nothing_behind(self, images_dir, monkeypatch):
+        """If recording the feedback fails after the images are saved, they are removed."""
+        def broken(**fields):
+            raise sqlite3.OperationalError("database is locked")
+
+        from backend.main import app
+
+        monkeypatch.setattr(db, "save_feedback", broken)
+        client = TestClient(app, raise_server_exceptions=False)
+        resp = _submit(client, [("images", ("shot.png", PNG, "image/png"))])
+        assert resp.status_code == 500
+        assert list(images_dir.iterdir()) == []
+
+    def test_enabled_notifier_queues_delivery(self, client, images_dir, monkeypatch):
+        """With a webhook configured the row is marked pending and handed to the worker."""
+        queued = []
+        notifier = _notifier(images_dir, lambda request: httpx.Response(204))
+        monkeypatch.setattr(notifier, "enqueue", queued.append)
+        monkeypatch.setattr(feedback_routes, "notifier", notifier)
+        resp = _submit(client)
+        feedback_id = resp.json()["feedbackId"]
+        assert resp.json()["discordStatus"] == "queued"
+        assert queued == [feedback_id]
+        assert db.get_feedback_delivery(feedback_id)["status"] == "pending"
+
+
+class TestDiscordDelivery:
+    """Delivery attempts, retries and status rows."""
+
+    def _pending(self, images_dir, filenames=()):
+        db.save_feedback("fb1", None, "line", "laptop", "hello", list(filenames))
+        db.create_feedback_delivery("fb1")
+
+    @staticmethod
+    def _wait_sent(feedback_id):
+        deadline = time.time() + 5
+        while db.get_feedback_delivery(feedback_id)["status"] != "sent" and time.time() < deadline:
+            time.sleep(0.01)
+
+    def test_success_marks_sent_with_attachments(self, images_dir):
+        """A 204 marks the delivery sent; images are attached from disk."""
+        images_dir.mkdir()
+        (images_dir / "fb1_0.png").write_bytes(PNG)
+        self._pending(images_dir, ["fb1_0.png"])
+        seen = []
+
+        def handler(request):
+            seen.append(request.headers["content-type"])
+            return httpx.Response(204)
+
+        assert _notifier(images_dir, handler).deliver("fb1") is None
+        assert seen[0].startswith("multipart/form-data")
+        delivery = db.get_feedback_delivery("fb1")
+        assert (delivery["status"], delivery["attempts"]) == ("sent", 1)
+
+    def test_failures_back_off_then_give_up(self, images_dir):
+        """Errors are retried with doubling delays until max_attempts."""
+        self._pending(images_dir)
+        notifier = _notifier(
+            images_dir, lambda request: httpx.Response(500, text="boom"),
+            max_attempts=3, retry_base_s=1.0,
+        )
+        assert notifier.deliver("fb1") == 1.0
+        assert notifier.deliver("fb1") == 2.0
+        assert notifier.deliver("fb1") is None
+        delivery = db.get_feedback_delivery("fb1")
+        assert delivery["status"] == "failed"
+        assert delivery["attempts"] == 3
+        assert "500" in delivery["last_error"]
+        assert db.pending_feedback_deliveries() == []
+
+    def test_rate_limit_honours_retry_after(self, images_dir):
+        """A 429 waits at least Discord's Retry-After."""
+        self._pending(images_dir)
+        notifier = _notifier(
+            images_dir, lambda request: httpx.Response(429, headers={"Retry-After": "30"}),
+            retry_base_s=1.0,
+        )
+        assert notifier.deliver("fb1") == 30.0
+        assert db.pending_feedback_deliveries() == ["fb1"]
+
+    def test_worker_delivers_queued_feedback(self, images_dir):
+        """The background worker picks up an enqueued delivery."""
+        self._pending(images_dir)
+        notifier = _notifier(images_dir, lambda request: httpx.Response(204))
+        notifier.start()
+        try:
+            notifier.enqueue("fb1")
+            self._wait_sent("fb1")
+        finally:
+            notifier.stop(timeout=1.0)
+        assert db.get_feedback_delivery("fb1")["status"] == "sent"
+
+    def test_worker_requeues_pending_rows_on_start(self, images_dir):
+        """Rows left pending by a previous process are delivered once the worker starts."""
+        self._pending(images_dir)
+        notifier = _notifier(images_dir, lambda request: httpx.Response(204))
+        notifier.start()
+        try:
+            self._wait_sent("fb1")
+        finally:
+            notifier.stop(timeout=1.0)
+        assert db.get_feedback_delivery("fb1")["status"] == "sent"
+        assert not notifier._worker.is_alive()
+
+    def test_claimed_row_is_posted_once(self, images_dir):
+        """A row claimed by one process is skipped by another until its lease expires."""
+        self._pending(images_dir)
+        posts = []
+
+        def handler(request):
+            posts.append(request)
+            return httpx.Response(204)
+
+        other = _notifier(images_dir, handler)
+        assert db.claim_feedback_delivery("fb1", lease_s=60) is not None
+        assert other.deliver("fb1") is None
+        assert posts == []
+        assert db.pending_feedback_deliveries(lease_s=60) == []
+
+        stale = _notifier(images_dir, handler, lease_s=0)
+        assert stale.deliver("fb1") is None
+        assert len(posts) == 1
+        assert db.get_feedback_delivery("fb1")["status"] == "sent"
+
+    def test_worker_runs_only_in_lifespan(self, images_dir, monkeypatch):
+        """An enabled notifier's worker starts with the app and stops with it."""
+        from backend.main import app
+
+        notifier = _notifier(images_dir, lambda request: httpx.Response(204))
+        monkeypatch.setattr(feedback_routes, "notifier", notifier)
+        with TestClient(app):
+            assert notifier._worker is not None and notifier._worker.is_alive()
+        assert not notifier._worker.is_alive()
+
+
+class TestFeedbackListing:
+    """Cursor pagination and cache validators on the review endpoints."""
+
+    @pytest.fixture(autouse=True)
+    def _secret(self, monkeypatch):
+        monkeypatch.setattr(feedback_routes, "FEEDBACK_SECRET", "s3cret")
+
+    def _seed_rows(self, n):
+        with db._get_conn() as conn:
+            conn.executemany(
+                "INSERT INTO feedback (id, name, category, device, message, created_at) "
+                "VALUES (?, NULL, ?, 'laptop', ?, ?)",
+                [(f"fb{i:02d}", "line" if i % 2 else "image", f"m{i}", 1000.0 + i) for i in range(n)],
+            )
+            conn.commit()
+
+    def test_pages_walk_newest_first_without_overlap(self, client):
+        """Following X-Next-Cursor visits every row exactly once, newest first."""
+        self._seed_rows(7)
+        seen, cursor = [], None
+        while True:
+            params = {"secret": "s3cret", "limit": 3}
+            if cursor:
+                params["cursor"] = cursor
+            resp = client.get("/feedback", params=params)
+            assert resp.status_code == 200
+            seen += [item["id"] for item in resp.json()]
+            cursor = resp.headers.get("x-next-cursor")
+            if not cursor:
+                break
+        assert seen == [f"fb{i:02d}" for i in reversed(range(7))]
+
+    def test_category_filter(self, client):
+        """Only rows of the requested category are listed."""
+        self._seed_rows(6)
+        resp = client.get("/feedback", params={"secret": "s3cret", "category": "line"})
+        assert {item["category"] for item in resp.json()} == {"line"}
+        assert len(resp.json()) == 3
+
+    def test_unpaginated_listing_returns_every_row(self, client):
+        """Without limit or cursor the whole listing is returned, with no cursor header."""
+        self._seed_rows(feedback_routes.FEEDBACK_PAGE_DEFAULT + 5)
+        resp = client.get("/feedback", params={"secret": "s3cret"})
+        assert len(resp.json()) == feedback_routes.FEEDBACK_PAGE_DEFAULT + 5
+        assert "x-next-cursor" not in resp.headers
+
+    def test_cursor_header_is_exposed_to_browsers(self, client):
+        """Cross-origin callers can read X-Next-Cursor."""
+        from backend.main import _allowed_origins
+
+        self._seed_rows(3)
+        resp = client.get(
+            "/feedback", params={"secret": "s3cret", "limit": 2},
+            headers={"Origin": _allowed_origins[0]},
+        )
+        assert "x-next-cursor" in resp.headers["access-control-expose-headers"].lower()
+
+    def test_etag_revalidates_until_new_feedback(self, client):
+        """A matching If-None-Match gets 304 until a new row changes the ETag."""
+        self._seed_rows(2)
+        first = client.get("/feedback", params={"secret": "s3cret"})
+        etag = first.headers["etag"]
+        assert "last-modified" in first.headers
+        again = client.get("/feedback", params={"secret": "s3cret"}, headers={"If-None-Match": etag})
+        assert again.status_code == 304
+        db.save_feedback("new", None, "line", "phone", "later", [])
+        changed = client.get("/feedback", params={"secret": "s3cret"}, headers={"If-None-Match": etag})
+        assert changed.status_code == 200 and len(changed.json()) == 3
+
+    def test_invalid_cursor_rejected(self, client):
+        """A malformed cursor is a 400, not a server error."""
+        resp = client.get("/feedback", params={"secret": "s3cret", "cursor": "nope"})
+        assert resp.status_code == 400
+
+    def test_image_validators_and_thumbnail_fallback(self, client, images_dir):
+        """Images carry ETag/Last-Modified; unreadable images serve the original as thumbnail."""
+        images_dir.mkdir()
+        (images_dir / "fb_0.png").write_bytes(PNG)
+        url = "/feedback/images/fb_0.png"
+        resp = client.get(url, params={"secret": "s3cret"})
+        assert resp.status_code == 200 and resp.content == PNG
+        etag = resp.headers["etag"]
+        cached = client.get(url, params={"secret": "s3cret"}, headers={"If-None-Match": etag})
+        assert cached.status_code == 304
+        since = client.get(
+            url, params={"secret": "s3cret"},
+            headers={"If-Modified-Since": resp.headers["last-modified"]},
+        )
+        assert since.status_code == 304
+
+        thumb = client.get(url, params={"secret": "s3cret", "thumbnail": "true"})
+        assert thumb.status_code == 200 and thumb.content == PNG
+
+    def test_thumbnail_is_generated_and_cached(self, client, images_dir):
+        """With Pillow a downscaled PNG is written under thumbs/ and reused."""
+        images_dir.mkdir()
+        Image.new("RGB", (1200, 600), "red").save(images_dir / "fb_0.png")
+        url = "/feedback/images/fb_0.png"
+        resp = client.get(url, params={"secret": "s3cret", "thumbnail": "true"})
+        assert resp.status_code == 200
+        thumbs = list((images_dir / "thumbs").iterdir())
+        assert len(thumbs) == 1
+        with Image.open(thumbs[0]) as img:
+            assert max(img.size) == feedback_routes.FEEDBACK_THUMBNAIL_PX
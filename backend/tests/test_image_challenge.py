@@ -1,11 +1,32 @@
 """Tests for image_challenge.py — intersection calculation accuracy."""
 
+import random
+
+import numpy as np
 import pytest
 
 from backend import config
 from backend.image_challenge import (
+    _CUBIC_ELEVATION,
+    _LINE_GENERATORS,
+    _LINE_TYPES,
+    _SCREEN_OVERCOUNT,
+    _analytic_intersections,
+    _bernstein_basis,
+    _candidate_lines,
+    _cluster_points,
+    _coarse_crossing_counts,
+    _construct_once,
+    _evaluate_bezier,
     _find_all_intersections,
+    _find_polyline_intersections,
+    _intersect_lines,
+    _quadratic_through,
+    _random_cross,
+    _sample_candidate_batch,
     _sample_line,
+    _sample_lines,
+    _segment_pair_hits,
     generate_challenge,
 )
 
@@ -14,6 +35,14 @@ def _straight(p1, p2):
     return {"type": "straight", "points": [list(p1), list(p2)]}
 
 
+@pytest.fixture()
+def seeded_random():
+    """``random.seed`` for the test; the global generator's state is restored after."""
+    state = random.getstate()
+    yield random.seed
+    random.setstate(state)
+
+
 class TestIntersectionCalculation:
     """Test intersection finding correctness."""
 
@@ -89,9 +118,6 @@ class TestIntersectionCalculation:
 
     def test_clustering_merges_nearby_points(self):
         """Two raw intersections within 3px → merged to 1."""
-        from backend.image_challenge import _cluster_points
-        import numpy as np
-
         points = np.array([[200.0, 200.0], [201.0, 201.0]])
         clusters = _cluster_points(points, radius=3.0)
         assert len(clusters) == 1
@@ -108,3 +134,362 @@ class TestIntersectionCalculation:
             c = generate_challenge()
             n = c["server_data"]["numIntersections"]
             assert n >= 1, "got 0 intersections"
+
+
+class TestAnalyticIntersections:
+    """Closed-form straight/quadratic solver and its sampled fallback."""
+
+    # y = 800·t(1−t), x = 400·t
+    ARCH = {"type": "quadratic", "points": [[0, 0], [200, 400], [400, 0]]}
+
+    def test_line_line_exact(self):
+        """Two straight lines cross at the exact point."""
+        l1 = _straight([0, 200], [400, 200])
+        l2 = _straight([200, 0], [200, 400])
+        pts = _analytic_intersections(l1, l2)
+        assert pts.tolist() == [[200.0, 200.0]]
+
+    def test_line_quadratic_two_roots(self):
+        """A horizontal line cuts the arch at x = 200·(1 ± √½)."""
+        pts = sorted(_analytic_intersections(_straight([0, 100], [400, 100]), self.ARCH).tolist())
+        assert len(pts) == 2
+        assert pts[0] == pytest.approx([200 * (1 - 0.5 ** 0.5), 100])
+        assert pts[1] == pytest.approx([200 * (1 + 0.5 ** 0.5), 100])
+
+    def test_quadratic_quadratic(self):
+        """Mirrored arches meet at the same two points on y = 100."""
+        flipped = {"type": "quadratic", "points": [[0, 200], [200, -200], [400, 200]]}
+        pts = sorted(_analytic_intersections(flipped, self.ARCH).tolist())
+        assert len(pts) == 2
+        assert pts[0] == pytest.approx([200 * (1 - 0.5 ** 0.5), 100])
+
+    def test_segment_bounds_respected(self):
+        """A line that would cross the arch only if extended has no intersection."""
+        pts = _analytic_intersections(_straight([150, 500], [250, 450]), self.ARCH)
+        assert len(pts) == 0
+
+    def test_cubic_and_degenerate_fall_back(self):
+        """Cubic curves and collinear quadratics are left to the sampled path."""
+        cubic = {"type": "cubic", "points": [[0, 0], [100, 300], [300, 300], [400, 0]]}
+        flat = {"type": "quadratic", "points": [[200, 50], [200, 200], [200, 350]]}
+        assert _analytic_intersections(cubic, self.ARCH) is None
+        assert _analytic_intersections(flat, flat) is None
+
+    def test_tangent_line_is_near_miss(self):
+        """A line grazing the arch's peak at (200, 200) is reported as a near-miss."""
+        _, misses = _intersect_lines(
+            [self.ARCH, _straight([100, 200], [300, 200])], 500, 3.0, 400, 400, 0,
+        )
+        assert any(abs(m[0] - 200) < 2 and abs(m[1] - 200) < 2 for m in misses)
+
+    @pytest.mark.parametrize("analytic", [True, False])
+    def test_close_pass_is_near_miss(self, monkeypatch, analytic):
+        """A segment ending 2px short of the arch is a near-miss on both paths."""
+        monkeypatch.setattr(config, "IMAGE_ANALYTIC_INTERSECTIONS", analytic)
+        ixs, misses = _intersect_lines(
+            [self.ARCH, _straight([200, 100], [200, 198])], 500, 3.0, 400, 400, 0,
+        )
+        assert ixs == []
+        assert any(abs(m[0] - 200) < 2 and abs(m[1] - 199) < 2 for m in misses)
+
+    def test_clean_crossing_has_no_near_miss(self):
+        """A steep crossing is not flagged by the close approaches around it."""
+        ixs, misses = _intersect_lines(
+            [self.ARCH, _straight([200, 100], [200, 300])], 500, 3.0, 400, 400, 0,
+        )
+        assert len(ixs) == 1
+        assert misses == []
+
+    def test_agrees_with_sampling(self, seeded_random):
+        """Random straight/quadratic pairs: same count as sampling, within 1px."""
+        seeded_random(1234)
+        for _ in range(300):
+            a = _LINE_GENERATORS[random.choice(["straight", "quadratic"])](400, 400, 30)
+            b = _LINE_GENERATORS[random.choice(["straight", "quadratic"])](400, 400, 30)
+            exact = _find_all_intersections([a, b], 500, 3.0, 400, 400, 0)
+            sampled = _find_polyline_intersections(
+                _sample_line(a, 500), _sample_line(b, 500), 3.0,
+            )
+            assert len(exact) == len(sampled)
+            for p in exact:
+                assert min(abs(p[0] - q[0]) + abs(p[1] - q[1]) for q in sampled) < 1.0
+
+
+class TestSubdivisionIntersections:
+    """Bounding-box subdivision for cubic curves, with near-miss reporting."""
+
+    ARCH = {"type": "cubic", "points": [[0, 0], [100, 400], [300, 400], [400, 0]]}  # peaks at (200, 300)
+
+    def test_cubic_crosses_line(self):
+        """A vertical line through the arch's peak crosses once at (200, 300)."""
+        ixs = _find_all_intersections(
+            [self.ARCH, _straight([200, 100], [200, 390])], 500, 3.0, 400, 400, 0,
+        )
+        assert len(ixs) == 1
+        assert ixs[0] == pytest.approx([200, 300], abs=0.1)
+
+    def test_tangent_line_is_near_miss(self):
+        """A line grazing the peak is reported as a near-miss."""
+        _, misses = _intersect_lines(
+            [self.ARCH, _straight([100, 300], [300, 300])], 500, 3.0, 400, 400, 0,
+        )
+        assert any(abs(m[0] - 200) < 1 and abs(m[1] - 300) < 1 for m in misses)
+
+    def test_close_pass_is_near_miss(self):
+        """A segment ending 2px short of the arch is a near-miss, not a crossing."""
+        ixs, misses = _intersect_lines(
+            [self.ARCH, _straight([200, 200], [200, 298])], 500, 3.0, 400, 400, 0,
+        )
+        assert ixs == []
+        assert misses
+
+    def test_agrees_with_sampling(self, seeded_random):
+        """Random cubic pairs: crossings match the sampled polyline test."""
+        seeded_random(4321)
+        for _ in range(100):
+            a = _LINE_GENERATORS["cubic"](400, 400, 30)
+            b = _LINE_GENERATORS[random.choice(["straight", "quadratic", "cubic"])](400, 400, 30)
+            exact, misses = _intersect_lines([a, b], 500, 3.0, 400, 400, 0)
+            if misses:
+                continue  # ambiguous geometry; generation rejects these
+            sampled = _find_polyline_intersections(
+                _sample_line(a, 500), _sample_line(b, 500), 3.0,
+            )
+            assert len(exact) == len(sampled)
+            for p in exact:
+                assert min(abs(p[0] - q[0]) + abs(p[1] - q[1]) for q in sampled) < 1.0
+
+    def test_generation_uses_cubic(self, monkeypatch):
+        """Cubic curves appear in challenges from the rejection generator."""
+        monkeypatch.setattr(config, "IMAGE_GENERATION_MODE", "rejection")
+        types = set()
+        for _ in range(50):
+            types.update(l["type"] for l in generate_challenge()["client_data"]["lines"])
+        assert "cubic" in types
+
+
+class TestBroadPhase:
+    """Chunked sort-and-sweep in front of the sampled polyline test."""
+
+    def test_matches_full_pairwise_scan(self, seeded_random):
+        """Same points, in the same order, as testing every segment pair."""
+        seeded_random(99)
+        for _ in range(50):
+            a = _sample_line(_LINE_GENERATORS[random.choice(["straight", "quadratic", "cubic"])](400, 400, 30), 500)
+            b = _sample_line(_LINE_GENERATORS[random.choice(["straight", "quadratic", "cubic"])](400, 400, 30), 500)
+            i, j = np.meshgrid(np.arange(len(a) - 1), np.arange(len(b) - 1), indexing="ij")
+            raw = _segment_pair_hits(a, b, i.ravel(), j.ravel())
+            expected = _cluster_points(raw, 3.0)
+            assert _find_polyline_intersections(a, b, 3.0) == expected
+
+    def test_crossing_on_chunk_boundary(self):
+        """A crossing exactly at a shared sample point between chunks is found."""
+        a = np.column_stack([np.linspace(0, 400, 33), np.full(33, 200.0)])  # 32 segments
+        b = np.column_stack([np.full(33, 200.0), np.linspace(0, 400, 33)])
+        assert _find_polyline_intersections(a, b, 3.0) == [[200.0, 200.0]]
+
+
+class TestBatchGeneration:
+    """Vectorised candidate sampling and the coarse crossing screen."""
+
+    def test_batch_respects_margins_and_min_length(self):
+        """Stored points stay inside the margin and endpoints meet the per-type minimum."""
+        rng = np.random.default_rng(0)
+        kinds, points = _sample_candidate_batch(rng, 64, 3, 400, 400, 30)
+        assert points.shape == (64, 3, 4, 2)
+        assert points.min() >= 30 and points.max() <= 370
+        lengths = np.hypot(*(points[:, :, 3] - points[:, :, 0]).transpose(2, 0, 1))
+        for kind, length in zip(kinds.ravel(), lengths.ravel()):
+            frac = 0.4 if _LINE_TYPES[kind] == "straight" else 0.3
+            assert length >= 400 * frac
+
+    def test_elevated_curves_match_originals(self):
+        """Degree elevation to cubic traces the same straight/quadratic curve."""
+        stored = np.array([[50.0, 60.0], [300.0, 20.0], [0.0, 0.0], [350.0, 340.0]])
+        t = np.linspace(0, 1, 16)
+        for kind in (0, 1, 2):
+            line = _candidate_lines(np.array([kind]), stored[np.newaxis])[0]
+            expected = _evaluate_bezier(np.array(line["points"]), t)
+            cubic = _CUBIC_ELEVATION[kind] @ stored
+            assert np.allclose(_bernstein_basis(3, 16) @ cubic, expected)
+
+    def test_coarse_count_perpendicular(self):
+        """The screen counts one crossing for two perpendicular lines."""
+        kinds = np.array([[0, 0]])
+        points = np.array([[
+            [[50, 200], [0, 0], [0, 0], [350, 200]],
+            [[200, 50], [0, 0], [0, 0], [200, 350]],
+        ]], dtype=float)
+        assert _coarse_crossing_counts(kinds, points, 32, 400, 400, 10).tolist() == [1]
+
+    def test_screen_keeps_exactly_valid_candidates(self):
+        """Candidates the exact solver accepts pass the screen, close crossings included."""
+        rng = np.random.default_rng(5)
+        kinds, points = _sample_candidate_batch(rng, 400, 3, 400, 400, 30)
+        counts = _coarse_crossing_counts(kinds, points, 32, 400, 400, 20)
+        valid = lost = 0
+        for k in range(len(kinds)):
+            ixs, misses = _intersect_lines(_candidate_lines(kinds[k], points[k]), 500, 3.0, 400, 400, 20)
+            if 1 <= len(ixs) <= 3 and not misses:
+                valid += 1
+                lost += not (1 <= counts[k] <= 3 + _SCREEN_OVERCOUNT)
+        assert valid > 100
+        assert lost <= valid // 100
+
+    def test_generation_is_reproducible_from_random_seed(self, seeded_random):
+        """Seeding ``random`` also seeds the batch RNG."""
+        seeded_random(5)
+        first = generate_challenge()
+        seeded_random(5)
+        second = generate_challenge()
+        assert first == second
+
+    def test_explicit_seed_reproduces_challenge(self):
+        """The same seed gives the same challenge regardless of global state."""
+        first = generate_challenge(seed=12345)
+        second = generate_challenge(seed=12345)
+        assert first == second
+        assert first["server_data"]["seed"] == 12345
+        assert generate_challenge(seed=54321) != first
+
+
+class TestConstructiveGeneration:
+    """Intersection-first generation mode."""
+
+    @pytest.fixture(autouse=True)
+    def _constructive(self, monkeypatch):
+        monkeypatch.setattr(config, "IMAGE_GENERATION_MODE", "constructive")
+
+    def test_quadratic_through_points(self):
+        """The built quadratic passes through both crossing points at the given parameters."""
+        x1, x2 = np.array([150.0, 200.0]), np.array([230.0, 180.0])
+        cp = np.array(_quadratic_through(x1, x2, 0.25, 0.7, np.array([200.0, 260.0])))
+        pts = _evaluate_bezier(cp, np.array([0.25, 0.7]))
+        assert np.allclose(pts, [x1, x2], atol=0.02)
+
+    def test_layouts_vary(self):
+        """Line types and the curve parameters of the crossings are not fixed per layout."""
+        rnd = random.Random(7)
+        types, params = set(), set()
+        for _ in range(300):
+            built = _construct_once(3, 3, 400, 400, 30, 10, rnd)
+            if built is None:
+                continue
+            lines, pts = built
+            types.add(tuple(sorted(l["type"] for l in lines)))
+            for line in lines:
+                if line["type"] == "quadratic":
+                    curve = _sample_line(line, 1001)
+                    for p in pts:
+                        t = int(np.argmin(np.hypot(*(curve - p).T)))
+                        params.add(round(t / 1000, 2))
+        assert {("straight",) * 3, ("quadratic", "straight", "straight")} <= types
+        assert len(params) > 20
+
+    @pytest.mark.parametrize("k", [1, 2, 3])
+    def test_weights_control_crossing_count(self, k, monkeypatch):
+        """With all weight on k, every challenge has exactly k crossings."""
+        monkeypatch.setattr(config, "IMAGE_CONSTRUCTIVE_TARGET_WEIGHTS", {k: 1.0})
+        for _ in range(30):
+            c = generate_challenge()
+            assert c["server_data"]["numIntersections"] == k
+            assert c["server_data"]["attempts"] <= config.IMAGE_MAX_GENERATION_RETRIES
+            for line in c["client_data"]["lines"]:
+                assert line["type"] in ("straight", "quadratic")
+                for x, y in line["points"]:
+                    assert config.IMAGE_CANVAS_MARGIN_PX - 0.01 <= x <= 400 - config.IMAGE_CANVAS_MARGIN_PX + 0.01
+                    assert config.IMAGE_CANVAS_MARGIN_PX - 0.01 <= y <= 400 - config.IMAGE_CANVAS_MARGIN_PX + 0.01
+
+    def test_exhausted_search_is_built_constructively(self, monkeypatch):
+        """Rejection mode with no search budget still yields a clean challenge."""
+        monkeypatch.setattr(config, "IMAGE_GENERATION_MODE", "rejection")
+        monkeypatch.setattr(config, "IMAGE_MAX_GENERATION_RETRIES", 0)
+        for seed in range(10):
+            c = generate_challenge(seed=seed)
+            assert c["server_data"]["attempts"] == 1
+            assert 1 <= c["server_data"]["numIntersections"] <= 3
+            _, misses = _intersect_lines(c["client_data"]["lines"], 500, 3.0, 400, 400, 10)
+            assert misses == []
+
+    def test_final_cross_is_valid_and_not_fixed(self):
+        """The post-budget cross always has one clean crossing, placed anywhere."""
+        rnd = random.Random(3)
+        crossings = []
+        for _ in range(200):
+            lines, (x,) = _random_cross(400, 400, 30, 10, rnd)
+            ixs, misses = _intersect_lines(lines, 500, 3.0, 400, 400, 10)
+            assert misses == []
+            assert len(ixs) == 1 and np.hypot(*(np.asarray(ixs[0]) - x)) < 0.1
+            crossings.append(x)
+        spread = np.ptp(np.asarray(crossings), axis=0)
+        assert np.all(spread > 250)
+
+    def test_crossings_are_separated(self):
+        """Designed crossings respect the minimum separation."""
+        for _ in range(30):
+            ixs = generate_challenge()["server_data"]["intersections"]
+            for i, p in enumerate(ixs):
+                for q in ixs[i + 1:]:
+                    dist = ((p[0] - q[0]) ** 2 + (p[1] - q[1]) ** 2) ** 0.5
+                    assert dist >= config.IMAGE_MIN_INTERSECTION_SEPARATION_PX - 1
+
+
+class TestBernsteinBasis:
+    """Cached basis matrices for Bézier sampling."""
+
+    def test_basis_is_cached_and_read_only(self):
+        """The same (degree, resolution) returns the same immutable matrix."""
+        basis = _bernstein_basis(3, 500)
+        assert basis is _bernstein_basis(3, 500)
+        assert basis.shape == (500, 4)
+        assert np.allclose(basis.sum(axis=1), 1.0)
+        with pytest.raises(ValueError):
+            basis[0, 0] = 2.0
+
+    def test_batched_sampling_matches_single(self):
+        """_sample_lines over mixed degrees equals per-line _sample_line."""
+        lines = [
+            _straight([10, 20], [300, 280]),
+            {"type": "quadratic", "points": [[0, 0], [200, 400], [400, 0]]},
+            {"type": "cubic", "points": [[0, 0], [100, 300], [300, 300], [400, 0]]},
+            _straight([50, 350], [350, 50]),
+        ]
+        for batched, line in zip(_sample_lines(lines, 200), lines):
+            assert np.allclose(batched, _sample_line(line, 200))
+
+
+class TestGridClustering:
+    """Spatial-hash _cluster_points against the all-pairs greedy scan."""
+
+    @staticmethod
+    def _reference(points, radius):
+        clusters, used = [], np.zeros(len(points), dtype=bool)
+        for i in range(len(points)):
+            if used[i]:
+                continue
+            dists = np.linalg.norm(points[i:] - points[i], axis=1)
+            nearby = np.where(dists < radius)[0] + i
+            used[nearby] = True
+            centroid = points[nearby].mean(axis=0)
+            clusters.append([round(float(centroid[0]), 2), round(float(centroid[1]), 2)])
+        return clusters
+
+    def test_matches_greedy_reference(self):
+        """Random clouds (including negative coords) cluster exactly as before."""
+        rng = np.random.default_rng(7)
+        for _ in range(100):
+            n = int(rng.integers(1, 200))
+            pts = rng.normal(rng.uniform(-50, 400), rng.uniform(0.5, 40), (n, 2))
+            assert _cluster_points(pts, 3.0) == self._reference(pts, 3.0)
+
+    def test_large_scatter(self):
+        """Thousands of raw points — as from a tangent overlap — stay tractable."""
+        pts = np.random.default_rng(1).uniform(0, 400, (5000, 2))
+        clusters = _cluster_points(pts, 3.0)
+        assert 0 < len(clusters) <= 5000
+        assert clusters == self._reference(pts, 3.0)
+
+    def test_empty_and_degenerate_radius(self):
+        """No points gives no clusters; a non-positive radius keeps every point."""
+        assert _cluster_points(np.empty((0, 2)), 3.0) == []
+        assert _cluster_points(np.array([[1.0, 2.0], [1.0, 2.0]]), 0.0) == [[1.0, 2.0], [1.0, 2.0]]
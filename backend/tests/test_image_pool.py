@@ -0,0 +1,123 @@
+"""Tests for image_pool.py — refill watermarks, max age, inline fallback, metrics."""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import config, feedback_routes, image_pool
+from backend.image_pool import ChallengePool
+
+
+class _Clock:
+    def __init__(self, start: float = 1000.0):
+        self.now = start
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _fake_generator():
+    counter = {"n": 0}
+
+    def generate():
+        counter["n"] += 1
+        return {
+            "client_data": {"n": counter["n"]},
+            "server_data": {"intersections": [], "attempts": 1 + counter["n"] % 2},
+        }
+
+    return generate
+
+
+@pytest.fixture()
+def clock(monkeypatch):
+    c = _Clock()
+    monkeypatch.setattr(image_pool.time, "time", c)
+    return c
+
+
+@pytest.fixture()
+def pool():
+    # Refills are driven by hand; take() never starts the worker.
+    return ChallengePool(low_water=2, high_water=5, max_age_s=60, generator=_fake_generator())
+
+
+class TestChallengePool:
+    """Pool behaviour with a stub generator and a fake clock."""
+
+    def test_empty_pool_generates_inline(self, pool, clock):
+        """take() on an empty pool still returns a challenge, counted as a miss."""
+        challenge = pool.take()
+        assert challenge["client_data"]["n"] == 1
+        stats = pool.stats()
+        assert stats["misses"] == 1
+        assert stats["hits"] == 0
+
+    def test_refill_to_high_water_and_serve_fifo(self, pool, clock):
+        """refill() tops up to high water; take() serves the oldest entry first."""
+        assert pool.refill() == 5
+        assert pool.refill() == 0
+        assert pool.take()["client_data"]["n"] == 1
+        assert pool.stats()["depth"] == 4
+        assert pool.stats()["hits"] == 1
+        assert pool._worker is None
+
+    def test_low_water_wakes_worker(self, pool, clock):
+        """Dropping below low water signals the refill worker."""
+        pool.refill()
+        for _ in range(3):
+            pool.take()
+        assert not pool._wake.is_set()  # depth 2
+        pool.take()
+        assert pool._wake.is_set()  # depth 1 < low water
+
+    def test_stale_entries_are_not_served(self, pool, clock):
+        """Entries older than max_age_s are dropped instead of served."""
+        pool.refill()
+        clock.now += 61
+        challenge = pool.take()
+        assert challenge["client_data"]["n"] == 6  # generated inline
+        stats = pool.stats()
+        assert stats["expired"] == 5
+        assert stats["misses"] == 1
+
+    def test_attempts_histogram(self, pool, clock):
+        """Every generation is recorded in the attempt histogram."""
+        pool.refill()
+        hist = pool.stats()["attempts_histogram"]
+        assert sum(hist.values()) == 5
+        assert set(hist) == {"1", "2"}
+
+
+class TestPoolRoutes:
+    """The generate route draws from the pool and exposes its metrics."""
+
+    def test_generate_uses_pool(self, client, monkeypatch):
+        """With the pool enabled, /generate serves a pooled challenge."""
+        p = ChallengePool(low_water=0, high_water=2, max_age_s=60)
+        monkeypatch.setattr(image_pool, "pool", p)
+        monkeypatch.setattr(feedback_routes, "FEEDBACK_SECRET", "s3cret")
+        p.refill()
+        resp = client.post("/captcha/image/generate")
+        assert resp.status_code == 200
+        stats = client.get("/captcha/image/pool?secret=s3cret").json()
+        assert stats["enabled"] is True
+        assert stats["hits"] == 1
+        assert stats["depth"] == 1
+
+    def test_pool_stats_require_secret(self, client, monkeypatch):
+        """The metrics endpoint is forbidden without the admin secret."""
+        monkeypatch.setattr(feedback_routes, "FEEDBACK_SECRET", "s3cret")
+        assert client.get("/captcha/image/pool").status_code == 403
+        assert client.get("/captcha/image/pool?secret=wrong").status_code == 403
+
+    @pytest.mark.parametrize("enabled", [True, False])
+    def test_worker_runs_only_in_lifespan(self, monkeypatch, enabled):
+        """The refill worker starts with the app when enabled and stops with it."""
+        from backend.main import app
+
+        p = ChallengePool(low_water=0, high_water=1, max_age_s=60, generator=_fake_generator())
+        monkeypatch.setattr(image_pool, "pool", p)
+        monkeypatch.setattr(config, "IMAGE_POOL_ENABLED", enabled)
+        with TestClient(app):
+            assert (p._worker is not None and p._worker.is_alive()) is enabled
+        assert p._worker is None or not p._worker.is_alive()
@@ -1,11 +1,14 @@
 """Tests for image_routes.py — API integration tests."""
 
 import json
+import re
 import time
+from pathlib import Path
 
 import pytest
 
-from backend import db
+from backend import config, db
+from backend import image_challenge as gen
 
 
 class TestImageRoutes:
@@ -47,9 +50,11 @@ class TestImageRoutes:
         data = resp.json()
         challenge_id = data["challengeId"]
 
-        # Fetch actual intersections from DB
+        # Regenerate the actual intersections from the stored seed
         row = db.get_image_challenge(challenge_id)
-        intersections = json.loads(row["intersections_json"])
+        intersections = gen.regenerate_challenge(
+            row["seed"], row["generator_version"], row["generator_fingerprint"],
+        )["server_data"]["intersections"]
 
         clicks = [{"x": ix[0], "y": ix[1]} for ix in intersections]
 
@@ -129,8 +134,6 @@ class TestImageRoutes:
 
     def test_validate_after_ttl_expired(self, client, monkeypatch):
         """POST /captcha/image/validate after TTL → 'challenge expired'."""
-        from backend import config
-
         monkeypatch.setattr(config, "IMAGE_CHALLENGE_TTL_MS", 0)
 
         resp = client.post("/captcha/image/generate")
@@ -148,3 +151,107 @@ class TestImageRoutes:
         )
         assert resp2.status_code == 200
         assert resp2.json()["reason"] == "challenge expired"
+
+
+class TestSeedStorage:
+    """Image challenges persist only a seed and generator version."""
+
+    def test_row_stores_seed_not_intersections(self, client):
+        """The challenge row has a seed and version but no intersections."""
+        data = client.post("/captcha/image/generate").json()
+        row = db.get_image_challenge(data["challengeId"])
+        assert row["intersections_json"] is None
+        assert row["seed"] is not None
+        assert row["generator_version"] == gen.GENERATOR_VERSION
+
+    def test_regenerated_lines_match_issued(self, client):
+        """Regenerating from the stored seed (cache cleared) reproduces the lines."""
+        data = client.post("/captcha/image/generate").json()
+        row = db.get_image_challenge(data["challengeId"])
+        gen._regenerated.clear()
+        challenge = gen.regenerate_challenge(
+            row["seed"], row["generator_version"], row["generator_fingerprint"],
+        )
+        assert challenge["client_data"]["lines"] == data["lines"]
+        assert challenge["server_data"]["numIntersections"] == row["num_intersections"]
+
+    def test_attempt_log_records_line_count(self, client):
+        """Validation logs the real number of lines instead of 0."""
+        data = client.post("/captcha/image/generate").json()
+        client.post(
+            "/captcha/image/validate",
+            json={"challengeId": data["challengeId"], "token": data["token"], "clicks": []},
+        )
+        with db._get_conn() as conn:
+            logged = conn.execute(
+                "SELECT num_lines FROM image_attempt_logs WHERE challenge_id = ?",
+                (data["challengeId"],),
+            ).fetchone()
+        assert logged["num_lines"] == len(data["lines"])
+
+    def test_unknown_generator_version_is_gone(self, client):
+        """A seed from a different generator version cannot be validated."""
+        data = client.post("/captcha/image/generate").json()
+        with db._get_conn() as conn:
+            conn.execute(
+                "UPDATE image_challenges SET generator_version = ? WHERE id = ?",
+                (gen.GENERATOR_VERSION + 1, data["challengeId"]),
+            )
+            conn.commit()
+        resp = client.post(
+            "/captcha/image/validate",
+            json={"challengeId": data["challengeId"], "token": data["token"], "clicks": []},
+        )
+        assert resp.status_code == 410
+
+    def test_config_change_is_gone(self, client, monkeypatch):
+        """A seed issued under different generation config cannot be validated."""
+        data = client.post("/captcha/image/generate").json()
+        monkeypatch.setattr(config, "IMAGE_NEAR_MISS_PX", config.IMAGE_NEAR_MISS_PX + 1)
+        resp = client.post(
+            "/captcha/image/validate",
+            json={"challengeId": data["challengeId"], "token": data["token"], "clicks": []},
+        )
+        assert resp.status_code == 410
+
+    def test_fingerprint_covers_generation_config(self):
+        """Every IMAGE_* setting the generator reads is part of the fingerprint."""
+        source = Path(gen.__file__).read_text()
+        used = set(re.findall(r"config\.(IMAGE_[A-Z_]+)", source))
+        # The cache size and library path do not change what a seed generates
+        # (the library file itself is fingerprinted by stat in template mode).
+        unfingerprinted = {"IMAGE_REGENERATE_CACHE_SIZE", "IMAGE_TEMPLATE_LIBRARY"}
+        assert used - unfingerprinted == set(gen._FINGERPRINT_CONFIG)
+
+    def test_legacy_table_is_migrated(self, tmp_path, monkeypatch):
+        """A pre-seed table keeps its rows and accepts seed-only inserts."""
+        import sqlite3
+
+        monkeypatch.setattr(config, "DB_PATH", tmp_path / "legacy.db")
+        conn = sqlite3.connect(config.DB_PATH)
+        conn.execute(
+            """
+            CREATE TABLE image_challenges (
+                id TEXT PRIMARY KEY,
+                intersections_json TEXT NOT NULL,
+                num_intersections INTEGER NOT NULL,
+                ttl_ms INTEGER NOT NULL,
+                used INTEGER DEFAULT 0,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        conn.execute(
+            "INSERT INTO image_challenges VALUES ('old', '[[1.0, 2.0]]', 1, 30000, 0, 0)"
+        )
+        conn.commit()
+        conn.close()
+
+        db.init_db()
+        assert json.loads(db.get_image_challenge("old")["intersections_json"]) == [[1.0, 2.0]]
+        db.save_image_challenge(
+            "new", seed=7, generator_version=1, generator_fingerprint="f",
+            num_intersections=2, ttl_ms=30000,
+        )
+        assert db.get_image_challenge("new")["seed"] == 7
+
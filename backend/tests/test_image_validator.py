@@ -188,3 +188,89 @@ class TestStrayClickRejection:
             solve_time_ms=5000,
         )
         assert result["passed"] is True
+
+
+# ─── Assignment and batch validation ─────────────────────────────────────
+
+
+class TestBatchValidation:
+    """Optimal matching and the stacked-array batch API."""
+
+    def test_optimal_assignment_beats_greedy(self):
+        """A click shared by two intersections is given to the one that needs it."""
+        # Greedy would hand (108, 100) to the first intersection and leave
+        # the second unmatched; (88, 100) only reaches the first.
+        result = validate_clicks(
+            clicks=[{"x": 108, "y": 100}, {"x": 88, "y": 100}],
+            intersections=[[100.0, 100.0], [120.0, 100.0]],
+            solve_time_ms=5000,
+        )
+        assert result["passed"] is True
+        assert result["matched"] == 2
+
+    def test_batch_matches_single_calls(self):
+        """Padded batches give the same result as one validate_clicks call each."""
+        import numpy as np
+
+        from backend.image_validator import validate_click_batch
+
+        rng = np.random.default_rng(3)
+        cases = []
+        for _ in range(300):
+            ix = rng.uniform(0, 100, (int(rng.integers(0, 4)), 2))
+            cl = rng.uniform(0, 100, (int(rng.integers(0, 9)), 2))
+            cases.append((ix, cl, float(rng.choice([100, 5000])), str(rng.choice(["mouse", "touch"]))))
+
+        clicks = np.zeros((len(cases), 8, 2))
+        intersections = np.zeros((len(cases), 3, 2))
+        for k, (ix, cl, _, _) in enumerate(cases):
+            clicks[k, :len(cl)] = cl
+            intersections[k, :len(ix)] = ix
+        batch = validate_click_batch(
+            clicks,
+            intersections,
+            solve_time_ms=[c[2] for c in cases],
+            pointer_type=[c[3] for c in cases],
+            num_clicks=[len(c[1]) for c in cases],
+            num_intersections=[len(c[0]) for c in cases],
+        )
+
+        for k, (ix, cl, solve_ms, pointer) in enumerate(cases):
+            single = validate_clicks(
+                [{"x": x, "y": y} for x, y in cl], ix.tolist(), solve_ms, pointer,
+            )
+            assert single == {
+                "passed": bool(batch["passed"][k]),
+                "reason": batch["reason"][k],
+                "matched": int(batch["matched"][k]),
+                "expected": int(batch["expected"][k]),
+                "excess": int(batch["excess"][k]),
+                "too_fast": bool(batch["too_fast"][k]),
+            }
+
+    def test_greedy_fallback_for_many_clicks(self, monkeypatch):
+        """Click counts past the exhaustive limit still match every intersection."""
+        monkeypatch.setattr(config, "IMAGE_CLICK_GRACE", 100)
+        clicks = [{"x": 100 + i % 3, "y": 100} for i in range(30)]
+        clicks.append({"x": 300, "y": 300})
+        result = validate_clicks(
+            clicks=clicks,
+            intersections=TWO_INTERSECTIONS,
+            solve_time_ms=5000,
+        )
+        assert result["passed"] is True
+        assert result["excess"] == 29
+
+    def test_click_count_over_grace_rejected_early(self):
+        """More clicks than intersections + grace fails without matching."""
+        clicks = [{"x": 200, "y": 200}] * (len(INTERSECTIONS) + config.IMAGE_CLICK_GRACE + 1)
+        result = validate_clicks(clicks=clicks, intersections=INTERSECTIONS, solve_time_ms=5000)
+        assert result["passed"] is False
+        assert result["reason"] == "too many clicks"
+        assert result["excess"] == len(clicks) - 1
+
+    def test_click_count_at_grace_still_scored(self):
+        """Exactly intersections + grace clicks, all on target, still passes."""
+        clicks = [{"x": 200, "y": 200}] * (len(INTERSECTIONS) + config.IMAGE_CLICK_GRACE)
+        result = validate_clicks(clicks=clicks, intersections=INTERSECTIONS, solve_time_ms=5000)
+        assert result["passed"] is True
@@ -0,0 +1,227 @@
+"""Tests for the line CAPTCHA routes — DB-backed and stateless (sealed token) modes."""
+
+import sqlite3
+import time
+
+import pytest
+
+from backend import captcha_token, config, replay
+
+
+@pytest.fixture()
+def stateless(monkeypatch):
+    monkeypatch.setattr(config, "LINE_STATELESS_CHALLENGES", True)
+    monkeypatch.setattr(
+        replay, "line_nonces",
+        replay.ReplayFilter(max_age_s=20, partition_s=5, num_bits=1 << 12, num_hashes=4),
+    )
+
+
+def _verify_body(data, trajectory=None):
+    start = data["startPoint"]
+    return {
+        "challengeId": data["challengeId"],
+        "nonce": data["nonce"],
+        "token": data["token"],
+        "sessionId": "s",
+        "pointerType": "mouse",
+        "trajectory": trajectory or [
+            {"x": start[0], "y": start[1], "t": 0},
+            {"x": start[0] + 1, "y": start[1], "t": 16},
+        ],
+    }
+
+
+class TestLineChallenge:
+    """DB-backed challenges: row on issue, nonce flipped on verify."""
+
+    def test_verify_is_single_use(self, client):
+        """new → peek → verify succeeds; a second verify → 410."""
+        data = client.post("/captcha/line/new").json()
+        peek = client.post("/captcha/line/peek", json={
+            "challengeId": data["challengeId"],
+            "nonce": data["nonce"],
+            "token": data["token"],
+            "cursor": data["startPoint"],
+        })
+        assert peek.status_code == 200
+        assert client.post("/captcha/line/verify", json=_verify_body(data)).status_code == 200
+        assert client.post("/captcha/line/verify", json=_verify_body(data)).status_code == 410
+
+
+class TestPeekState:
+    """Signed rolling peek state replaces per-peek DB writes."""
+
+    def _peek(self, client, data, state=None):
+        body = {
+            "challengeId": data["challengeId"],
+            "nonce": data["nonce"],
+            "token": data["token"],
+            "cursor": data["startPoint"],
+        }
+        if state:
+            body["peekState"] = state
+        return client.post("/captcha/line/peek", json=body)
+
+    def test_peek_does_not_write_progress(self, client, monkeypatch):
+        """Peeks chain through peekState; the row is untouched until verify."""
+        from backend import db
+
+        monkeypatch.setattr(config, "ENFORCE_PEEK_RATE", False)
+        data = client.post("/captcha/line/new").json()
+        state = None
+        for _ in range(3):
+            resp = self._peek(client, data, state)
+            assert resp.status_code == 200
+            state = resp.json()["peekState"]
+        row = db.get_challenge(data["challengeId"])
+        assert row["peek_count"] == 0
+
+        body = _verify_body(data)
+        body["peekState"] = state
+        resp = client.post("/captcha/line/verify", json=body)
+        assert resp.json()["metrics"]["peekCount"] == 3
+        row = db.get_challenge(data["challengeId"])
+        assert row["peek_count"] == 3
+        assert row["nonce_used"] == 1
+
+    def test_resent_state_derives_same_successor_count(self, client, monkeypatch):
+        """A retried peek from the same state gets a successor at the same n, not a jump."""
+        monkeypatch.setattr(config, "ENFORCE_PEEK_RATE", False)
+        data = client.post("/captcha/line/new").json()
+        first = self._peek(client, data).json()["peekState"]
+        retries = [self._peek(client, data, first).json()["peekState"] for _ in range(2)]
+        assert [captcha_token.verify(s)["n"] for s in retries] == [2, 2]
+
+    def test_peeks_write_nothing(self, client, monkeypatch):
+        """Peeks touch neither the replay store nor the challenge row."""
+        monkeypatch.setattr(config, "ENFORCE_PEEK_RATE", False)
+        data = client.post("/captcha/line/new").json()
+        state = None
+        for _ in range(3):
+            state = self._peek(client, data, state).json()["peekState"]
+        conn = sqlite3.connect(config.DATA_DIR / config.REPLAY_DB_NAME)
+        tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        assert "peek_chain" not in tables
+        if "used_nonces" in tables:
+            assert conn.execute("SELECT COUNT(*) FROM used_nonces").fetchone()[0] == 0
+
+    def test_state_rate_limit_enforced(self, client):
+        """Peek rate is enforced from the state token's timestamp."""
+        data = client.post("/captcha/line/new").json()
+        first = self._peek(client, data).json()["peekState"]
+        assert self._peek(client, data, first).status_code == 429
+
+    def test_forged_state_rejected(self, client):
+        """A peek state from another challenge → 401."""
+        a = client.post("/captcha/line/new").json()
+        b = client.post("/captcha/line/new").json()
+        state_a = self._peek(client, a).json()["peekState"]
+        assert self._peek(client, b, state_a).status_code == 401
+
+
+class TestStatelessLineChallenge:
+    """Issuance writes nothing; peek and verify work from the token alone."""
+
+    def test_new_writes_no_challenge_row(self, client, stateless):
+        """POST /captcha/line/new in stateless mode → no `challenges` row."""
+        resp = client.post("/captcha/line/new")
+        assert resp.status_code == 200
+        conn = sqlite3.connect(config.DB_PATH)
+        assert conn.execute("SELECT COUNT(*) FROM challenges").fetchone()[0] == 0
+
+    def test_peek_regenerates_path(self, client, stateless):
+        """Peek at the start point returns a lookahead from the seed path."""
+        data = client.post("/captcha/line/new").json()
+        resp = client.post("/captcha/line/peek", json={
+            "challengeId": data["challengeId"],
+            "nonce": data["nonce"],
+            "token": data["token"],
+            "cursor": data["startPoint"],
+        })
+        assert resp.status_code == 200
+        assert len(resp.json()["ahead"]) >= 2
+
+    def test_verify_is_single_use(self, client, stateless):
+        """First verify is processed; replaying the token → 410."""
+        data = client.post("/captcha/line/new").json()
+        resp1 = client.post("/captcha/line/verify", json=_verify_body(data))
+        assert resp1.status_code == 200
+        resp2 = client.post("/captcha/line/verify", json=_verify_body(data))
+        assert resp2.status_code == 410
+        peek = client.post("/captcha/line/peek", json={
+            "challengeId": data["challengeId"],
+            "nonce": data["nonce"],
+            "token": data["token"],
+            "cursor": data["startPoint"],
+        })
+        assert peek.status_code == 410
+
+    def test_expired_token_refused_without_logging(self, client, stateless, monkeypatch):
+        """An expired sealed token → 410 on every post, and no attempt is logged."""
+        monkeypatch.setattr(config, "CHALLENGE_TTL_MS", 1)
+        data = client.post("/captcha/line/new").json()
+        time.sleep(0.01)
+        for _ in range(2):
+            resp = client.post("/captcha/line/verify", json=_verify_body(data))
+            assert resp.status_code == 410
+        conn = sqlite3.connect(config.DB_PATH)
+        assert conn.execute("SELECT COUNT(*) FROM attempt_logs").fetchone()[0] == 0
+
+    def test_mismatched_challenge_id_rejected(self, client, stateless):
+        """A sealed token presented with another challenge id → 401."""
+        data = client.post("/captcha/line/new").json()
+        body = _verify_body(data)
+        body["challengeId"] = "0" * 32
+        assert client.post("/captcha/line/verify", json=body).status_code == 401
+
+    def test_sealed_token_refused_when_mode_off(self, client, stateless, monkeypatch):
+        """Turning LINE_STATELESS_CHALLENGES off disables outstanding sealed tokens."""
+        data = client.post("/captcha/line/new").json()
+        monkeypatch.setattr(config, "LINE_STATELESS_CHALLENGES", False)
+        assert client.post("/captcha/line/verify", json=_verify_body(data)).status_code == 401
+
+
+class TestReplayFilter:
+    """Time-partitioned Bloom filter for used nonces."""
+
+    def test_consume_once(self):
+        f = replay.ReplayFilter(max_age_s=20, partition_s=5, num_bits=1 << 12, num_hashes=4)
+        now = time.time()
+        assert f.consume("n1", now) is True
+        assert f.consume("n1", now) is False
+        assert f.is_used("n1", now)
+        assert not f.is_used("n2", now)
+
+    def test_old_partitions_dropped(self):
+        f = replay.ReplayFilter(max_age_s=20, partition_s=5, num_bits=1 << 12, num_hashes=4)
+        now = time.time()
+        f.consume("n1", now)
+        assert f.consume("n2", now - 60) is False  # beyond horizon: treated as used
+        assert len(f._partitions) == 1
+
+
+class TestSQLiteReplayStore:
+    """Used nonces shared through a SQLite file, as used across uvicorn workers."""
+
+    def test_nonce_is_single_use_across_workers(self, tmp_path):
+        """A nonce consumed by one worker is rejected by another."""
+        worker_a = replay.SQLiteReplayStore(max_age_s=20, db_path=tmp_path / "replay.db")
+        worker_b = replay.SQLiteReplayStore(max_age_s=20, db_path=tmp_path / "replay.db")
+        now = time.time()
+        assert worker_a.consume("n1", now) is True
+        assert worker_b.is_used("n1", now)
+        assert worker_b.consume("n1", now) is False
+        assert not worker_b.is_used("n2", now)
+
+    def test_expired_nonces_swept(self, tmp_path, monkeypatch):
+        """Nonces past the horizon count as used and their rows are swept."""
+        store = replay.SQLiteReplayStore(max_age_s=20, db_path=tmp_path / "replay.db", sweep_every=1)
+        monkeypatch.setattr(replay.time, "time", lambda: 1000.0)
+        assert store.consume("old", 900.0) is False
+        store.consume("n1", 990.0)
+        monkeypatch.setattr(replay.time, "time", lambda: 1015.0)
+        store.consume("n2", 1010.0)
+        rows = store._get_conn().execute("SELECT nonce FROM used_nonces").fetchall()
+        assert [r[0] for r in rows] == ["n2"]
+
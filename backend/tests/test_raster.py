@@ -0,0 +1,46 @@
+"""Tests for tests/security/raster.py — the NumPy challenge rasterizer."""
+
+import numpy as np
+
+from backend.tests.security.raster import BACKGROUND, render_batch, render_challenge
+
+
+def _client_data(lines):
+    return {"lines": lines, "canvas": {"width": 100, "height": 80, "background": "#FFFFFF"}}
+
+
+HORIZONTAL = {"type": "straight", "points": [[10, 40], [90, 40]], "colour": "#FF0000", "thickness": 4.0}
+
+
+class TestRasterizer:
+    """Anti-aliased rendering of client_data."""
+
+    def test_background_and_line_colour(self):
+        """Untouched pixels keep the background; the stroke centre is the line colour."""
+        img = render_challenge(_client_data([HORIZONTAL]))
+        assert img.shape == (80, 100, 3) and img.dtype == np.uint8
+        bg = [int(BACKGROUND[i:i + 2], 16) for i in (1, 3, 5)]
+        assert img[5, 5].tolist() == bg
+        assert img[40, 50].tolist() == [255, 0, 0]
+
+    def test_edges_are_anti_aliased(self):
+        """Pixels straddling the stroke edge get a partial blend."""
+        wide = dict(HORIZONTAL, points=[[10, 40.3], [90, 40.3]], thickness=3.0)
+        column = render_challenge(_client_data([wide]))[:, 50, 0]
+        partial = (column > 10) & (column < 255)
+        assert partial.any()
+
+    def test_curves_follow_control_points(self):
+        """A quadratic's midpoint B(1/2) is painted."""
+        quad = {"type": "quadratic", "points": [[10, 70], [50, 10], [90, 70]], "colour": "#00FF00", "thickness": 3.0}
+        img = render_challenge(_client_data([quad]))
+        assert img[40, 50, 1] == 255  # B(1/2) = (50, 40)
+
+    def test_batch_fills_preallocated_buffer(self):
+        """render_batch writes into the given buffer and matches single renders."""
+        datas = [_client_data([HORIZONTAL]), _client_data([dict(HORIZONTAL, points=[[50, 5], [50, 75]])])]
+        buf = np.zeros((2, 80, 100, 3), dtype=np.uint8)
+        out = render_batch(datas, out=buf)
+        assert out is buf
+        for data, img in zip(datas, buf):
+            assert np.array_equal(img, render_challenge(data))
@@ -0,0 +1,225 @@
+"""Tests for rate_limit.py — sliding window, rejects, idle expiry, LRU bound, shared backend."""
+
+import sqlite3
+
+import fastapi
+import pytest
+
+from backend import rate_limit
+from backend.rate_limit import MemoryBackend, RateLimiter, SQLiteBackend
+
+
+class _Clock:
+    def __init__(self, start: float = 1000.0):
+        self.now = start
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture()
+def clock(monkeypatch):
+    c = _Clock()
+    monkeypatch.setattr(rate_limit.time, "time", c)
+    return c
+
+
+class TestRateLimiter:
+    """Sliding-window counter behaviour and bounded key state."""
+
+    def test_allows_up_to_limit_then_rejects(self, clock):
+        """max_requests calls pass; the next one raises 429."""
+        limiter = RateLimiter(window_s=60, max_requests=3)
+        for _ in range(3):
+            limiter.check("1.2.3.4")
+        with pytest.raises(fastapi.HTTPException) as exc:
+            limiter.check("1.2.3.4")
+        assert exc.value.status_code == 429
+        assert limiter.stats()["rejected"] == 1
+
+    def test_previous_window_decays(self, clock):
+        """A full previous window blocks early in the next window, not late."""
+        limiter = RateLimiter(window_s=60, max_requests=3)
+        clock.now = 60 * 100  # start of a window
+        for _ in range(3):
+            limiter.check("k")
+        clock.now += 60 + 6  # 10% into the next window: 3 * 0.9 = 2.7 < 3
+        limiter.check("k")
+        with pytest.raises(fastapi.HTTPException):
+            limiter.check("k")
+        clock.now += 50  # ~93% in: 3 * 0.07 + 1 = 1.2
+        limiter.check("k")
+
+    def test_keys_are_independent(self, clock):
+        """Exhausting one key does not affect another."""
+        limiter = RateLimiter(window_s=60, max_requests=1)
+        limiter.check("a")
+        limiter.check("b")
+        with pytest.raises(fastapi.HTTPException):
+            limiter.check("a")
+
+    def test_idle_keys_expire(self, clock):
+        """Keys idle for two windows are dropped from the table."""
+        limiter = RateLimiter(window_s=60, max_requests=5)
+        for i in range(50):
+            limiter.check(f"10.0.0.{i}")
+        clock.now += 121
+        limiter.check("fresh")
+        stats = limiter.stats()
+        assert stats["tracked_keys"] == 1
+        assert stats["expired"] == 50
+
+    def test_key_table_is_bounded(self, clock):
+        """A scan from many distinct keys never grows beyond max_keys."""
+        limiter = RateLimiter(window_s=60, max_requests=5, backend=MemoryBackend(max_keys=100))
+        for i in range(1000):
+            limiter.check(f"scan-{i}")
+        stats = limiter.stats()
+        assert stats["tracked_keys"] == 100
+        assert stats["evicted"] == 900
+
+
+    def test_short_window_keys_expire_behind_long_window_keys(self, clock):
+        """On a shared backend a live long-window key does not hold back short-window expiry."""
+        backend = MemoryBackend(max_keys=100)
+        slow = RateLimiter(window_s=3600, max_requests=5, scope="slow", backend=backend)
+        fast = RateLimiter(window_s=60, max_requests=5, scope="fast", backend=backend)
+        slow.check("ip")
+        for i in range(20):
+            fast.check(f"10.0.0.{i}")
+        clock.now += 121
+        fast.check("fresh")
+        assert fast.stats()["tracked_keys"] == 1
+        assert slow.stats()["tracked_keys"] == 1
+        assert backend.expired == 20
+
+    def test_eviction_is_lru_across_window_lengths(self, clock):
+        """Over max_keys, the least recently seen key goes whichever window it uses."""
+        backend = MemoryBackend(max_keys=2)
+        slow = RateLimiter(window_s=3600, max_requests=5, scope="slow", backend=backend)
+        fast = RateLimiter(window_s=60, max_requests=5, scope="fast", backend=backend)
+        fast.check("old")
+        clock.now += 1
+        slow.check("ip")
+        clock.now += 1
+        fast.check("new")
+        assert fast.stats()["tracked_keys"] == 1
+        assert slow.stats()["tracked_keys"] == 1
+        assert backend.evicted == 1
+
+class TestSQLiteBackend:
+    """Counters shared through a SQLite file, as used across uvicorn workers."""
+
+    def test_limit_is_shared_between_workers(self, clock, tmp_path):
+        """Two backends on the same file (two workers) share one budget."""
+        db_path = tmp_path / "rl.db"
+        worker_a = RateLimiter(window_s=60, max_requests=4, scope="c", backend=SQLiteBackend(db_path))
+        worker_b = RateLimiter(window_s=60, max_requests=4, scope="c", backend=SQLiteBackend(db_path))
+        worker_a.check("ip")
+        worker_b.check("ip")
+        worker_a.check("ip")
+        worker_b.check("ip")
+        with pytest.raises(fastapi.HTTPException):
+            worker_a.check("ip")
+        with pytest.raises(fastapi.HTTPException):
+            worker_b.check("ip")
+
+    def test_scopes_do_not_share_counts(self, clock, tmp_path):
+        """Limiters on one backend with different scopes are independent."""
+        backend = SQLiteBackend(tmp_path / "rl.db")
+        strict = RateLimiter(window_s=60, max_requests=1, scope="feedback", backend=backend)
+        loose = RateLimiter(window_s=60, max_requests=5, scope="challenge", backend=backend)
+        strict.check("ip")
+        loose.check("ip")
+        with pytest.raises(fastapi.HTTPException):
+            strict.check("ip")
+
+    def test_sweep_expires_and_caps_rows(self, clock, tmp_path):
+        """Idle rows are swept and live rows are capped at max_keys."""
+        backend = SQLiteBackend(tmp_path / "rl.db", max_keys=10, sweep_every=20)
+        limiter = RateLimiter(window_s=60, max_requests=5, scope="s", backend=backend)
+        for i in range(20):
+            limiter.check(f"old-{i}")
+        assert limiter.stats()["tracked_keys"] == 10
+        clock.now += 121
+        for i in range(20):
+            limiter.check(f"new-{i}")
+        stats = limiter.stats()
+        assert stats["tracked_keys"] == 10
+        assert stats["expired"] == 10
+
+
+    def test_connection_is_reused(self, clock, tmp_path):
+        """Checks on one thread share a single connection."""
+        backend = SQLiteBackend(tmp_path / "rl.db")
+        limiter = RateLimiter(window_s=60, max_requests=5, scope="s", backend=backend)
+        limiter.check("ip")
+        conn = backend._get_conn()
+        limiter.check("ip")
+        assert backend._get_conn() is conn
+
+    def test_locked_database_surfaces_original_error(self, clock, tmp_path):
+        """A lock timeout on BEGIN is raised as-is, not masked by a failed ROLLBACK."""
+        db_path = tmp_path / "rl.db"
+        backend = SQLiteBackend(db_path)
+        backend._get_conn().execute("PRAGMA busy_timeout = 0")
+        holder = sqlite3.connect(db_path, isolation_level=None)
+        holder.execute("BEGIN IMMEDIATE")
+        try:
+            with pytest.raises(sqlite3.OperationalError, match="locked"):
+                backend.acquire("s", "ip", 60, 5, clock.now)
+        finally:
+            holder.execute("ROLLBACK")
+            holder.close()
+        assert backend.acquire("s", "ip", 60, 5, clock.now)
+
+class TestRoutePolicies:
+    """Per-route limiters and the unknown-challenge negative cache."""
+
+    def test_unknown_peek_is_cached(self, client, monkeypatch):
+        """Repeated peeks at a bogus id hit SQLite once, then the miss cache."""
+        from backend import db
+
+        calls = []
+        real_get_conn = db._get_conn
+        monkeypatch.setattr(db, "_get_conn", lambda: calls.append(1) or real_get_conn())
+        body = {"challengeId": "deadbeef", "nonce": "n", "token": "t", "cursor": [0, 0]}
+        for _ in range(5):
+            resp = client.post("/captcha/line/peek", json=body)
+            assert resp.status_code == 404
+        assert len(calls) == 1
+        assert db._missing_challenges.hits == 4
+
+    def test_per_challenge_budget_on_validate(self, client):
+        """Hammering one image challenge id is throttled before any lookup."""
+        body = {"challengeId": "deadbeef", "token": "t", "clicks": []}
+        limit = rate_limit.limiters["image_validate_challenge"].max_requests
+        for _ in range(limit):
+            assert client.post("/captcha/image/validate", json=body).status_code == 400
+        assert client.post("/captcha/image/validate", json=body).status_code == 429
+
+    def test_random_ids_do_not_evict_ip_counters(self, client, monkeypatch):
+        """Flooding id-keyed scopes with fresh ids leaves the per-IP budget intact."""
+        id_limiter = rate_limit.limiters["image_validate_challenge"]
+        monkeypatch.setattr(id_limiter, "backend", MemoryBackend(max_keys=10))
+        ip_limiter = rate_limit.limiters["image_validate"]
+        assert ip_limiter.backend is not id_limiter.backend
+        body = {"token": "t", "clicks": []}
+        for i in range(ip_limiter.max_requests):
+            client.post("/captcha/image/validate", json={**body, "challengeId": f"id{i}"})
+        assert id_limiter.stats()["evicted"] > 0
+        resp = client.post("/captcha/image/validate", json={**body, "challengeId": "fresh"})
+        assert resp.status_code == 429
+
+    def test_questionnaire_is_limited(self, client):
+        """/questionnaire is throttled per client address."""
+        body = {
+            "sessionId": "s", "deviceType": "laptop", "ageRange": "18-24",
+            "techComfort": 3, "captchaFrequency": 3,
+            "captcha1Difficulty": 3, "captcha1Frustration": 3,
+            "captcha2Difficulty": 3, "captcha2Frustration": 3,
+        }
+        limit = rate_limit.limiters["questionnaire"].max_requests
+        for _ in range(limit):
+            assert client.post("/questionnaire", json=body).status_code == 200
+        assert client.post("/questionnaire", json=body).status_code == 429
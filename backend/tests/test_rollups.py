@@ -0,0 +1,130 @@
+"""Tests for the hourly attempt rollups maintained by db triggers."""
+
+import random
+import statistics
+
+import pytest
+
+from backend import db
+
+
+def _log_attempts(n, start=0, seed=0):
+    """Insert *n* line and image attempts spread over three hours."""
+    rnd = random.Random(seed)
+    rows = []
+    with db._get_conn() as conn:
+        for i in range(start, start + n):
+            created = 7200.0 * 100 + rnd.uniform(0, 3 * 3600)
+            pointer = rnd.choice(["mouse", "touch"])
+            line_time = rnd.uniform(500, 25000)
+            outcome = rnd.choice(["success", "coverage"])
+            conn.execute(
+                """
+                INSERT INTO attempt_logs (
+                    attempt_id, session_id, challenge_id, pointer_type, path_seed, path_length_px,
+                    tolerance_px, ttl_ms, started_at, ended_at, duration_ms, outcome_reason,
+                    coverage_ratio, created_at
+                ) VALUES (?, 's', 'c', ?, 'seed', 250, 20, 20000, 0, 1, ?, ?, 0.9, ?)
+                """,
+                (f"line{i}", pointer, line_time, outcome, created),
+            )
+            image_time = rnd.uniform(800, 9000)
+            passed = rnd.random() < 0.5
+            conn.execute(
+                """
+                INSERT INTO image_attempt_logs (
+                    attempt_id, challenge_id, num_lines, num_intersections, num_clicks, matched,
+                    excess, passed, reason, solve_time_ms, too_fast, clicks_json, pointer_type,
+                    created_at
+                ) VALUES (?, 'c', 3, 2, 2, 2, 0, ?, ?, ?, 0, '[]', NULL, ?)
+                """,
+                (f"img{i}", int(passed), "passed" if passed else "missed_intersections",
+                 image_time, created),
+            )
+            rows.append(("line", pointer, outcome, line_time, created))
+            rows.append(("image", "unknown", "passed" if passed else "missed_intersections",
+                         image_time, created))
+        conn.commit()
+    return rows
+
+
+class TestRollups:
+    """Rollups agree with the raw attempt logs."""
+
+    def test_totals_and_moments_match_raw_rows(self):
+        """Counts, pass counts, mean and std per group equal those of the raw rows."""
+        rows = _log_attempts(120)
+        for group in db.get_rollups():
+            times = [
+                t for kind, pointer, outcome, t, _ in rows
+                if (kind, pointer, outcome)
+                == (group["challenge_type"], group["pointer_type"], group["outcome"])
+            ]
+            assert group["count"] == len(times)
+            assert group["time_mean"] == pytest.approx(statistics.fmean(times))
+            assert group["time_std"] == pytest.approx(statistics.pstdev(times), rel=1e-6)
+            assert sum(group["histogram"]) == len(times)
+            assert group["passed"] == (len(times) if group["outcome"] in ("success", "passed") else 0)
+
+    def test_histogram_buckets_and_overflow(self):
+        """Times land in ROLLUP_BUCKET_MS buckets; long ones in the last bucket."""
+        rows = _log_attempts(80)
+        (line,) = db.get_rollups(challenge_type="line", by=("challenge_type",))
+        expected = [0] * (db.ROLLUP_MAX_BUCKET + 1)
+        for kind, _, _, t, _ in rows:
+            if kind == "line":
+                expected[min(int(t // db.ROLLUP_BUCKET_MS), db.ROLLUP_MAX_BUCKET)] += 1
+        assert line["histogram"] == expected
+        assert expected[-1] > 0
+
+    def test_negative_duration_counts_in_first_bucket(self):
+        """A negative duration (non-monotonic client timestamps) lands in bucket 0."""
+        with db._get_conn() as conn:
+            for i, duration in enumerate([-100.0, -50000.0]):
+                conn.execute(
+                    """
+                    INSERT INTO attempt_logs (
+                        attempt_id, session_id, challenge_id, pointer_type, path_seed,
+                        path_length_px, tolerance_px, ttl_ms, started_at, ended_at, duration_ms,
+                        outcome_reason, coverage_ratio, created_at
+                    ) VALUES (?, 's', 'c', 'mouse', 'seed', 250, 20, 20000, 0, 1, ?, 'coverage', 0.9, 0)
+                    """,
+                    (f"neg{i}", duration),
+                )
+            # A bucket stored before clamping is folded into range on read.
+            conn.execute(
+                "INSERT INTO attempt_rollup_hist VALUES (0, 'line', 'mouse', 'coverage', -200, 1)"
+            )
+            conn.commit()
+        (line,) = db.get_rollups(challenge_type="line", by=("challenge_type",))
+        assert line["histogram"][0] == 3
+        assert sum(line["histogram"]) == 3
+
+    def test_time_window_selects_hours(self):
+        """start/end select whole hours; the hour key splits a range."""
+        rows = _log_attempts(100)
+        first_hour = min(int(created // 3600) for *_, created in rows)
+        start, end = first_hour * 3600, (first_hour + 1) * 3600
+        (window,) = db.get_rollups(start=start, end=end, by=())
+        assert window["count"] == sum(1 for *_, created in rows if start <= created < end)
+        hours = db.get_rollups(by=("hour",))
+        assert sum(h["count"] for h in hours) == len(rows)
+
+    def test_backfill_on_existing_database(self):
+        """A database logged before rollups existed is folded in on init."""
+        rows = _log_attempts(50)
+        with db._get_conn() as conn:
+            conn.execute("DROP TABLE attempt_rollups")
+            conn.execute("DROP TABLE attempt_rollup_hist")
+            conn.commit()
+        db.init_db()
+        (total,) = db.get_rollups(by=())
+        assert total["count"] == len(rows)
+        _log_attempts(10, start=50, seed=1)
+        (total,) = db.get_rollups(by=())
+        assert total["count"] == len(rows) + 20
+
+    def test_unknown_group_key_rejected(self):
+        """Grouping by a non-key column is a ValueError, not SQL injection."""
+        with pytest.raises(ValueError):
+            db.get_rollups(by=("count; DROP TABLE feedback",))
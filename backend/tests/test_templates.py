@@ -0,0 +1,112 @@
+"""Tests for challenge template libraries and their random instancing."""
+
+import math
+import random
+
+import pytest
+
+from backend import config, image_challenge, path, template_library
+
+
+@pytest.fixture()
+def libraries(tmp_path, monkeypatch):
+    """Small path and image libraries written to a temporary directory."""
+    monkeypatch.setattr(config, "PATH_TEMPLATE_LIBRARY", tmp_path / "path_templates.json")
+    monkeypatch.setattr(config, "IMAGE_TEMPLATE_LIBRARY", tmp_path / "image_templates.json")
+    path_lib = path.build_path_templates(40, seed=1)
+    image_lib = image_challenge.build_image_templates(20, seed=1)
+    template_library.save_library(config.PATH_TEMPLATE_LIBRARY, path_lib)
+    template_library.save_library(config.IMAGE_TEMPLATE_LIBRARY, image_lib)
+    return path_lib, image_lib
+
+
+class TestSimilarity:
+    """Random similarity transforms fitted to a box."""
+
+    def test_fitted_points_stay_in_box(self):
+        """Transformed points lie inside the box for many random draws."""
+        points = [[30, 30], [370, 60], [200, 370], [50, 300]]
+        rnd = random.Random(0)
+        for _ in range(200):
+            transform, scale = template_library.fit_similarity(points, (30, 30, 370, 370), rnd)
+            for x, y in template_library.apply_similarity(transform, points):
+                assert 30 - 1e-9 <= x <= 370 + 1e-9 and 30 - 1e-9 <= y <= 370 + 1e-9
+
+    def test_transform_is_a_similarity(self):
+        """Distances scale uniformly by the returned scale factor."""
+        points = [[100, 100], [250, 120], [180, 300]]
+        transform, scale = template_library.fit_similarity(points, (0, 0, 400, 400), random.Random(3))
+        mapped = template_library.apply_similarity(transform, points)
+        for i in range(3):
+            for j in range(i + 1, 3):
+                before = math.dist(points[i], points[j])
+                assert math.dist(mapped[i], mapped[j]) == pytest.approx(before * scale)
+
+    def test_mismatched_header_is_ignored(self, tmp_path):
+        """A library built for another canvas is not loaded."""
+        target = tmp_path / "lib.json"
+        template_library.save_library(target, {"kind": "path", "canvas": [300, 300], "templates": [{}]})
+        assert template_library.load_library(target, kind="path", canvas=[400, 400]) is None
+        assert template_library.load_library(target, kind="path", canvas=[300, 300]) is not None
+
+
+class TestPathTemplates:
+    """Line paths instanced from the path library."""
+
+    def test_precomputed_properties_match_points(self, libraries):
+        """Instanced length and curvature equal values recomputed from the points."""
+        path_lib, _ = libraries
+        rnd = random.Random(5)
+        for _ in range(50):
+            pts, length, curvature = path.instance_path_template(path_lib, rnd)
+            assert length == pytest.approx(path._approx_length(pts))
+            assert curvature == pytest.approx(path.curvature_profile(pts), abs=1e-6)
+            assert config.PATH_TRAVEL_PX_MIN <= length <= config.PATH_TRAVEL_PX_MAX + 1e-9
+
+    def test_generate_path_uses_library_when_enabled(self, libraries, monkeypatch):
+        """generate_path instances templates deterministically when enabled."""
+        monkeypatch.setattr(config, "PATH_TEMPLATES_ENABLED", True)
+        first = path.generate_path("abc")
+        assert path.generate_path("abc") == first
+        assert path.generate_path("abd") != first
+
+    def test_missing_library_falls_back(self, tmp_path, monkeypatch):
+        """Without a library file generate_path builds a fresh path."""
+        monkeypatch.setattr(config, "PATH_TEMPLATE_LIBRARY", tmp_path / "missing.json")
+        monkeypatch.setattr(config, "PATH_TEMPLATES_ENABLED", True)
+        enabled = path.generate_path("abc")
+        monkeypatch.setattr(config, "PATH_TEMPLATES_ENABLED", False)
+        assert path.generate_path("abc") == enabled
+
+
+class TestImageTemplates:
+    """Image challenges instanced from the image library."""
+
+    def test_transformed_intersections_are_exact(self, libraries, monkeypatch):
+        """Mapped intersections match a fresh intersection search on the mapped lines."""
+        monkeypatch.setattr(config, "IMAGE_GENERATION_MODE", "template")
+        for seed in range(40):
+            challenge = image_challenge.generate_challenge(seed=seed)
+            lines = challenge["client_data"]["lines"]
+            expected = challenge["server_data"]["intersections"]
+            found, near_misses = image_challenge._intersect_lines(
+                lines, 500, 3.0, 400, 400, config.IMAGE_INTERSECTION_MARGIN_PX,
+            )
+            assert not near_misses
+            assert len(found) == len(expected)
+            for point in found:
+                assert min(math.dist(point, e) for e in expected) < 0.5
+
+    def test_template_mode_is_seed_deterministic(self, libraries, monkeypatch):
+        """The same seed regenerates the same instanced challenge."""
+        monkeypatch.setattr(config, "IMAGE_GENERATION_MODE", "template")
+        a = image_challenge.generate_challenge(seed=123)
+        b = image_challenge.generate_challenge(seed=123)
+        assert a == b
+        assert a["server_data"]["attempts"] == 1
+
+    def test_build_refuses_template_mode(self, monkeypatch):
+        """Templates cannot be built from templates."""
+        monkeypatch.setattr(config, "IMAGE_GENERATION_MODE", "template")
+        with pytest.raises(ValueError):
+            image_challenge.build_image_templates(1)
@@ -89,3 +89,82 @@ class TestToken:
         )
         assert resp2.status_code == 200
         assert resp2.json()["reason"] == "challenge expired"
+
+
+class TestSealedToken:
+    """Encrypted + authenticated tokens used by stateless line challenges."""
+
+    def test_seal_unseal_roundtrip(self):
+        """seal() → unseal() round-trip restores the claims."""
+        payload = {"cid": "abc123", "tm": 21.5, "jm": 1.5}
+        token = captcha_token.seal(payload)
+        assert captcha_token.is_sealed(token)
+        assert captcha_token.unseal(token) == payload
+
+    def test_sealed_claims_not_readable(self):
+        """Claims do not appear in the token in plaintext or base64."""
+        token = captcha_token.seal({"secretfield": "tolerance"})
+        assert "tolerance" not in token
+        assert "secretfield" not in token
+        assert captcha_token.sign({"secretfield": 1}).split(".")[0] not in token
+
+    def test_tampered_sealed_token_rejected(self):
+        """Flipping a ciphertext character → unseal() raises ValueError."""
+        iv, ct, tag = captcha_token.seal({"cid": "abc123"}).split(".")
+        ct = ("a" if ct[0] != "a" else "b") + ct[1:]
+        with pytest.raises(ValueError):
+            captcha_token.unseal(f"{iv}.{ct}.{tag}")
+
+
+class TestKeyRing:
+    """Key ids, rotation with retiring keys, and the verified-token cache."""
+
+    def test_token_carries_active_kid(self, monkeypatch):
+        """Signed and sealed tokens are prefixed with the active key id."""
+        from backend import config
+
+        monkeypatch.setattr(config, "TOKEN_KEYS", [("k2", "new-secret"), ("k1", "old-secret")])
+        assert captcha_token.sign({"cid": "a"}).startswith("k2~")
+        assert captcha_token.seal({"cid": "a"}).startswith("k2~")
+
+    def test_retiring_key_still_verifies(self, monkeypatch):
+        """A token from the old key verifies while it is retiring, not after removal."""
+        from backend import config
+
+        monkeypatch.setattr(config, "TOKEN_KEYS", [("k1", "old-secret")])
+        signed = captcha_token.sign({"cid": "a"})
+        sealed = captcha_token.seal({"cid": "a"})
+
+        monkeypatch.setattr(config, "TOKEN_KEYS", [("k2", "new-secret"), ("k1", "old-secret")])
+        assert captcha_token.verify(signed)["cid"] == "a"
+        assert captcha_token.unseal(sealed)["cid"] == "a"
+
+        monkeypatch.setattr(config, "TOKEN_KEYS", [("k2", "new-secret")])
+        with pytest.raises(ValueError):
+            captcha_token.verify(signed)
+        with pytest.raises(ValueError):
+            captcha_token.unseal(sealed)
+
+    def test_legacy_token_without_kid(self, monkeypatch):
+        """Tokens issued before the key ring verify against the active key."""
+        from backend import config
+
+        monkeypatch.setattr(config, "TOKEN_KEYS", [("k0", "secret")])
+        legacy = captcha_token.sign({"cid": "a"}).split("~", 1)[1]
+        assert captcha_token.verify(legacy)["cid"] == "a"
+
+    def test_repeat_verify_hits_cache(self):
+        """Verifying the same token again is served from the cache as a copy."""
+        token = captcha_token.sign({"cid": "abc123"})
+        first = captcha_token.verify(token)
+        hits = captcha_token._verified.hits
+        first["cid"] = "mutated"
+        assert captcha_token.verify(token)["cid"] == "abc123"
+        assert captcha_token._verified.hits == hits + 1
+
+    def test_cache_does_not_cross_token_kinds(self):
+        """A cached sealed token is not accepted by verify()."""
+        token = captcha_token.seal({"cid": "abc123"})
+        captcha_token.unseal(token)
+        with pytest.raises(ValueError):
+            captcha_token.verify(token)
@@ -50,6 +50,7 @@ export function CaptchaCanvas({
   const showFinishRef = useRef(false);
   const distanceToEndRef = useRef<number | null>(null);
   const peekInFlightRef = useRef(false);
+  const peekStateRef = useRef<string | null>(null);
 
   // Low-frequency state that actually needs re-renders
   const [solved, setSolved] = useState(false);
@@ -106,6 +107,7 @@ export function CaptchaCanvas({
       showFinishRef.current = false;
       distanceToEndRef.current = null;
       peekInFlightRef.current = false;
+      peekStateRef.current = null;
       setSolved(false);
       setNeedsReset(false);
       setExpired(false);
@@ -114,6 +116,7 @@ export function CaptchaCanvas({
       // Prime lookahead at start point
       fetchLookahead(challenge, challenge.startPoint[0], challenge.startPoint[1])
         .then(data => {
+          peekStateRef.current = data.peekState ?? peekStateRef.current;
           lookaheadRef.current = data.ahead;
           distanceToEndRef.current = data.distanceToEnd;
           showFinishRef.current = Boolean(data.finish);
@@ -335,8 +338,9 @@ export function CaptchaCanvas({
     if (!challenge) return;
 
     peekInFlightRef.current = true;
-    fetchLookahead(challenge, x, y, pointerProfileRef.current)
+    fetchLookahead(challenge, x, y, pointerProfileRef.current, peekStateRef.current)
       .then(data => {
+        peekStateRef.current = data.peekState ?? peekStateRef.current;
         lookaheadRef.current = data.ahead;
         distanceToEndRef.current = data.distanceToEnd;
         showFinishRef.current = Boolean(data.finish);
@@ -380,7 +384,8 @@ export function CaptchaCanvas({
         trajectory,
         pointerProfileRef.current,
         clientTimingMs,
-        trajectoryHash
+        trajectoryHash,
+        peekStateRef.current
       );
 
       if (data.passed) {
@@ -85,6 +85,7 @@ export interface LookaheadResponse {
   ahead: [number, number][];
   distanceToEnd: number;
   finish?: [number, number];
+  peekState?: string;  // echo on the next peek and on verify
 }
 
 export async function fetchChallenge(): Promise<Challenge> {
@@ -101,7 +102,8 @@ export async function verifyAttempt(
   trajectory: TrajectoryPoint[],
   pointerType: string,
   clientTimingMs: number,
-  trajectoryHash: string
+  trajectoryHash: string,
+  peekState: string | null = null
 ): Promise<VerificationResponse> {
   const body = {
     challengeId: challenge.challengeId,
@@ -115,6 +117,7 @@ export async function verifyAttempt(
     trajectory,
     trajectoryHash,
     clientTimingMs,
+    peekState,
   };
 
   const res = await fetchWithTimeout(`${API_BASE}/captcha/line/verify`, {
@@ -135,7 +138,8 @@ export async function fetchLookahead(
   challenge: Challenge,
   x: number,
   y: number,
-  pointerType: string = "mouse"
+  pointerType: string = "mouse",
+  peekState: string | null = null
 ): Promise<LookaheadResponse> {
   const res = await fetchWithTimeout(`${API_BASE}/captcha/line/peek`, {
     method: "POST",
@@ -146,6 +150,7 @@ export async function fetchLookahead(
       token: challenge.token,
       cursor: [x, y],
       pointerType,
+      peekState,
     }),
   });
 
@@ -153,6 +153,7 @@ def run_attempt(
     max_duration = min(ttl_ms, max_ms)
     loops = 0
     last_peek_ts = 0.0
+    peek_state = None
     while t_ms < max_duration:
         loops += 1
         now = time.time()
@@ -161,9 +162,10 @@ def run_attempt(
             time.sleep((peek_interval_ms - since) / 1000.0)
         peek = _post_json(
             peek_url,
-            {"challengeId": challenge_id, "nonce": nonce, "token": token, "cursor": cursor},
+            {"challengeId": challenge_id, "nonce": nonce, "token": token, "cursor": cursor, "peekState": peek_state},
         )
         last_peek_ts = time.time()
+        peek_state = peek.get("peekState") or peek_state
         ahead = _forward_polyline(peek.get("ahead") or [], cursor)
         finish = peek.get("finish")
         if finish and (not ahead or ahead[-1] != finish):
@@ -196,6 +198,7 @@ def run_attempt(
         "browserFamily": "bot",
         "devicePixelRatio": 1,
         "trajectory": trajectory,
+        "peekState": peek_state,
     }
     result = _post_json(verify_url, verify_payload)
     if verbose:
@@ -2,85 +2,68 @@
 """
 Beyond Recognition — Study Results Dashboard
 
-Run:  python scripts/dashboard.py
+Run:  python scripts/dashboard.py              (Supabase, refreshed every 60 s)
+      python scripts/dashboard.py --local      (offline, from data/captcha.db)
 Open: http://localhost:8050
+
+Rows are cached in data/dashboard_cache.db and only newer rows are fetched
+on each refresh; see dashboard_data.py.
 """
 
-import json
-import urllib.request
-from collections import Counter, defaultdict
+import argparse
+import os
 from datetime import datetime
+from pathlib import Path
 
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-from dash import Dash, html, dcc
+from dash import Dash, html, dcc, Input, Output
+
+from dashboard_data import (
+    CACHE_PATH,
+    COVERAGE_BINS,
+    DashboardCache,
+    DashboardData,
+    LocalSource,
+    SupabaseSource,
+)
 
-# ─── Supabase fetch ──────────────────────────────────────────────
+# ─── Supabase ────────────────────────────────────────────────────
 
-SUPABASE_URL = "https://utvncqkgaersidrtquif.supabase.co"
-SUPABASE_KEY = (
+SUPABASE_URL = os.getenv("SUPABASE_URL", "https://utvncqkgaersidrtquif.supabase.co")
+SUPABASE_KEY = os.getenv("SUPABASE_KEY") or (
     "eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9."
     "eyJpc3MiOiJzdXBhYmFzZSIsInJlZiI6InV0dm5jcWtnYWVyc2lkcnRxdWlmIiwi"
     "cm9sZSI6InNlcnZpY2Vfcm9sZSIsImlhdCI6MTc3NDQ1NjkzNSwiZXhwIjoyMDkw"
     "MDMyOTM1fQ.7YOabQCYg7ohJRxSWrbSjScDGkcKwoxQkfLYZ0AerQ4"
 )
-
-
-def fetch(table):
-    headers = {"Authorization": f"Bearer {SUPABASE_KEY}", "apikey": SUPABASE_KEY}
-    req = urllib.request.Request(
-        f"{SUPABASE_URL}/rest/v1/{table}?select=*&order=created_at.asc",
-        headers=headers,
-    )
-    with urllib.request.urlopen(req) as resp:
-        return json.loads(resp.read())
-
-
-line_data = fetch("attempt_logs")
-image_data = fetch("image_attempt_logs")
-quest_data = fetch("questionnaire_responses")
-
-# ─── Derived data ────────────────────────────────────────────────
-
-line_sessions = defaultdict(list)
-for a in line_data:
-    line_sessions[a["session_id"]].append(a)
-
-quest_by_session = {q["session_id"]: q for q in quest_data}
-
-total_participants = len(line_sessions)
-completed_participants = len(quest_data)
-
-line_pass_rate = (
-    sum(1 for a in line_data if a["outcome_reason"] == "success") / max(len(line_data), 1) * 100
-)
-image_pass_rate = (
-    sum(1 for a in image_data if a["passed"] == 1) / max(len(image_data), 1) * 100
-)
+LOCAL_DB_PATH = Path("data") / "captcha.db"
+REFRESH_S = 60
 
 # ─── Figures ─────────────────────────────────────────────────────
 
 
-def make_overview_cards():
+def make_overview_cards(agg):
+    counts = agg["counts"]
     fig = go.Figure()
     fig.add_trace(go.Indicator(
-        mode="number", value=total_participants,
+        mode="number", value=counts["sessions"],
         title={"text": "Sessions"},
         domain={"row": 0, "column": 0},
     ))
     fig.add_trace(go.Indicator(
-        mode="number", value=completed_participants,
+        mode="number", value=counts["completed"],
         title={"text": "Completed"},
         domain={"row": 0, "column": 1},
     ))
     fig.add_trace(go.Indicator(
-        mode="number+delta", value=line_pass_rate,
+        mode="number+delta", value=counts["line_pass_rate"],
         title={"text": "Line Pass %"},
         number={"suffix": "%"},
         domain={"row": 0, "column": 2},
     ))
     fig.add_trace(go.Indicator(
-        mode="number+delta", value=image_pass_rate,
+        mode="number+delta", value=counts["image_pass_rate"],
         title={"text": "Image Pass %"},
         number={"suffix": "%"},
         domain={"row": 0, "column": 3},
@@ -93,8 +76,8 @@ def make_overview_cards():
     return fig
 
 
-def make_line_outcomes():
-    reasons = Counter(a["outcome_reason"] for a in line_data)
+def make_line_outcomes(agg):
+    reasons = agg["line_outcomes"]
     labels = list(reasons.keys())
     values = list(reasons.values())
     colors = ["#22c55e" if l == "success" else "#ef4444" for l in labels]
@@ -108,8 +91,8 @@ def make_line_outcomes():
     return fig
 
 
-def make_image_outcomes():
-    reasons = Counter(a["reason"] for a in image_data)
+def make_image_outcomes(agg):
+    reasons = agg["image_outcomes"]
     labels = list(reasons.keys())
     values = list(reasons.values())
     colors = ["#22c55e" if "clicked" in l else "#ef4444" for l in labels]
@@ -123,15 +106,9 @@ def make_image_outcomes():
     return fig
 
 
-def make_per_session_pass_rates():
-    sessions = []
-    line_rates = []
-    image_rates = []
-    for sid, attempts in sorted(line_sessions.items(), key=lambda x: x[1][0]["created_at"]):
-        short = sid[:8]
-        lp = sum(1 for a in attempts if a["outcome_reason"] == "success")
-        sessions.append(short)
-        line_rates.append(lp / len(attempts) * 100)
+def make_per_session_pass_rates(agg):
+    sessions = [s["session_id"][:8] for s in agg["sessions"]]
+    line_rates = [s["pass_rate"] for s in agg["sessions"]]
 
     # Image doesn't have session_id — approximate by matching timestamps
     fig = go.Figure()
@@ -149,21 +126,27 @@ def make_per_session_pass_rates():
     return fig
 
 
-def make_solve_times():
-    line_success = [a["duration_ms"] for a in line_data if a["outcome_reason"] == "success"]
-    line_fail = [a["duration_ms"] for a in line_data if a["outcome_reason"] != "success"]
-    img_success = [a["solve_time_ms"] for a in image_data if a["passed"] == 1]
-    img_fail = [a["solve_time_ms"] for a in image_data if a["passed"] != 1]
+def _box(stats, name, color):
+    """A box trace from precomputed quartiles rather than raw samples."""
+    return go.Box(
+        name=name, x=[name], marker_color=color,
+        q1=[stats["q1"]], median=[stats["median"]], q3=[stats["q3"]],
+        lowerfence=[stats["min"]], upperfence=[stats["max"]],
+        hovertext=[f"n={stats['n']}"],
+    )
+
 
+def make_solve_times(agg):
+    times = agg["solve_times"]
     fig = make_subplots(rows=1, cols=2, subplot_titles=("Line CAPTCHA", "Image CAPTCHA"))
-    if line_success:
-        fig.add_trace(go.Box(y=line_success, name="Pass", marker_color="#22c55e"), row=1, col=1)
-    if line_fail:
-        fig.add_trace(go.Box(y=line_fail, name="Fail", marker_color="#ef4444"), row=1, col=1)
-    if img_success:
-        fig.add_trace(go.Box(y=img_success, name="Pass", marker_color="#22c55e"), row=1, col=2)
-    if img_fail:
-        fig.add_trace(go.Box(y=img_fail, name="Fail", marker_color="#ef4444"), row=1, col=2)
+    for key, name, color, col in (
+        ("line_pass", "Pass", "#22c55e", 1),
+        ("line_fail", "Fail", "#ef4444", 1),
+        ("image_pass", "Pass", "#22c55e", 2),
+        ("image_fail", "Fail", "#ef4444", 2),
+    ):
+        if times[key]:
+            fig.add_trace(_box(times[key], name, color), row=1, col=col)
 
     fig.update_yaxes(title_text="Duration (ms)")
     fig.update_layout(
@@ -174,62 +157,37 @@ def make_solve_times():
     return fig
 
 
-def make_coverage_distribution():
-    coverages = [a["coverage_ratio"] for a in line_data if a["coverage_ratio"] is not None]
-    outcomes = [a["outcome_reason"] for a in line_data if a["coverage_ratio"] is not None]
-    colors = ["#22c55e" if o == "success" else "#ef4444" for o in outcomes]
-
-    fig = go.Figure(go.Histogram(
-        x=coverages, nbinsx=20,
+def make_coverage_distribution(agg):
+    width = 1 / COVERAGE_BINS
+    fig = go.Figure(go.Bar(
+        x=[(i + 0.5) * width for i in range(COVERAGE_BINS)],
+        y=agg["coverage_histogram"], width=width,
         marker_color="#818cf8",
     ))
     fig.add_vline(x=0.75, line_dash="dash", line_color="#facc15",
                   annotation_text="75% threshold", annotation_position="top left")
     fig.update_layout(
         title="Line CAPTCHA Coverage Distribution",
-        xaxis_title="Coverage Ratio", yaxis_title="Count",
+        xaxis_title="Coverage Ratio", yaxis_title="Count", bargap=0,
         height=350, paper_bgcolor="#111827", plot_bgcolor="#1f2937",
         font_color="white",
     )
     return fig
 
 
-def make_pointer_comparison():
-    mouse_line = [a for a in line_data if a["pointer_type"] == "mouse"]
-    touch_line = [a for a in line_data if a["pointer_type"] == "touch"]
-    mouse_pass = sum(1 for a in mouse_line if a["outcome_reason"] == "success")
-    touch_pass = sum(1 for a in touch_line if a["outcome_reason"] == "success")
-
-    mouse_img = [a for a in image_data if a.get("pointer_type") == "mouse"]
-    touch_img = [a for a in image_data if a.get("pointer_type") == "touch"]
-    mouse_img_pass = sum(1 for a in mouse_img if a["passed"] == 1)
-    touch_img_pass = sum(1 for a in touch_img if a["passed"] == 1)
-
+def make_pointer_comparison(agg):
     fig = make_subplots(rows=1, cols=2, subplot_titles=("Line CAPTCHA", "Image CAPTCHA"))
 
     categories = ["Mouse", "Touch"]
-    line_rates = [
-        mouse_pass / max(len(mouse_line), 1) * 100,
-        touch_pass / max(len(touch_line), 1) * 100,
-    ]
-    img_rates = [
-        mouse_img_pass / max(len(mouse_img), 1) * 100,
-        touch_img_pass / max(len(touch_img), 1) * 100,
-    ]
-
-    fig.add_trace(go.Bar(
-        x=categories, y=line_rates,
-        text=[f"{r:.0f}%<br>(n={n})" for r, n in zip(line_rates, [len(mouse_line), len(touch_line)])],
-        textposition="auto",
-        marker_color=["#818cf8", "#f472b6"],
-    ), row=1, col=1)
-
-    fig.add_trace(go.Bar(
-        x=categories, y=img_rates,
-        text=[f"{r:.0f}%<br>(n={n})" for r, n in zip(img_rates, [len(mouse_img), len(touch_img)])],
-        textposition="auto",
-        marker_color=["#818cf8", "#f472b6"],
-    ), row=1, col=2)
+    for col, kind in ((1, "line"), (2, "image")):
+        groups = [agg["pointer"][kind].get(p, {"n": 0, "passed": 0}) for p in ("mouse", "touch")]
+        rates = [g["passed"] / max(g["n"], 1) * 100 for g in groups]
+        fig.add_trace(go.Bar(
+            x=categories, y=rates,
+            text=[f"{r:.0f}%<br>(n={g['n']})" for r, g in zip(rates, groups)],
+            textposition="auto",
+            marker_color=["#818cf8", "#f472b6"],
+        ), row=1, col=col)
 
     fig.update_yaxes(title_text="Pass Rate (%)", range=[0, 100])
     fig.update_layout(
@@ -240,25 +198,17 @@ def make_pointer_comparison():
     return fig
 
 
-def make_questionnaire_charts():
-    if not quest_data:
+def make_questionnaire_charts(agg):
+    if not agg["counts"]["completed"]:
         return go.Figure().update_layout(
             title="No questionnaire data yet",
             height=200, paper_bgcolor="#111827", font_color="white",
         )
 
-    metrics = {
-        "Line Difficulty": [q["captcha1_difficulty"] for q in quest_data if q.get("captcha1_difficulty")],
-        "Line Frustration": [q["captcha1_frustration"] for q in quest_data if q.get("captcha1_frustration")],
-        "Image Difficulty": [q["captcha2_difficulty"] for q in quest_data if q.get("captcha2_difficulty")],
-        "Image Frustration": [q["captcha2_frustration"] for q in quest_data if q.get("captcha2_frustration")],
-    }
-
     fig = go.Figure()
     colors = ["#818cf8", "#f472b6", "#34d399", "#fbbf24"]
-    for i, (name, vals) in enumerate(metrics.items()):
-        if vals:
-            avg = sum(vals) / len(vals)
+    for i, (name, avg) in enumerate(agg["likert"].items()):
+        if avg is not None:
             fig.add_trace(go.Bar(
                 x=[name], y=[avg],
                 text=[f"{avg:.1f}"],
@@ -276,58 +226,50 @@ def make_questionnaire_charts():
     return fig
 
 
-def make_comments_section():
+def make_comments_section(agg):
     comments = []
-    for q in quest_data:
-        if q.get("comments"):
-            device = q.get("device_type", "?")
-            age = q.get("age_range", "?")
-            comments.append(
-                html.Div([
-                    html.P(
-                        f"\"{q['comments']}\"",
-                        style={"fontStyle": "italic", "marginBottom": "4px"},
-                    ),
-                    html.P(
-                        f"— {device}, {age}, tech comfort {q.get('tech_comfort', '?')}/5",
-                        style={"fontSize": "12px", "color": "#9ca3af"},
-                    ),
-                ], style={
-                    "borderLeft": "3px solid #818cf8",
-                    "paddingLeft": "12px",
-                    "marginBottom": "16px",
-                })
-            )
+    for q in agg["comments"]:
+        device = q.get("device_type") or "?"
+        age = q.get("age_range") or "?"
+        tech = q.get("tech_comfort") or "?"
+        comments.append(
+            html.Div([
+                html.P(
+                    f"\"{q['comments']}\"",
+                    style={"fontStyle": "italic", "marginBottom": "4px"},
+                ),
+                html.P(
+                    f"— {device}, {age}, tech comfort {tech}/5",
+                    style={"fontSize": "12px", "color": "#9ca3af"},
+                ),
+            ], style={
+                "borderLeft": "3px solid #818cf8",
+                "paddingLeft": "12px",
+                "marginBottom": "16px",
+            })
+        )
     if not comments:
         comments = [html.P("No comments yet.", style={"color": "#9ca3af"})]
     return comments
 
 
-def make_timeline():
-    timestamps = []
-    labels = []
-    colors = []
-    for a in line_data:
-        ts = datetime.fromtimestamp(a["created_at"])
-        timestamps.append(ts)
-        labels.append(f"Line: {a['outcome_reason']}")
-        colors.append("#22c55e" if a["outcome_reason"] == "success" else "#ef4444")
-    for a in image_data:
-        ts = datetime.fromtimestamp(a["created_at"])
-        timestamps.append(ts)
-        labels.append(f"Image: {a['reason'][:20]}")
-        colors.append("#22c55e" if a["passed"] == 1 else "#ef4444")
-
-    fig = go.Figure(go.Scatter(
-        x=timestamps, y=[1] * len(timestamps),
-        mode="markers",
-        marker=dict(size=10, color=colors),
-        text=labels, hoverinfo="text+x",
-    ))
+def make_timeline(agg):
+    hours = [datetime.fromtimestamp(h["hour_start"]) for h in agg["timeline"]]
+    fig = go.Figure()
+    for kind, label, color in (("line", "Line", "#818cf8"), ("image", "Image", "#f472b6")):
+        fig.add_trace(go.Bar(
+            x=hours, y=[h[kind][0] for h in agg["timeline"]],
+            name=f"{label} attempts", marker_color=color,
+            text=[
+                f"{h[kind][1]}/{h[kind][0]} passed" if h[kind][0] else ""
+                for h in agg["timeline"]
+            ],
+            hoverinfo="text+x+y",
+        ))
     fig.update_layout(
-        title="Attempt Timeline",
-        xaxis_title="Time", yaxis_visible=False,
-        height=200, paper_bgcolor="#111827", plot_bgcolor="#1f2937",
+        title="Attempts Per Hour",
+        xaxis_title="Time", yaxis_title="Attempts", barmode="stack",
+        height=250, paper_bgcolor="#111827", plot_bgcolor="#1f2937",
         font_color="white",
     )
     return fig
@@ -335,48 +277,39 @@ def make_timeline():
 
 # ─── Dash app ────────────────────────────────────────────────────
 
-app = Dash(__name__)
-
-app.layout = html.Div(
-    style={
-        "backgroundColor": "#111827",
-        "minHeight": "100vh",
-        "padding": "24px",
-        "fontFamily": "system-ui, sans-serif",
-        "color": "white",
-    },
-    children=[
-        html.H1(
-            "Beyond Recognition — Study Dashboard",
-            style={"textAlign": "center", "marginBottom": "8px", "color": "#818cf8"},
-        ),
+_GRID = {"display": "grid", "gridTemplateColumns": "1fr 1fr", "gap": "16px"}
+
+
+def render(agg, refreshed_at):
+    counts = agg["counts"]
+    return [
         html.P(
-            f"Last refreshed: {datetime.now().strftime('%Y-%m-%d %H:%M')} | "
-            f"{len(line_data)} line attempts | {len(image_data)} image attempts | "
-            f"{len(quest_data)} questionnaires",
+            f"Last refreshed: {datetime.fromtimestamp(refreshed_at).strftime('%Y-%m-%d %H:%M:%S')} | "
+            f"{counts['line']} line attempts | {counts['image']} image attempts | "
+            f"{counts['completed']} questionnaires",
             style={"textAlign": "center", "color": "#9ca3af", "marginBottom": "24px"},
         ),
 
-        dcc.Graph(figure=make_overview_cards()),
+        dcc.Graph(figure=make_overview_cards(agg)),
 
-        html.Div(style={"display": "grid", "gridTemplateColumns": "1fr 1fr", "gap": "16px"}, children=[
-            dcc.Graph(figure=make_line_outcomes()),
-            dcc.Graph(figure=make_image_outcomes()),
+        html.Div(style=_GRID, children=[
+            dcc.Graph(figure=make_line_outcomes(agg)),
+            dcc.Graph(figure=make_image_outcomes(agg)),
         ]),
 
-        html.Div(style={"display": "grid", "gridTemplateColumns": "1fr 1fr", "gap": "16px"}, children=[
-            dcc.Graph(figure=make_pointer_comparison()),
-            dcc.Graph(figure=make_solve_times()),
+        html.Div(style=_GRID, children=[
+            dcc.Graph(figure=make_pointer_comparison(agg)),
+            dcc.Graph(figure=make_solve_times(agg)),
         ]),
 
-        html.Div(style={"display": "grid", "gridTemplateColumns": "1fr 1fr", "gap": "16px"}, children=[
-            dcc.Graph(figure=make_coverage_distribution()),
-            dcc.Graph(figure=make_per_session_pass_rates()),
+        html.Div(style=_GRID, children=[
+            dcc.Graph(figure=make_coverage_distribution(agg)),
+            dcc.Graph(figure=make_per_session_pass_rates(agg)),
         ]),
 
-        dcc.Graph(figure=make_questionnaire_charts()),
+        dcc.Graph(figure=make_questionnaire_charts(agg)),
 
-        dcc.Graph(figure=make_timeline()),
+        dcc.Graph(figure=make_timeline(agg)),
 
         html.Div(
             style={
@@ -388,12 +321,63 @@ app.layout = html.Div(
             },
             children=[
                 html.H3("Participant Comments", style={"marginBottom": "16px"}),
-                *make_comments_section(),
+                *make_comments_section(agg),
             ],
         ),
-    ],
-)
+    ]
+
+
+def create_app(data, refresh_s=REFRESH_S):
+    app = Dash(__name__)
+    app.layout = html.Div(
+        style={
+            "backgroundColor": "#111827",
+            "minHeight": "100vh",
+            "padding": "24px",
+            "fontFamily": "system-ui, sans-serif",
+            "color": "white",
+        },
+        children=[
+            html.H1(
+                "Beyond Recognition — Study Dashboard",
+                style={"textAlign": "center", "marginBottom": "8px", "color": "#818cf8"},
+            ),
+            dcc.Interval(id="refresh", interval=refresh_s * 1000),
+            html.Div(id="content"),
+        ],
+    )
+
+    @app.callback(Output("content", "children"), Input("refresh", "n_intervals"))
+    def _refresh(_):
+        agg = data.refresh()
+        return render(agg, data.refreshed_at)
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Study results dashboard.")
+    parser.add_argument(
+        "--local", nargs="?", const=str(LOCAL_DB_PATH), default=None, metavar="DB",
+        help=f"Read from a local captcha.db instead of Supabase (default {LOCAL_DB_PATH}).",
+    )
+    parser.add_argument("--cache", default=str(CACHE_PATH), help="Path of the local row cache.")
+    parser.add_argument("--refresh", type=float, default=REFRESH_S,
+                        help="Seconds between incremental refreshes.")
+    parser.add_argument("--port", type=int, default=8050)
+    args = parser.parse_args()
+
+    if args.local:
+        source = LocalSource(Path(args.local))
+    else:
+        source = SupabaseSource(SUPABASE_URL, SUPABASE_KEY)
+    data = DashboardData(source, DashboardCache(Path(args.cache)))
+    data.refresh()
+
+    app = create_app(data, args.refresh)
+    print(f"Dashboard: http://localhost:{args.port}")
+    app.run(debug=True, port=args.port)
+
 
 if __name__ == "__main__":
-    print("Dashboard: http://localhost:8050")
-    app.run(debug=True, port=8050)
+    main()
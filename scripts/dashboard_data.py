@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+Incremental data layer for the study dashboard.
+
+Rows are copied from a source — the Supabase REST API, or the local
+``captcha.db`` for offline runs — into a small SQLite cache.  Each table
+keeps a ``created_at`` high-water mark, and a refresh only fetches rows
+from ``SYNC_OVERLAP_S`` before it: ``created_at`` is stamped before a row
+is committed (and mirrored to Supabase), so rows can land out of order.
+Rows fetched again are absorbed by the primary key.
+The dashboard never holds raw rows: ``compute_aggregates`` reduces the
+cache to the counts, quartiles and histograms the figures are drawn from.
+
+Only the columns the dashboard uses are copied (``trajectory_json`` and
+friends stay behind).
+"""
+
+import json
+import sqlite3
+import statistics
+import threading
+import time
+import urllib.parse
+import urllib.request
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+CACHE_PATH = Path("data") / "dashboard_cache.db"
+PAGE_SIZE = 1000
+SYNC_OVERLAP_S = 300.0  # re-scan window for rows committed after newer ones
+COVERAGE_BINS = 20
+
+TABLES: Dict[str, Dict[str, Any]] = {
+    "attempt_logs": {
+        "key": "attempt_id",
+        "columns": [
+            "attempt_id", "session_id", "pointer_type", "outcome_reason",
+            "duration_ms", "coverage_ratio", "created_at",
+        ],
+    },
+    "image_attempt_logs": {
+        "key": "attempt_id",
+        "columns": [
+            "attempt_id", "pointer_type", "reason", "passed", "solve_time_ms", "created_at",
+        ],
+    },
+    "questionnaire_responses": {
+        "key": "id",
+        "columns": [
+            "id", "session_id", "device_type", "age_range", "tech_comfort",
+            "captcha1_difficulty", "captcha1_frustration",
+            "captcha2_difficulty", "captcha2_frustration", "comments", "created_at",
+        ],
+    },
+}
+
+
+# ─── Sources ─────────────────────────────────────────────────────
+
+
+class SupabaseSource:
+    """Pages through the PostgREST API with ``Range`` headers."""
+
+    def __init__(self, url: str, key: str, page_size: int = PAGE_SIZE):
+        self.url = url.rstrip("/")
+        self.key = key
+        self.page_size = page_size
+
+    @property
+    def name(self) -> str:
+        return self.url
+
+    def _get(self, table: str, query: str, start: int) -> List[Dict[str, Any]]:
+        req = urllib.request.Request(
+            f"{self.url}/rest/v1/{table}?{query}",
+            headers={
+                "Authorization": f"Bearer {self.key}",
+                "apikey": self.key,
+                "Range-Unit": "items",
+                "Range": f"{start}-{start + self.page_size - 1}",
+            },
+        )
+        with urllib.request.urlopen(req, timeout=30) as resp:
+            return json.loads(resp.read())
+
+    def rows_since(self, table: str, since: Optional[float]) -> Iterator[Dict[str, Any]]:
+        spec = TABLES[table]
+        params = [
+            ("select", ",".join(spec["columns"])),
+            ("order", f"created_at.asc,{spec['key']}.asc"),
+        ]
+        if since is not None:
+            params.append(("created_at", f"gte.{since!r}"))
+        query = urllib.parse.urlencode(params, safe=",.")
+        start = 0
+        while True:
+            page = self._get(table, query, start)
+            yield from page
+            if len(page) < self.page_size:
+                return
+            start += len(page)
+
+
+class LocalSource:
+    """Reads the backend's own SQLite database, for offline runs."""
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+
+    @property
+    def name(self) -> str:
+        return str(self.db_path.resolve())
+
+    def rows_since(self, table: str, since: Optional[float]) -> Iterator[Dict[str, Any]]:
+        if not self.db_path.exists():
+            raise FileNotFoundError(f"No database found at {self.db_path}")
+        spec = TABLES[table]
+        conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+        conn.row_factory = sqlite3.Row
+        try:
+            exists = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+            ).fetchone()
+            if not exists:
+                return
+            sql = f"SELECT {', '.join(spec['columns'])} FROM {table}"
+            args: tuple = ()
+            if since is not None:
+                sql += " WHERE created_at >= ?"
+                args = (since,)
+            for row in conn.execute(sql + " ORDER BY created_at", args):
+                yield dict(row)
+        finally:
+            conn.close()
+
+
+# ─── Cache ───────────────────────────────────────────────────────
+
+
+class DashboardCache:
+    """SQLite copy of the dashboard's tables plus a per-table high-water mark."""
+
+    def __init__(self, path: Path = CACHE_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self._init()
+
+    def _init(self) -> None:
+        for table, spec in TABLES.items():
+            self.conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} "
+                f"({', '.join(spec['columns'])}, PRIMARY KEY ({spec['key']}))"
+            )
+            self.conn.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_{table}_created ON {table}(created_at)"
+            )
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sync_state (
+                table_name TEXT PRIMARY KEY,
+                source TEXT NOT NULL,
+                high_water REAL,
+                synced_at REAL NOT NULL
+            )
+            """
+        )
+        self.conn.commit()
+
+    def high_water(self, table: str, source: str) -> Optional[float]:
+        row = self.conn.execute(
+            "SELECT source, high_water FROM sync_state WHERE table_name = ?", (table,)
+        ).fetchone()
+        if row is None:
+            return None
+        if row["source"] != source:
+            # The cache was filled from a different source; start over.
+            self.conn.execute(f"DELETE FROM {table}")
+            self.conn.execute("DELETE FROM sync_state WHERE table_name = ?", (table,))
+            self.conn.commit()
+            return None
+        return row["high_water"]
+
+    def sync(self, source) -> Dict[str, int]:
+        """Copy rows from the overlap window before each high-water mark; return rows fetched per table."""
+        fetched: Dict[str, int] = {}
+        for table, spec in TABLES.items():
+            high = self.high_water(table, source.name)
+            since = None if high is None else high - SYNC_OVERLAP_S
+            columns = spec["columns"]
+            sql = (
+                f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) "
+                f"VALUES ({', '.join('?' for _ in columns)})"
+            )
+            count = 0
+            batch = []
+            for row in source.rows_since(table, since):
+                batch.append(tuple(row.get(c) for c in columns))
+                created = row.get("created_at")
+                if created is not None and (high is None or created > high):
+                    high = created
+                if len(batch) >= PAGE_SIZE:
+                    self.conn.executemany(sql, batch)
+                    count += len(batch)
+                    batch = []
+            if batch:
+                self.conn.executemany(sql, batch)
+                count += len(batch)
+            self.conn.execute(
+                """
+                INSERT INTO sync_state (table_name, source, high_water, synced_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(table_name) DO UPDATE SET
+                    source = excluded.source,
+                    high_water = excluded.high_water,
+                    synced_at = excluded.synced_at
+                """,
+                (table, source.name, high, time.time()),
+            )
+            self.conn.commit()
+            fetched[table] = count
+        return fetched
+
+    def version(self) -> tuple:
+        """Changes whenever a sync adds or replaces rows."""
+        return tuple(
+            self.conn.execute(f"SELECT COUNT(*), MAX(created_at) FROM {table}").fetchone()[:]
+            for table in TABLES
+        )
+
+
+# ─── Aggregates ──────────────────────────────────────────────────
+
+
+def _quartiles(values: List[float]) -> Optional[Dict[str, float]]:
+    """Box-plot statistics; *values* must be sorted."""
+    if not values:
+        return None
+    if len(values) == 1:
+        q1 = median = q3 = values[0]
+    else:
+        q1, median, q3 = statistics.quantiles(values, n=4, method="inclusive")
+    return {"min": values[0], "q1": q1, "median": median, "q3": q3, "max": values[-1],
+            "n": len(values)}
+
+
+def _column_quartiles(conn: sqlite3.Connection, sql: str) -> Optional[Dict[str, float]]:
+    return _quartiles([r[0] for r in conn.execute(sql)])
+
+
+def _rate(passed: int, total: int) -> float:
+    return passed / max(total, 1) * 100
+
+
+def compute_aggregates(conn: sqlite3.Connection) -> Dict[str, Any]:
+    """Reduce the cached tables to everything the dashboard figures need."""
+    line_total, line_passed, sessions = conn.execute(
+        "SELECT COUNT(*), COALESCE(SUM(outcome_reason = 'success'), 0), "
+        "COUNT(DISTINCT session_id) FROM attempt_logs"
+    ).fetchone()
+    image_total, image_passed = conn.execute(
+        "SELECT COUNT(*), COALESCE(SUM(passed = 1), 0) FROM image_attempt_logs"
+    ).fetchone()
+    quest_total = conn.execute("SELECT COUNT(*) FROM questionnaire_responses").fetchone()[0]
+
+    pointer = {}
+    for kind, sql in (
+        ("line", "SELECT pointer_type, COUNT(*), SUM(outcome_reason = 'success') "
+                 "FROM attempt_logs GROUP BY pointer_type"),
+        ("image", "SELECT pointer_type, COUNT(*), SUM(passed = 1) "
+                  "FROM image_attempt_logs GROUP BY pointer_type"),
+    ):
+        pointer[kind] = {p: {"n": n, "passed": k} for p, n, k in conn.execute(sql)}
+
+    coverage = [0] * COVERAGE_BINS
+    for bucket, n in conn.execute(
+        "SELECT MIN(MAX(CAST(coverage_ratio * ? AS INTEGER), 0), ?), COUNT(*) "
+        "FROM attempt_logs WHERE coverage_ratio IS NOT NULL GROUP BY 1",
+        (COVERAGE_BINS, COVERAGE_BINS - 1),
+    ):
+        coverage[bucket] = n
+
+    likert = {}
+    for name, column in (
+        ("Line Difficulty", "captcha1_difficulty"),
+        ("Line Frustration", "captcha1_frustration"),
+        ("Image Difficulty", "captcha2_difficulty"),
+        ("Image Frustration", "captcha2_frustration"),
+    ):
+        likert[name] = conn.execute(
+            f"SELECT AVG(NULLIF({column}, 0)) FROM questionnaire_responses"
+        ).fetchone()[0]
+
+    timeline: Dict[int, Dict[str, List[int]]] = {}
+    for kind, sql in (
+        ("line", "SELECT CAST(created_at / 3600 AS INTEGER), COUNT(*), "
+                 "SUM(outcome_reason = 'success') FROM attempt_logs GROUP BY 1"),
+        ("image", "SELECT CAST(created_at / 3600 AS INTEGER), COUNT(*), SUM(passed = 1) "
+                  "FROM image_attempt_logs GROUP BY 1"),
+    ):
+        for hour, n, k in conn.execute(sql):
+            timeline.setdefault(hour, {"line": [0, 0], "image": [0, 0]})[kind] = [n, k]
+
+    return {
+        "counts": {
+            "sessions": sessions,
+            "completed": quest_total,
+            "line": line_total,
+            "image": image_total,
+            "line_pass_rate": _rate(line_passed, line_total),
+            "image_pass_rate": _rate(image_passed, image_total),
+        },
+        "line_outcomes": dict(conn.execute(
+            "SELECT outcome_reason, COUNT(*) FROM attempt_logs "
+            "GROUP BY outcome_reason ORDER BY MIN(created_at)"
+        ).fetchall()),
+        "image_outcomes": dict(conn.execute(
+            "SELECT reason, COUNT(*) FROM image_attempt_logs "
+            "GROUP BY reason ORDER BY MIN(created_at)"
+        ).fetchall()),
+        "sessions": [
+            {"session_id": sid, "n": n, "pass_rate": _rate(k, n)}
+            for sid, n, k in conn.execute(
+                "SELECT session_id, COUNT(*), SUM(outcome_reason = 'success') "
+                "FROM attempt_logs GROUP BY session_id ORDER BY MIN(created_at)"
+            )
+        ],
+        "solve_times": {
+            "line_pass": _column_quartiles(conn, "SELECT duration_ms FROM attempt_logs "
+                "WHERE outcome_reason = 'success' AND duration_ms IS NOT NULL ORDER BY 1"),
+            "line_fail": _column_quartiles(conn, "SELECT duration_ms FROM attempt_logs "
+                "WHERE outcome_reason != 'success' AND duration_ms IS NOT NULL ORDER BY 1"),
+            "image_pass": _column_quartiles(conn, "SELECT solve_time_ms FROM image_attempt_logs "
+                "WHERE passed = 1 AND solve_time_ms IS NOT NULL ORDER BY 1"),
+            "image_fail": _column_quartiles(conn, "SELECT solve_time_ms FROM image_attempt_logs "
+                "WHERE passed != 1 AND solve_time_ms IS NOT NULL ORDER BY 1"),
+        },
+        "coverage_histogram": coverage,
+        "pointer": pointer,
+        "likert": likert,
+        "comments": [
+            dict(r) for r in conn.execute(
+                "SELECT comments, device_type, age_range, tech_comfort "
+                "FROM questionnaire_responses WHERE comments IS NOT NULL AND comments != '' "
+                "ORDER BY created_at"
+            )
+        ],
+        "timeline": [
+            {"hour_start": hour * 3600, **timeline[hour]} for hour in sorted(timeline)
+        ],
+    }
+
+
+class DashboardData:
+    """Cache plus source; recomputes aggregates only when a sync brought new rows."""
+
+    def __init__(self, source, cache: DashboardCache):
+        self.source = source
+        self.cache = cache
+        self._version: Optional[tuple] = None
+        self._aggregates: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()  # Dash may run callbacks concurrently
+        self.refreshed_at: Optional[float] = None
+
+    def refresh(self) -> Dict[str, Any]:
+        with self._lock:
+            try:
+                self.cache.sync(self.source)
+            except Exception as exc:  # keep serving the cached data
+                print(f"[dashboard] refresh from {self.source.name} failed: {exc}")
+            version = self.cache.version()
+            if version != self._version or self._aggregates is None:
+                self._aggregates = compute_aggregates(self.cache.conn)
+                self._version = version
+            self.refreshed_at = time.time()
+            return self._aggregates
@@ -79,7 +79,8 @@ def fetch_challenge():
 
 
 def peek_path(challenge_id: str, nonce: str, token: str,
-              x: float, y: float, pointer_type: str = "mouse"):
+              x: float, y: float, pointer_type: str = "mouse",
+              peek_state: str = None):
     """Peek to reveal path segments ahead of current position."""
     resp = requests.post(
         f"{BACKEND_URL}/captcha/line/peek",
@@ -89,6 +90,7 @@ def peek_path(challenge_id: str, nonce: str, token: str,
             "token": token,
             "cursor": [x, y],
             "pointerType": pointer_type,
+            "peekState": peek_state,
         },
         timeout=10,
     )
@@ -101,12 +103,14 @@ def collect_full_path(challenge_id: str, nonce: str, token: str,
     """Iteratively peek to collect the full path polyline."""
     all_points = [(start_x, start_y)]
     cx, cy = start_x, start_y
+    peek_state = None
 
     for _ in range(80):  # safety limit
         try:
-            data = peek_path(challenge_id, nonce, token, cx, cy)
+            data = peek_path(challenge_id, nonce, token, cx, cy, peek_state=peek_state)
         except Exception:
             break
+        peek_state = data.get("peekState") or peek_state
 
         ahead = data.get("ahead", [])
         if not ahead: